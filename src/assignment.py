@@ -0,0 +1,110 @@
+"""
+Optimal team-to-project assignment.
+
+Given a team x project score matrix, assign_projects finds the assignment with
+the highest total score using the Hungarian algorithm (shortest augmenting
+paths with row/column potentials, O(n^2 m) for n <= m). The inner loop over
+columns is vectorized with numpy, so hundreds of teams and projects solve in
+well under a second.
+
+Rectangular problems are allowed:
+    - more projects than teams: every team gets a project, some projects are unused
+    - more teams than project slots: only the teams that add the most score get one
+
+Projects take one team each by default, capacities lets a project take several.
+"""
+import numpy as np
+
+
+def assign_projects(scores, capacities=None):
+    """
+    Maximum-score assignment of teams (rows) to projects (columns)
+
+    scores : array-like, shape (teams, projects)
+    capacities : sequence of int, optional
+        how many teams each project can take, defaults to 1 for every project
+
+    Returns an int array with the project column for each team, -1 for teams
+    left without a project
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n_teams, n_projects = scores.shape
+    assigned = np.full(n_teams, -1, dtype=np.intp)
+
+    if capacities is None:
+        capacities = [1] * n_projects
+    if len(capacities) != n_projects:
+        raise ValueError("capacities must have one entry per project")
+    if any(c < 0 for c in capacities):
+        raise ValueError("capacities cannot be negative")
+
+    # Each project becomes `capacity` identical slot columns
+    slot_project = np.repeat(np.arange(n_projects, dtype=np.intp), capacities)
+    if n_teams == 0 or len(slot_project) == 0:
+        return assigned
+
+    # The solver minimises cost, so negate the scores
+    cost = -scores[:, slot_project]
+    if n_teams <= len(slot_project):
+        slot_of_team = _hungarian(cost)
+        assigned[:] = slot_project[slot_of_team]
+    else:
+        # Fewer slots than teams, solve the transposed problem and pick teams for slots
+        team_of_slot = _hungarian(cost.T)
+        assigned[team_of_slot] = slot_project
+    return assigned
+
+
+def _hungarian(cost):
+    """
+    Helper function
+    Minimum-cost assignment of every row to a distinct column, requires rows <= columns
+
+    Returns the column chosen for each row
+    """
+    n, m = cost.shape
+    # Potentials and matching use 1-based indices, column 0 is a virtual start column
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    row_of_col = np.zeros(m + 1, dtype=np.intp)
+    way = np.zeros(m + 1, dtype=np.intp)
+
+    for row in range(1, n + 1):
+        row_of_col[0] = row
+        col = 0
+        min_reduced = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        # Grow a shortest augmenting path from this row until it reaches a free column
+        while True:
+            used[col] = True
+            current_row = row_of_col[col]
+            free = ~used[1:]
+
+            reduced = cost[current_row - 1] - u[current_row] - v[1:]
+            better = free & (reduced < min_reduced[1:])
+            min_reduced[1:][better] = reduced[better]
+            way[1:][better] = col
+
+            candidates = np.where(free, min_reduced[1:], np.inf)
+            next_col = int(np.argmin(candidates)) + 1
+            delta = candidates[next_col - 1]
+
+            u[row_of_col[used]] += delta
+            v[used] -= delta
+            min_reduced[1:][free] -= delta
+
+            col = next_col
+            if row_of_col[col] == 0:
+                break
+
+        # Flip the matching along the path
+        while col:
+            prev = way[col]
+            row_of_col[col] = row_of_col[prev]
+            col = prev
+
+    col_of_row = np.empty(n, dtype=np.intp)
+    matched = np.flatnonzero(row_of_col[1:]) + 1
+    col_of_row[row_of_col[matched] - 1] = matched - 1
+    return col_of_row
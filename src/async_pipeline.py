@@ -0,0 +1,116 @@
+"""
+The read -> transform -> match -> write run with its stages overlapped.
+
+pipeline.run_pipeline reads every row before it transforms any of them. Here
+the stages run as asyncio tasks:
+
+    fetch     : the source's chunks (pages of the tab, see SheetsSource) are
+                read on one I/O thread and put on a bounded queue, so the
+                source reads ahead by at most queue_size chunks
+    transform : every chunk is transformed (pipeline.RowTransform) as soon as
+                it arrives, while the next pages are still downloading
+    match     : once the last chunk is in, create_capstone_teams runs in an
+                executor (a thread by default, or e.g. a ProcessPoolExecutor)
+    write     : the results go to the sink on an I/O thread as soon as they
+                exist, then the state file is saved
+
+The state file is read while the first page downloads. Match and write take
+a single item each, so they are awaited in turn rather than queued. With a
+slow link the run takes about the time of the fetch plus the match, the
+transform disappears behind the downloads.
+
+    outcome = asyncio.run(run_pipeline_async(source, sink, state_file='matching_state.json'))
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from pipeline import RowTransform, format_results, match_transformed
+from run_state import load_run_state, save_run_state
+
+# Chunks the fetch may read ahead of the transform
+DEFAULT_QUEUE_SIZE = 4
+
+# Marks the end of the chunks on the queue
+_DONE = object()
+
+
+async def run_pipeline_async(source, sink, state_file=None, queue_size=DEFAULT_QUEUE_SIZE, executor=None,
+                             **match_options):
+    """
+    Same as pipeline.run_pipeline, with the fetch overlapping the transform
+
+    executor runs the match, None uses the event loop's default thread pool.
+    Returns (results, total_score, stats), or None when the source has no
+    responses. An error in any stage is raised here
+    """
+    loop = asyncio.get_running_loop()
+    # One thread for the whole fetch, a source's generator and its client stay on it
+    io = ThreadPoolExecutor(max_workers=1)
+    try:
+        state_future = loop.run_in_executor(None, load_run_state, state_file) if state_file else None
+        chunks = asyncio.Queue(maxsize=queue_size)
+        fetcher = asyncio.create_task(_fetch(source, chunks, io))
+        try:
+            state = await state_future if state_future is not None else None
+            header, transform = await _transform(chunks, state)
+            await fetcher
+        finally:
+            if not fetcher.done():
+                fetcher.cancel()
+    finally:
+        io.shutdown(wait=False)
+    if transform is None or not transform.entries:
+        return None
+
+    transformed = transform.finish()
+    results, total_score, new_state, stats = await loop.run_in_executor(
+        executor, functools.partial(match_transformed, header, state, transformed, **match_options))
+    with instrumentation.phase('write'):
+        written = await loop.run_in_executor(None, sink.write, format_results(results, total_score))
+    if written and state_file:
+        await loop.run_in_executor(None, save_run_state, new_state, state_file)
+    return results, total_score, stats
+
+
+async def _fetch(source, chunks, io):
+    """
+    Helper function
+    Puts the source's (header, rows) chunks on the queue, then _DONE, also after a failure
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        with instrumentation.phase('fetch'):
+            iterator = await loop.run_in_executor(io, iter, source.iter_row_chunks())
+            while True:
+                chunk = await loop.run_in_executor(io, next, iterator, _DONE)
+                if chunk is _DONE:
+                    break
+                instrumentation.count('fetch.chunks')
+                # Waits here while the queue is full, the transform is behind
+                await chunks.put(chunk)
+    except Exception:
+        # Wake the transform up, the error itself comes out of awaiting this task
+        await chunks.put(_DONE)
+        raise
+    await chunks.put(_DONE)
+
+
+async def _transform(chunks, state):
+    """
+    Helper function
+    Transforms chunks until _DONE, returns (header, RowTransform), (None, None) without chunks
+    """
+    header = transform = None
+    while True:
+        chunk = await chunks.get()
+        if chunk is _DONE:
+            return header, transform
+        header, rows = chunk
+        if transform is None:
+            transform = RowTransform(header, state)
+        with instrumentation.phase('transform'):
+            transform.add(rows)
+        # Let the fetch hand over its next page before the next chunk is transformed
+        await asyncio.sleep(0)
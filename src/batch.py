@@ -0,0 +1,253 @@
+"""
+Batch mode: match many cohorts (course sections) listed in a manifest.
+
+Manifest (JSON):
+
+    {
+      "rate_limit": 1.0,
+      "defaults": {"min_size": 2, "max_size": 3},
+      "cohorts": [
+        {"name": "CS401-01",
+         "input":  {"spreadsheet_id": "...", "sheet": "Form Responses 1"},
+         "output": {"spreadsheet_id": "...", "range": "Team Results!A1"},
+         "state_file": "state/cs401-01.json",
+         "options": {"assignment": "optimal"}},
+        {"name": "archive-2023",
+         "input":  {"path": "archive/2023.csv"},
+         "output": {"path": "out/2023.csv"}}
+      ]
+    }
+
+input/output are a spreadsheet (SheetsSource/SheetsSink in main.py) or a local
+file (io_backends.py), relative paths are taken from the manifest's folder.
+state_file makes the cohort's runs incremental (run_state.py), options are
+passed to create_capstone_teams on top of the manifest's defaults.
+rate_limit caps Sheets requests per second across the whole batch.
+
+Every cohort goes read -> match -> write. Reads and writes run on a thread
+pool, the CPU-bound matching on a process pool, so one section's I/O overlaps
+another's matching. A cohort that fails at any step is reported with its
+error and the rest carry on.
+
+Usage:
+    python src/batch.py manifest.json --io-workers 8 --match-workers 4 --report batch_report.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from io_backends import FileSink, FileSource
+from main import SheetsSink, SheetsSource
+from pipeline import format_results, match_incremental
+from run_state import load_run_state, save_run_state
+from sheets_client import set_rate_limit
+
+DEFAULT_IO_WORKERS = 8
+
+# Sheets allows 60 requests per minute per user
+DEFAULT_RATE_LIMIT = 1.0
+
+
+def load_manifest(path):
+    """
+    Read and check a manifest, returns (cohorts, rate limit)
+    Raises ValueError for a malformed manifest
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = manifest.get('defaults', {})
+
+    cohorts = []
+    names = set()
+    for position, entry in enumerate(manifest.get('cohorts', [])):
+        name = entry.get('name') or f'cohort {position + 1}'
+        if name in names:
+            raise ValueError(f"Duplicate cohort name {name!r} in {path}")
+        names.add(name)
+        for side in ('input', 'output'):
+            spec = entry.get(side)
+            if not isinstance(spec, dict) or not ('path' in spec or 'spreadsheet_id' in spec):
+                raise ValueError(f"Cohort {name!r} needs an {side} with a path or a spreadsheet_id")
+        cohorts.append({
+            'name': name,
+            'input': _resolve(entry['input'], base),
+            'output': _resolve(entry['output'], base),
+            'state_file': os.path.join(base, entry['state_file']) if entry.get('state_file') else None,
+            'options': dict(defaults, **entry.get('options', {})),
+        })
+    return cohorts, manifest.get('rate_limit', DEFAULT_RATE_LIMIT)
+
+
+def make_source(spec):
+    """ResponseSource for a manifest input"""
+    if 'path' in spec:
+        return FileSource(spec['path'])
+    return SheetsSource(spec['spreadsheet_id'], spec.get('sheet', 'Form Responses 1'))
+
+
+def make_sink(spec):
+    """ResultSink for a manifest output"""
+    if 'path' in spec:
+        return FileSink(spec['path'])
+    return SheetsSink(spec['spreadsheet_id'], spec.get('range', 'Team Results!A1'))
+
+
+def run_batch(cohorts, io_workers=DEFAULT_IO_WORKERS, match_workers=None, rate_limit=DEFAULT_RATE_LIMIT,
+              progress=None):
+    """
+    Run every cohort, returns one outcome dict per cohort in manifest order
+
+    match_workers : processes for matching, defaults to os.cpu_count(),
+                    0 matches on a single thread of this process instead
+    rate_limit    : Sheets requests per second across all threads, None for no limit
+    progress      : called as progress(finished count, total, outcome) after each cohort
+
+    Outcomes hold name, status ('ok', 'empty' or 'failed'), seconds, and rows,
+    teams and score when matched, or stage and error when failed
+    """
+    progress = progress or print_progress
+    outcomes = [None] * len(cohorts)
+    started = [time.perf_counter()] * len(cohorts)
+    finished = 0
+
+    def finish(i, **outcome):
+        nonlocal finished
+        outcomes[i] = dict(name=cohorts[i]['name'], seconds=time.perf_counter() - started[i], **outcome)
+        finished += 1
+        progress(finished, len(cohorts), outcomes[i])
+
+    previous_limit = set_rate_limit(rate_limit)
+    io_pool = ThreadPoolExecutor(max_workers=io_workers)
+    # The I/O threads are already running, a forked worker could inherit a lock one of them holds
+    match_pool = ProcessPoolExecutor(max_workers=match_workers, mp_context=_worker_context()) \
+        if match_workers != 0 else ThreadPoolExecutor(max_workers=1)
+    try:
+        pending = {}
+        for i, cohort in enumerate(cohorts):
+            started[i] = time.perf_counter()
+            pending[io_pool.submit(_read_cohort, cohort)] = (i, 'read')
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, stage = pending.pop(future)
+                cohort = cohorts[i]
+                try:
+                    value = future.result()
+                except Exception as error:
+                    finish(i, status='failed', stage=stage, error=f'{type(error).__name__}: {error}')
+                    continue
+
+                if stage == 'read':
+                    header, rows, state = value
+                    if not rows:
+                        finish(i, status='empty', rows=0)
+                    else:
+                        future = match_pool.submit(_match_cohort, header, rows, state, cohort['options'])
+                        pending[future] = (i, 'match')
+                elif stage == 'match':
+                    pending[io_pool.submit(_write_cohort, cohort, *value)] = (i, 'write')
+                else:
+                    finish(i, status='ok', **value)
+    finally:
+        io_pool.shutdown(wait=True)
+        match_pool.shutdown(wait=True)
+        if previous_limit is not None:
+            set_rate_limit(previous_limit.rate, previous_limit.burst)
+        else:
+            set_rate_limit(None)
+    return outcomes
+
+
+def print_progress(finished, total, outcome):
+    """Default progress report, one line per finished cohort"""
+    if outcome['status'] == 'ok':
+        detail = f"{outcome['rows']} rows, {outcome['teams']} teams, score {outcome['score']}"
+    elif outcome['status'] == 'empty':
+        detail = 'no responses'
+    else:
+        detail = f"{outcome['stage']} failed: {outcome['error']}"
+    print(f"[{finished}/{total}] {outcome['name']}: {detail} ({outcome['seconds']:.1f}s)", flush=True)
+
+
+def _resolve(spec, base):
+    """
+    Helper function
+    Manifest input/output with a relative path made absolute
+    """
+    spec = dict(spec)
+    if 'path' in spec:
+        spec['path'] = os.path.join(base, spec['path'])
+    return spec
+
+
+def _worker_context():
+    """
+    Helper function
+    Start method for the matching processes, forkserver where the platform has it
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _read_cohort(cohort):
+    """
+    Helper function
+    I/O thread: the cohort's rows and saved state
+    """
+    header, rows = make_source(cohort['input']).read_rows()
+    state = load_run_state(cohort['state_file']) if cohort['state_file'] else None
+    return header, rows, state
+
+
+def _match_cohort(header, rows, state, options):
+    """
+    Helper function
+    Worker process: transform and match one cohort, results as plain tuples for pickling
+    """
+    results, total_score, new_state, stats = match_incremental(header, rows, state, **options)
+    return results.to_rows(), total_score, new_state, stats
+
+
+def _write_cohort(cohort, results, total_score, new_state, stats):
+    """
+    Helper function
+    I/O thread: write the results, then save the state
+    """
+    if not make_sink(cohort['output']).write(format_results(results, total_score)):
+        raise RuntimeError('the results could not be written')
+    if cohort['state_file']:
+        save_run_state(new_state, cohort['state_file'])
+    return {'rows': stats['rows'], 'teams': len(results), 'score': total_score}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Match every cohort listed in a manifest.')
+    parser.add_argument('manifest')
+    parser.add_argument('--io-workers', type=int, default=DEFAULT_IO_WORKERS)
+    parser.add_argument('--match-workers', type=int, help='matching processes (default: CPU count)')
+    parser.add_argument('--rate-limit', type=float, help='Sheets requests per second (default: from manifest)')
+    parser.add_argument('--report', help='write the outcomes as JSON')
+    args = parser.parse_args(argv)
+
+    cohorts, rate_limit = load_manifest(args.manifest)
+    if args.rate_limit is not None:
+        rate_limit = args.rate_limit
+    outcomes = run_batch(cohorts, io_workers=args.io_workers, match_workers=args.match_workers,
+                         rate_limit=rate_limit)
+
+    failed = [o for o in outcomes if o['status'] == 'failed']
+    print(f"\n{len(outcomes) - len(failed)} of {len(outcomes)} cohorts done, {len(failed)} failed")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(outcomes, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
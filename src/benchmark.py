@@ -0,0 +1,294 @@
+"""
+Benchmarks for the matching pipeline on synthetic cohorts.
+
+generate_form_rows builds a seeded, realistic set of form responses with the
+same columns as the Google Form export (name, project ranks, ranked people,
+people to avoid). People mostly rank others from their own friend group and
+some projects are more popular than others, so the preference graph looks
+like a real cohort rather than uniform noise.
+
+run_benchmarks times each phase of the pipeline, with peak memory from
+tracemalloc measured in a separate pass so it does not skew the timings:
+    transform   raw rows -> DataFrame -> transform_data_for_algorithm
+    matrix      CompatibilityMatrix construction (SparseCompatibilityMatrix with --sparse)
+    greedy      greedy_teams (decomposition.decompose_teams with --decompose)
+    assignment  'optimal' team-to-project assignment (Hungarian)
+    normalize   score_results
+
+With --snapshot, a saved cohort (snapshot.py) is replayed instead: its
+matrix is memory-mapped in a 'load' phase that replaces transform and matrix.
+
+Usage:
+    python src/benchmark.py --sizes 10 100 1000 10000 --output bench.json
+    python src/benchmark.py --snapshot cohort.snap
+    python src/benchmark.py --baseline benchmarks/baseline.json
+    python src/benchmark.py --sizes 20000 50000 --sparse --decompose --workers 8 --no-memory
+
+With --baseline, every phase that got slower (or used more memory) than the
+baseline by more than the tolerance is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+from decomposition import decompose_teams
+from main import _rows_to_frame, transform_data_for_algorithm
+from matching_algorithm import assign_team_projects, greedy_teams, score_results
+from snapshot import load_snapshot
+
+REPORT_VERSION = 1
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+PHASES = ('transform', 'matrix', 'greedy', 'assignment', 'normalize')
+SNAPSHOT_PHASES = ('load', 'greedy', 'assignment', 'normalize')
+
+# Form layout
+N_PROJECTS = 5
+N_RANKED = 10
+N_AVOIDED = 3
+FRIEND_GROUP = 12
+
+# Above this many teams the cubic Hungarian step takes minutes, so it is skipped
+MAX_ASSIGNMENT_TEAMS = 1500
+
+# Allowed slowdown against the baseline, and the time below which phases are too noisy to compare
+DEFAULT_TOLERANCE = 1.5
+MIN_COMPARED_SECONDS = 0.005
+
+
+def generate_form_rows(n, n_projects=N_PROJECTS, seed=0):
+    """
+    Synthetic form responses for n people, as (header, rows) like the Sheets API returns them
+
+    Every person ranks 3-10 people (mostly from a friend group of nearby
+    names), avoids 0-3 others and ranks every project 1..n_projects
+    """
+    rng = np.random.default_rng(seed)
+    width = len(str(max(n - 1, 0)))
+    names = [f'Student {i:0{width}d}' for i in range(n)]
+    projects = [f'Project {chr(ord("A") + p)}' if p < 26 else f'Project {p}' for p in range(n_projects)]
+
+    header = (['Please Enter Your Name.']
+              + [f'Rank the projects [{p}]' for p in projects]
+              + [f"Rank the people you'd like to work with [Person {k}]" for k in range(1, N_RANKED + 1)]
+              + [f"Choose three people you don't want to work with [{k}]" for k in range(1, N_AVOIDED + 1)])
+
+    # Some projects are popular, the ranking is a noisy sort by popularity
+    popularity = rng.gamma(2.0, 1.0, n_projects)
+    rows = []
+    for i in range(n):
+        keys = np.log(popularity) + rng.gumbel(size=n_projects)
+        ranks = np.empty(n_projects, dtype=int)
+        ranks[np.argsort(-keys)] = np.arange(1, n_projects + 1)
+
+        others = n - 1
+        n_ranked = min(int(rng.integers(3, N_RANKED + 1)), others)
+        group = [(i + d) % n for d in range(-FRIEND_GROUP // 2, FRIEND_GROUP // 2 + 1) if (i + d) % n != i]
+        ranked = []
+        while len(ranked) < n_ranked:
+            if group and rng.random() < 0.8:
+                j = group[int(rng.integers(len(group)))]
+            else:
+                j = int(rng.integers(n))
+            if j != i and j not in ranked:
+                ranked.append(j)
+        n_avoided = min(int(rng.integers(0, N_AVOIDED + 1)), others - n_ranked)
+        avoided = []
+        while len(avoided) < n_avoided:
+            j = int(rng.integers(n))
+            if j != i and j not in ranked and j not in avoided:
+                avoided.append(j)
+
+        row = ([names[i]] + [str(r) for r in ranks]
+               + [names[j] for j in ranked] + [''] * (N_RANKED - len(ranked))
+               + [names[j] for j in avoided])
+        # The API leaves out trailing empty cells
+        while row and row[-1] == '':
+            row.pop()
+        rows.append(row)
+    return header, rows
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=None, seed=0, memory=True,
+                   max_assignment_teams=MAX_ASSIGNMENT_TEAMS, sparse=False, decompose=False, workers=None,
+                   snapshot=None):
+    """
+    Time every phase at every cohort size, on the sparse matrix if sparse is True
+    decompose times decomposition.decompose_teams on `workers` processes
+    instead of the greedy pass. snapshot replays that saved cohort instead of
+    generating cohorts of the given sizes
+
+    repeat defaults to 3 runs (best time kept) below 10k people and 1 above.
+    Returns a report dict, see write_report
+    """
+    results = []
+    phases = SNAPSHOT_PHASES if snapshot else PHASES
+    for n in ([len(load_snapshot(snapshot).matrix)] if snapshot else sizes):
+        cohort = snapshot or generate_form_rows(n, seed=seed)
+        runs = repeat or (3 if n < 10000 else 1)
+        timings = {phase: [] for phase in phases}
+        for _ in range(runs):
+            for phase, seconds, _ in _run_phases(cohort, max_assignment_teams, sparse, decompose, workers, trace=False):
+                timings[phase].append(seconds)
+        peaks = {}
+        if memory:
+            for phase, _, peak in _run_phases(cohort, max_assignment_teams, sparse, decompose, workers, trace=True):
+                peaks[phase] = peak
+        for phase in phases:
+            entry = {'n': n, 'phase': phase}
+            if timings[phase]:
+                entry['seconds'] = min(timings[phase])
+                entry['runs'] = len(timings[phase])
+                if phase in peaks:
+                    entry['peak_bytes'] = peaks[phase]
+            else:
+                entry['skipped'] = True
+            results.append(entry)
+
+    return {
+        'version': REPORT_VERSION,
+        'seed': seed,
+        'sparse': sparse,
+        'decompose': decompose,
+        'workers': workers,
+        'snapshot': snapshot,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def _run_phases(cohort, max_assignment_teams, sparse, decompose, workers, trace):
+    """
+    Helper function
+    Runs the pipeline once on (header, rows) or a snapshot path, yielding
+    (phase, seconds, peak bytes or None)
+    """
+    def timed(fn):
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+        peak = None
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return value, seconds, peak
+
+    if isinstance(cohort, str):
+        (matrix, _), seconds, peak = timed(lambda: load_snapshot(cohort))
+        yield 'load', seconds, peak
+        projects = matrix.projects
+    else:
+        header, rows = cohort
+        (people, teammate_prefs, projects, project_prefs), seconds, peak = timed(
+            lambda: transform_data_for_algorithm(_rows_to_frame(header, rows)))
+        yield 'transform', seconds, peak
+
+        matrix_class = SparseCompatibilityMatrix if sparse else CompatibilityMatrix
+        matrix, seconds, peak = timed(lambda: matrix_class(people, teammate_prefs, projects, project_prefs))
+        yield 'matrix', seconds, peak
+
+    if decompose:
+        teams, seconds, peak = timed(lambda: decompose_teams(matrix, workers=workers))
+    else:
+        teams, seconds, peak = timed(lambda: greedy_teams(matrix))
+    yield 'greedy', seconds, peak
+
+    team_scores = matrix.team_scores(teams)
+    # Enough room on every project for all teams to be assigned
+    capacity = -(-len(teams) // max(len(projects), 1))
+    capacities = {p: capacity for p in projects}
+    if len(teams) <= max_assignment_teams:
+        assigned, seconds, peak = timed(lambda: assign_team_projects(
+            matrix, teams, team_scores, projects, assignment='optimal', project_capacities=capacities))
+        yield 'assignment', seconds, peak
+    else:
+        assigned = assign_team_projects(matrix, teams, team_scores, projects, project_capacities=capacities)
+
+    _, seconds, peak = timed(lambda: score_results(matrix, teams, team_scores, assigned))
+    yield 'normalize', seconds, peak
+
+
+def check_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE, min_seconds=MIN_COMPARED_SECONDS):
+    """
+    Compare a report against a baseline report
+
+    Returns a list of messages, one per phase and size that is more than
+    `tolerance` times slower or larger than in the baseline
+    """
+    reference = {(r['n'], r['phase']): r for r in baseline.get('results', [])}
+    problems = []
+    for entry in report['results']:
+        base = reference.get((entry['n'], entry['phase']))
+        if not base or entry.get('skipped') or base.get('skipped'):
+            continue
+        label = f"{entry['phase']} at n={entry['n']}"
+        if max(entry['seconds'], base['seconds']) >= min_seconds and entry['seconds'] > base['seconds'] * tolerance:
+            problems.append(f"{label}: {entry['seconds']:.4f}s vs {base['seconds']:.4f}s baseline")
+        if 'peak_bytes' in entry and base.get('peak_bytes') and entry['peak_bytes'] > base['peak_bytes'] * tolerance:
+            problems.append(f"{label}: peak {entry['peak_bytes']} bytes vs {base['peak_bytes']} baseline")
+    return problems
+
+
+def write_report(report, path):
+    """Write a report as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    """Read a report written by write_report"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the matching pipeline on synthetic cohorts.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, help='runs per size, the best time is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--sparse', action='store_true', help='use the sparse preference matrix')
+    parser.add_argument('--decompose', action='store_true', help='form teams block by block (decomposition.py)')
+    parser.add_argument('--workers', type=int, help='processes for --decompose (default: CPU count)')
+    parser.add_argument('--snapshot', help='replay this saved cohort (snapshot.py) instead of --sizes')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='report to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, repeat=args.repeat, seed=args.seed, memory=not args.no_memory,
+                            sparse=args.sparse, decompose=args.decompose, workers=args.workers,
+                            snapshot=args.snapshot)
+    write_report(report, args.output)
+    for entry in report['results']:
+        if entry.get('skipped'):
+            print(f"n={entry['n']:>6}  {entry['phase']:<10}  skipped")
+        else:
+            peak = f"  peak {entry['peak_bytes'] / 1e6:.1f} MB" if 'peak_bytes' in entry else ''
+            print(f"n={entry['n']:>6}  {entry['phase']:<10}  {entry['seconds']:.4f}s{peak}")
+
+    if args.baseline:
+        problems = check_regressions(report, load_report(args.baseline), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Command line entry point for scripts and cron jobs.
+
+    python src/cli.py match    --input responses.csv --output results.csv
+    python src/cli.py match    --spreadsheet-id ID --state-file matching_state.json
+    python src/cli.py match    --input responses.csv --output results.csv --pin "Ann" "Bo" --forbid "Cy" "Di"
+    python src/cli.py score    --input responses.csv --results results.csv
+    python src/cli.py whatif   --input responses.csv --results results.csv --swap "Ann" "Bo"
+    python src/cli.py validate --input responses.csv
+    python src/cli.py snapshot --input responses.csv --output cohort.snap
+    python src/cli.py sweep    --input responses.csv --steps 11 --samples 8 --output sweep.csv
+    python src/cli.py bench    --sizes 10,100 --baseline benchmarks/baseline.json
+
+Responses come from a local file (--input, see io_backends.py) or a tab of a
+spreadsheet (--spreadsheet-id, --sheet). match writes to a file (--output) or
+to a range of the same spreadsheet (--range). snapshot saves the cohort's
+preference matrices for replays (snapshot.py), sweep scores the teams under
+many teammate/project weightings (sweep.py). bench takes benchmark.py's
+options.
+
+Each subcommand imports what it needs when it runs. validate only uses the
+standard library, match and score load numpy and the matching modules, and
+the Google client libraries are loaded for a spreadsheet only, so a small run
+is not dominated by interpreter start-up.
+"""
+import argparse
+import sys
+
+DEFAULT_SHEET = 'Form Responses 1'
+DEFAULT_RANGE = 'Team Results!A1'
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Form capstone teams from form responses.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    match = commands.add_parser('match', help='match the responses and write the teams')
+    _add_source_arguments(match)
+    match.add_argument('--output', help='write results to this file')
+    match.add_argument('--range', default=DEFAULT_RANGE,
+                       help='results range in the spreadsheet when there is no --output (default: %(default)s)')
+    match.add_argument('--state-file', help='make runs incremental, keeping their state in this file')
+    match.add_argument('--min-size', type=int, default=2)
+    match.add_argument('--max-size', type=int, default=3)
+    match.add_argument('--assignment', choices=('alphabetical', 'optimal'), default='alphabetical')
+    match.add_argument('--pin', nargs=2, action='append', metavar=('PERSON', 'OTHER'),
+                       help='always put these two in the same team (repeatable)')
+    match.add_argument('--forbid', nargs=2, action='append', metavar=('PERSON', 'OTHER'),
+                       help='never put these two in the same team (repeatable)')
+    match.add_argument('--lock', nargs='+', action='append', metavar='PERSON',
+                       help='keep this team exactly as given (repeatable)')
+    match.add_argument('--exact', action='store_true',
+                       help='provably optimal teams for a small section, prints the size of the search')
+    match.add_argument('--profile', metavar='REPORT', help='write a JSON report of phase timings and counters')
+    match.add_argument('--quiet', action='store_true', help='do not print the teams')
+
+    score = commands.add_parser('score', help='score an existing results table against the responses')
+    _add_source_arguments(score)
+    score.add_argument('--results', required=True, help='results file, as match --output writes it')
+    score.add_argument('--teammate-weight', type=float, default=0.7)
+    score.add_argument('--project-weight', type=float, default=0.3)
+
+    whatif = commands.add_parser('whatif', help='how the scores of a results table change if people swap or move')
+    _add_source_arguments(whatif)
+    whatif.add_argument('--results', required=True, help='results file, as match --output writes it')
+    change = whatif.add_mutually_exclusive_group(required=True)
+    change.add_argument('--swap', nargs=2, metavar=('PERSON', 'OTHER'), help='swap two people between their teams')
+    change.add_argument('--move', nargs=2, metavar=('PERSON', 'TEAMMATE'), help="move a person into a teammate's team")
+    whatif.add_argument('--teammate-weight', type=float, default=0.7)
+    whatif.add_argument('--project-weight', type=float, default=0.3)
+
+    validate = commands.add_parser('validate', help='check the responses before matching')
+    _add_source_arguments(validate)
+
+    snapshot = commands.add_parser('snapshot', help='save the cohort as a memory-mapped snapshot for replays')
+    _add_source_arguments(snapshot)
+    snapshot.add_argument('--output', required=True, help='snapshot file to write')
+    snapshot.add_argument('--matrix', choices=('auto', 'dense', 'sparse'), default='auto',
+                          help='preference matrix to store, auto is sparse for large cohorts (default: %(default)s)')
+
+    sweep = commands.add_parser('sweep', help='score the teams under many teammate/project weightings')
+    _add_source_arguments(sweep)
+    weights = sweep.add_mutually_exclusive_group()
+    weights.add_argument('--steps', type=int, default=11,
+                         help='teammate weights from 0 to 1 in this many steps, project weight 1 - w '
+                              '(default: %(default)s)')
+    weights.add_argument('--random', type=int, metavar='COUNT', help='COUNT random weightings instead')
+    sweep.add_argument('--samples', type=int, default=1, help='team formations, all but the first with noise')
+    sweep.add_argument('--noise', type=float, default=2.0, help='preference noise of the extra samples')
+    sweep.add_argument('--seed', type=int, default=0)
+    sweep.add_argument('--min-size', type=int, default=2)
+    sweep.add_argument('--max-size', type=int, default=3)
+    sweep.add_argument('--assignment', choices=('alphabetical', 'optimal'), default='alphabetical')
+    sweep.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    sweep.add_argument('--output', help='write the table of every weighting and sample to this file')
+
+    commands.add_parser('bench', add_help=False, help="run the benchmarks, takes benchmark.py's options")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'bench':
+        from benchmark import main as benchmark_main
+
+        return benchmark_main(extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return COMMANDS[args.command](args)
+
+
+def run_match(args):
+    import instrumentation
+    from pipeline import run_pipeline
+
+    if not args.output and not args.spreadsheet_id:
+        print("Error: --output is needed when reading from --input", file=sys.stderr)
+        return 2
+    # The exact search reports its size through the instrumentation counters
+    if args.profile or args.exact:
+        instrumentation.enable()
+    source = _make_source(args)
+    if args.output:
+        from io_backends import FileSink
+
+        sink = FileSink(args.output)
+    else:
+        from main import SheetsSink
+
+        sink = SheetsSink(args.spreadsheet_id, args.range)
+
+    # With --state-file, a new constraint only re-forms the teams that break it
+    try:
+        outcome = run_pipeline(source, sink, state_file=args.state_file, min_size=args.min_size,
+                               max_size=args.max_size, assignment=args.assignment, pinned_pairs=args.pin,
+                               forbidden_pairs=args.forbid, locked_teams=args.lock, exact=args.exact)
+    except ValueError as error:
+        instrumentation.disable()
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    if outcome is None:
+        print('No responses found.')
+    else:
+        results, total_score, stats = outcome
+        if not args.quiet:
+            for team, project, score in results:
+                print(f"Team: {team} → {project} (Score: {score}/100)")
+        print(f"{stats['rows']} responses, {len(results)} teams, overall score {total_score}/100")
+        if args.exact:
+            recorder = instrumentation.active()
+            print(f"Exact search: {recorder.counters.get('exact.nodes', 0)} nodes, "
+                  f"{recorder.counters.get('exact.rounds', 0)} rounds, "
+                  f"{recorder.phases.get('exact', {}).get('seconds', 0.0):.3f}s")
+
+    recorder = instrumentation.disable()
+    if args.profile:
+        recorder.write_report(args.profile)
+    return 0
+
+
+def run_score(args):
+    from io_backends import FileSource
+    from pipeline import rescore
+
+    header, rows = _make_source(args).read_rows()
+    results_header, results_rows = FileSource(args.results).read_rows()
+    try:
+        results, total_score = rescore(header, rows, [results_header] + results_rows,
+                                       args.teammate_weight, args.project_weight)
+    except ValueError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    for team, project, score in results:
+        print(f"Team: {team} → {project} (Score: {score}/100)")
+    print(f"Overall Score: {total_score}/100")
+    return 0
+
+
+def run_whatif(args):
+    from io_backends import FileSource
+    from pipeline import load_results
+    from scoring import TeamScorer
+
+    header, rows = _make_source(args).read_rows()
+    results_header, results_rows = FileSource(args.results).read_rows()
+    try:
+        matrix, teams, project_ids = load_results(header, rows, [results_header] + results_rows)
+    except ValueError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    scorer = TeamScorer(matrix, args.teammate_weight, args.project_weight)
+    team_of = {person: t for t, team in enumerate(teams) for person in team}
+
+    person, other = args.swap or args.move
+    if person not in matrix.person_index or other not in matrix.person_index:
+        print(f"Error: {person!r} and {other!r} must both be in the responses", file=sys.stderr)
+        return 1
+    a, b = matrix.person_index[person], matrix.person_index[other]
+    if a not in team_of or b not in team_of or team_of[a] == team_of[b]:
+        print(f"Error: {person!r} and {other!r} must be in two different teams", file=sys.stderr)
+        return 1
+    source, target = team_of[a], team_of[b]
+    projects = (project_ids[source], project_ids[target])
+    if args.swap:
+        outcome = scorer.evaluate_swap(teams[source], teams[target], a, b, projects)
+    else:
+        outcome = scorer.evaluate_move(a, teams[source], teams[target], projects)
+
+    for label, t, before, after in zip((person, other), (source, target), outcome.before, outcome.after):
+        print(f"Team of {label} ({matrix.projects[project_ids[t]]}): "
+              f"{_normalized(scorer, before)} → {_normalized(scorer, after)}")
+    print(f"Change in the two teams' combined score: {outcome.delta:+.3f}")
+    return 0
+
+
+def run_validate(args):
+    from form_parser import check_rows
+
+    header, rows = _make_source(args).read_rows()
+    if header is None:
+        print('No responses found.')
+        return 1
+    errors, warnings = check_rows(header, rows)
+    for message in warnings:
+        print(f"warning: {message}")
+    for message in errors:
+        print(f"error: {message}")
+    print(f"{len(rows)} responses, {len(errors)} errors, {len(warnings)} warnings")
+    return 1 if errors else 0
+
+
+def run_snapshot(args):
+    from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+    from matching_algorithm import SPARSE_MIN_PEOPLE
+    from pipeline import transform_rows_incremental
+    from snapshot import save_snapshot
+
+    header, rows = _make_source(args).read_rows()
+    if not rows:
+        print('No responses found.')
+        return 1
+    (people, teammate_prefs, projects, project_prefs), _, _, _ = transform_rows_incremental(header, rows, None)
+    sparse = args.matrix == 'sparse' or (args.matrix == 'auto' and len(people) >= SPARSE_MIN_PEOPLE)
+    matrix_class = SparseCompatibilityMatrix if sparse else CompatibilityMatrix
+    matrix = matrix_class(people, teammate_prefs, projects, project_prefs)
+    save_snapshot(args.output, matrix, {'source': args.input or args.spreadsheet_id, 'rows': len(rows)})
+    print(f"{len(matrix)} people and {len(projects)} projects saved to {args.output} "
+          f"({'sparse' if sparse else 'dense'} matrix)")
+    return 0
+
+
+def run_sweep(args):
+    import numpy as np
+
+    from compat_matrix import CompatibilityMatrix
+    from pipeline import transform_rows_incremental
+    from sweep import sample_weights, sweep_weights, weight_grid
+
+    header, rows = _make_source(args).read_rows()
+    if not rows:
+        print('No responses found.')
+        return 1
+    (people, teammate_prefs, projects, project_prefs), _, _, _ = transform_rows_incremental(header, rows, None)
+    weights = sample_weights(args.random, args.seed) if args.random else weight_grid(np.linspace(0, 1, args.steps))
+    try:
+        table = sweep_weights(CompatibilityMatrix(people, teammate_prefs, projects, project_prefs), weights,
+                              samples=args.samples, noise=args.noise, seed=args.seed, min_size=args.min_size,
+                              max_size=args.max_size, assignment=args.assignment, workers=args.workers)
+    except ValueError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+
+    for w, (teammate_weight, project_weight) in enumerate(table.weights.tolist()):
+        overall = table.overall[w]
+        print(f"teammate {teammate_weight:.2f} / project {project_weight:.2f}: overall {overall.mean():.1f}/100 "
+              f"(range {overall.min()}-{overall.max()}), stability {table.stability[w].mean():.0%}")
+    if args.output:
+        from io_backends import FileSink
+
+        FileSink(args.output).write(table.to_rows())
+    return 0
+
+
+COMMANDS = {
+    'match': run_match,
+    'score': run_score,
+    'whatif': run_whatif,
+    'validate': run_validate,
+    'snapshot': run_snapshot,
+    'sweep': run_sweep,
+}
+
+
+def _add_source_arguments(parser):
+    """
+    Helper function
+    --input, or --spreadsheet-id with --sheet
+    """
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='read responses from this file')
+    source.add_argument('--spreadsheet-id', help='read responses from this spreadsheet')
+    parser.add_argument('--sheet', default=DEFAULT_SHEET, help='responses tab (default: %(default)s)')
+
+
+def _normalized(scorer, value):
+    """
+    Helper function
+    A combined score on the 1-100 scale of the results, '-' for an emptied team
+    """
+    from scoring import normalize_score
+
+    if not value:
+        return '-'
+    return int(round(normalize_score(value, scorer.teammate_weight, scorer.project_weight)))
+
+
+def _make_source(args):
+    """
+    Helper function
+    ResponseSource for --input or --spreadsheet-id
+    """
+    if args.input:
+        from io_backends import FileSource
+
+        return FileSource(args.input)
+    from main import SheetsSource
+
+    return SheetsSource(args.spreadsheet_id, args.sheet)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+Dense compatibility matrices for the capstone matching algorithm.
+
+The preference dicts produced by transform_data_for_algorithm are turned into
+two arrays once per run:
+
+    prefs   : n x n, prefs[i, j] is how much person i wants to work with j
+    project : n x P, project[i, k] is how much person i wants project k
+
+Pair scores are not stored separately, they are the average of prefs[i, j]
+and prefs[j, i] and are computed from the two directions on demand.
+
+Missing entries get the same neutral defaults the dict helpers use (5 for
+teammates, 3 for projects), so every score computed from the matrices is
+identical to the nested .get(..., default) lookups.
+
+Rows are ordered by sorted name, which is also the tie-break order used by the
+greedy pass.
+
+SparseCompatibilityMatrix keeps the same interface for cohorts too large for
+an n x n array. It stores only the explicit (non-default) teammate ratings in
+CSR form, by rater and by person rated, so memory grows with the number of
+stated preferences instead of n^2. It has no prefs array, so only the greedy
+pass and the scoring run on it (not local search, the exact solver or the
+portfolio).
+"""
+import numpy as np
+
+import instrumentation
+
+DEFAULT_TEAMMATE_PREF = 5
+DEFAULT_PROJECT_PREF = 3
+
+
+class CompatibilityMatrix:
+    """
+    Pair and project score matrices for a single cohort
+
+    Teams are passed around as lists of row indices into self.people
+    """
+
+    def __init__(self, people, teammate_prefs, projects, project_prefs):
+        # A respondent who submitted the form twice still gets a single row
+        self.people = sorted(set(people))
+        self.projects = list(projects)
+        self.person_index = {p: i for i, p in enumerate(self.people)}
+        self.project_index = {p: k for k, p in enumerate(self.projects)}
+
+        n = len(self.people)
+        self.prefs = np.full((n, n), DEFAULT_TEAMMATE_PREF, dtype=np.float64)
+        for person, ratings in teammate_prefs.items():
+            i = self.person_index.get(person)
+            if i is None:
+                continue
+            for other, rating in ratings.items():
+                j = self.person_index.get(other)
+                if j is not None:
+                    self.prefs[i, j] = rating
+        # Nobody is scored against themselves
+        np.fill_diagonal(self.prefs, 0)
+
+        self.project = np.full((n, len(self.projects)), DEFAULT_PROJECT_PREF, dtype=np.float64)
+        for person, ratings in project_prefs.items():
+            i = self.person_index.get(person)
+            if i is None:
+                continue
+            for project, rating in ratings.items():
+                k = self.project_index.get(project)
+                if k is not None:
+                    self.project[i, k] = rating
+
+    @classmethod
+    def from_arrays(cls, prefs, project=None, people=None, projects=None):
+        """
+        Wrap existing arrays without copying them, e.g. a prefs matrix that lives
+        in shared memory. Names default to the row and column numbers
+        """
+        matrix = cls.__new__(cls)
+        n = prefs.shape[0]
+        matrix.people = list(people) if people is not None else list(range(n))
+        if project is None:
+            project = np.full((n, 0), DEFAULT_PROJECT_PREF, dtype=np.float64)
+        matrix.projects = list(projects) if projects is not None else list(range(project.shape[1]))
+        matrix.person_index = {p: i for i, p in enumerate(matrix.people)}
+        matrix.project_index = {p: k for k, p in enumerate(matrix.projects)}
+        matrix.prefs = prefs
+        matrix.project = project
+        return matrix
+
+    def __len__(self):
+        return len(self.people)
+
+    def names(self, team):
+        """Map a team of row indices back to names"""
+        return [self.people[i] for i in team]
+
+    def pair_score(self, a, b):
+        """Compatibility score for a single pair, the average of both directions"""
+        return float((self.prefs[a, b] + self.prefs[b, a]) / 2)
+
+    def pair_scores(self, person, others):
+        """Pair scores between one person and an array of others"""
+        others = np.asarray(others, dtype=np.intp)
+        return (self.prefs[person, others] + self.prefs[others, person]) / 2
+
+    def team_score(self, team):
+        """
+        Average pair score over every pair in the team
+        Same value as calc_team_compatibility_score
+        """
+        instrumentation.count('score.team_evaluations')
+        k = len(team)
+        # Ensure that an error is not thrown if a team of only one person exists
+        if k < 2:
+            return float(DEFAULT_TEAMMATE_PREF)
+        members = np.asarray(team)
+        # The block holds both directions of every pair, so it sums to twice the pair scores
+        total = self.prefs[np.ix_(members, members)].sum() / 2
+        return float(total / (k * (k - 1) // 2))
+
+    def project_score(self, team, project):
+        """Average project preference of the team for one project (by column index)"""
+        return float(self.project[np.asarray(team), project].sum() / len(team))
+
+    def team_scores(self, teams):
+        """
+        Team compatibility scores for many teams at once
+        Teams are grouped by size so each group is a single fancy-indexed sum
+        """
+        instrumentation.count('score.team_evaluations', len(teams))
+        scores = np.full(len(teams), float(DEFAULT_TEAMMATE_PREF))
+        for k, rows, members in _group_by_size(teams):
+            if k < 2:
+                continue
+            block = self.prefs[members[:, :, None], members[:, None, :]]
+            scores[rows] = block.sum(axis=(1, 2)) / 2 / (k * (k - 1) // 2)
+        return scores
+
+    def team_project_scores(self, teams):
+        """
+        Full team x project score matrix
+        Entry [t, k] is the average preference of team t for project k
+        """
+        scores = np.empty((len(teams), len(self.projects)))
+        for k, rows, members in _group_by_size(teams):
+            scores[rows] = self.project[members].sum(axis=1) / k
+        return scores
+
+    def block_sum(self, rows, cols):
+        """Sum of prefs[r, c] over every r in rows and c in cols"""
+        return float(self.prefs[np.ix_(rows, cols)].sum())
+
+    def submatrix(self, rows):
+        """Matrix of just these people (by row index), rows are renumbered 0..len(rows)-1"""
+        rows = np.asarray(rows, dtype=np.intp)
+        return CompatibilityMatrix.from_arrays(self.prefs[np.ix_(rows, rows)])
+
+
+class SparseCompatibilityMatrix:
+    """
+    Same scores as CompatibilityMatrix, with the teammate ratings in CSR form
+
+    indptr, indices, data         : ratings given, row i rated indices[indptr[i]:indptr[i + 1]]
+    in_indptr, in_indices, in_data : ratings received, by the person rated
+    Only ratings different from DEFAULT_TEAMMATE_PREF are stored
+    """
+
+    # Every array the scores are computed from, _keys is rater * n + rated in CSR order
+    CSR_ARRAYS = ('indptr', 'indices', 'data', 'in_indptr', 'in_indices', 'in_data', '_keys')
+
+    def __init__(self, people, teammate_prefs, projects, project_prefs):
+        # A respondent who submitted the form twice still gets a single row
+        self.people = sorted(set(people))
+        self.projects = list(projects)
+        self.person_index = {p: i for i, p in enumerate(self.people)}
+        self.project_index = {p: k for k, p in enumerate(self.projects)}
+
+        raters, rated, values = [], [], []
+        for person, ratings in teammate_prefs.items():
+            i = self.person_index.get(person)
+            if i is None:
+                continue
+            for other, rating in ratings.items():
+                j = self.person_index.get(other)
+                if j is not None:
+                    raters.append(i)
+                    rated.append(j)
+                    values.append(rating)
+        self._build(np.array(raters, dtype=np.intp), np.array(rated, dtype=np.intp),
+                    np.array(values, dtype=np.float64))
+
+        n = len(self.people)
+        self.project = np.full((n, len(self.projects)), DEFAULT_PROJECT_PREF, dtype=np.float64)
+        for person, ratings in project_prefs.items():
+            i = self.person_index.get(person)
+            if i is None:
+                continue
+            for project, rating in ratings.items():
+                k = self.project_index.get(project)
+                if k is not None:
+                    self.project[i, k] = rating
+
+    @classmethod
+    def from_entries(cls, n, raters, rated, values, project=None):
+        """
+        Build from explicit (rater, rated, value) entries, names are the row numbers
+        Later duplicates of an entry win, as with dict assignment
+        """
+        matrix = cls.__new__(cls)
+        matrix.people = list(range(n))
+        if project is None:
+            project = np.full((n, 0), DEFAULT_PROJECT_PREF, dtype=np.float64)
+        matrix.projects = list(range(project.shape[1]))
+        matrix.person_index = {p: i for i, p in enumerate(matrix.people)}
+        matrix.project_index = {p: k for k, p in enumerate(matrix.projects)}
+        matrix.project = project
+        raters = np.asarray(raters, dtype=np.intp)
+        rated = np.asarray(rated, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        matrix._build(raters, rated, values)
+        return matrix
+
+    @classmethod
+    def from_arrays(cls, arrays, project, people=None, projects=None):
+        """
+        Wrap existing CSR arrays without copying them, e.g. the arrays of a
+        memory-mapped snapshot. arrays maps each name in CSR_ARRAYS to its
+        array, as they are stored on a built matrix
+        """
+        matrix = cls.__new__(cls)
+        n = project.shape[0]
+        matrix.people = list(people) if people is not None else list(range(n))
+        matrix.projects = list(projects) if projects is not None else list(range(project.shape[1]))
+        matrix.person_index = {p: i for i, p in enumerate(matrix.people)}
+        matrix.project_index = {p: k for k, p in enumerate(matrix.projects)}
+        matrix.project = project
+        for name in cls.CSR_ARRAYS:
+            setattr(matrix, name, arrays[name])
+        return matrix
+
+    def _build(self, raters, rated, values):
+        n = len(self.people)
+        keys = raters * n + rated
+        # Keep the last of any repeated entry, then order by (rater, rated)
+        last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+        # Defaults and self-ratings need no entry
+        last = last[(raters[last] != rated[last]) & (values[last] != DEFAULT_TEAMMATE_PREF)]
+        keys, raters, rated, values = keys[last], raters[last], rated[last], values[last]
+        self._keys = keys
+        self.indices = rated
+        self.data = values
+        self.indptr = np.searchsorted(raters, np.arange(n + 1))
+
+        by_rated = np.lexsort((raters, rated))
+        self.in_indices = raters[by_rated]
+        self.in_data = values[by_rated]
+        self.in_indptr = np.searchsorted(rated[by_rated], np.arange(n + 1))
+
+    @property
+    def nnz(self):
+        """Number of stored ratings"""
+        return len(self.data)
+
+    def __len__(self):
+        return len(self.people)
+
+    def names(self, team):
+        """Map a team of row indices back to names"""
+        return [self.people[i] for i in team]
+
+    def lookup(self, raters, rated):
+        """prefs[raters, rated] elementwise, with 0 on the diagonal like the dense matrix"""
+        raters = np.asarray(raters, dtype=np.intp)
+        rated = np.asarray(rated, dtype=np.intp)
+        keys = raters * len(self.people) + rated
+        pos = np.searchsorted(self._keys, keys)
+        found = pos < len(self._keys)
+        found[found] = self._keys[pos[found]] == keys[found]
+        values = np.full(keys.shape, float(DEFAULT_TEAMMATE_PREF))
+        values[found] = self.data[pos[found]]
+        values[raters == rated] = 0
+        return values
+
+    def given(self, i):
+        """(people rated, ratings) stated by person i"""
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.data[lo:hi]
+
+    def received(self, j):
+        """(raters, ratings) of everyone who stated a rating for person j"""
+        lo, hi = self.in_indptr[j], self.in_indptr[j + 1]
+        return self.in_indices[lo:hi], self.in_data[lo:hi]
+
+    def pair_score(self, a, b):
+        """Compatibility score for a single pair, the average of both directions"""
+        return float(self.lookup([a, b], [b, a]).sum() / 2)
+
+    def pair_scores(self, person, others):
+        """Pair scores between one person and an array of others"""
+        others = np.asarray(others, dtype=np.intp)
+        person = np.full(others.shape, person, dtype=np.intp)
+        return (self.lookup(person, others) + self.lookup(others, person)) / 2
+
+    def team_score(self, team):
+        """Average pair score over every pair in the team"""
+        return float(self.team_scores([team])[0])
+
+    def project_score(self, team, project):
+        """Average project preference of the team for one project (by column index)"""
+        return float(self.project[np.asarray(team), project].sum() / len(team))
+
+    def team_scores(self, teams):
+        """
+        Team compatibility scores for many teams at once
+        Every ordered pair of each size group is looked up in one searchsorted call
+        """
+        instrumentation.count('score.team_evaluations', len(teams))
+        scores = np.full(len(teams), float(DEFAULT_TEAMMATE_PREF))
+        for k, rows, members in _group_by_size(teams):
+            if k < 2:
+                continue
+            a = np.broadcast_to(members[:, :, None], (len(rows), k, k))
+            b = np.broadcast_to(members[:, None, :], (len(rows), k, k))
+            scores[rows] = self.lookup(a, b).sum(axis=(1, 2)) / 2 / (k * (k - 1) // 2)
+        return scores
+
+    def team_project_scores(self, teams):
+        """
+        Full team x project score matrix
+        Entry [t, k] is the average preference of team t for project k
+        """
+        scores = np.empty((len(teams), len(self.projects)))
+        for k, rows, members in _group_by_size(teams):
+            scores[rows] = self.project[members].sum(axis=1) / k
+        return scores
+
+    def block_sum(self, rows, cols):
+        """Sum of prefs[r, c] over every r in rows and c in cols"""
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        return float(self.lookup(rows[:, None], cols[None, :]).sum())
+
+    def submatrix(self, rows):
+        """Matrix of just these people (by row index), rows are renumbered 0..len(rows)-1"""
+        rows = np.asarray(rows, dtype=np.intp)
+        position = np.full(len(self.people), -1, dtype=np.intp)
+        position[rows] = np.arange(len(rows))
+        raters = np.repeat(np.arange(len(self.people)), np.diff(self.indptr))
+        keep = (position[raters] >= 0) & (position[self.indices] >= 0)
+        return SparseCompatibilityMatrix.from_entries(
+            len(rows), position[raters[keep]], position[self.indices[keep]], self.data[keep])
+
+
+def _group_by_size(teams):
+    """
+    Helper function
+    Yields (size, row positions, members array) for each distinct team size
+    """
+    by_size = {}
+    for t, team in enumerate(teams):
+        by_size.setdefault(len(team), []).append(t)
+    for k, rows in by_size.items():
+        if k == 0:
+            continue
+        members = np.array([teams[t] for t in rows], dtype=np.intp)
+        yield k, np.array(rows, dtype=np.intp), members
@@ -0,0 +1,127 @@
+"""
+Hard constraints on team formation, set by the coordinator.
+
+Avoid lists in the form only lower a pair's score. TeamConstraints holds rules
+the matching must keep:
+
+    pinned pairs    : the two people end up in the same team. Pairs chain, so
+                      pinning A-B and B-C puts all three together (a pinned group)
+    forbidden pairs : the two people never share a team
+    locked teams    : complete teams that are kept exactly as they are
+
+People are row indices of a compatibility matrix, from_names builds the
+constraints from names. Forbidden pairs are kept as a bitset adjacency matrix
+(one packed row of bits per person), so greedy_teams finds everyone a team
+may not take with a few byte-wide ORs instead of walking pair lists.
+"""
+import numpy as np
+
+
+class TeamConstraints:
+    """
+    Pinned groups, forbidden pairs and locked teams of one cohort of n people
+
+    Raises ValueError for constraints that contradict each other
+    """
+
+    def __init__(self, n, pinned_pairs=(), forbidden_pairs=(), locked_teams=()):
+        self.n = n
+        self.pinned_pairs = [(int(a), int(b)) for a, b in pinned_pairs]
+        self.forbidden_pairs = [(int(a), int(b)) for a, b in forbidden_pairs]
+        self.locked_teams = [[int(p) for p in team] for team in locked_teams]
+
+        # Pinned groups by union-find, every person starts in their own group
+        parent = list(range(n))
+
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for a, b in self.pinned_pairs:
+            parent[root(a)] = root(b)
+        members = {}
+        for i in range(n):
+            members.setdefault(root(i), []).append(i)
+        self._groups = {}
+        for group in members.values():
+            if len(group) > 1:
+                for i in group:
+                    self._groups[i] = group
+
+        # Bit j of row i (numpy's packbits order) is set when i and j may not share a team
+        self.forbidden = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+        for a, b in self.forbidden_pairs:
+            if a == b:
+                raise ValueError("A person cannot be forbidden from their own team")
+            self.forbidden[a, b >> 3] |= 0x80 >> (b & 7)
+            self.forbidden[b, a >> 3] |= 0x80 >> (a & 7)
+
+        for group in self._groups.values():
+            if self.blocked(group)[group].any():
+                raise ValueError("A forbidden pair is also pinned together")
+        locked = set()
+        for team in self.locked_teams:
+            if locked.intersection(team):
+                raise ValueError("A person is in more than one locked team")
+            locked.update(team)
+            if not self.allows(team):
+                raise ValueError("A locked team breaks a pinned or forbidden pair")
+
+    @classmethod
+    def from_names(cls, person_index, pinned_pairs=(), forbidden_pairs=(), locked_teams=()):
+        """
+        Constraints given by name, person_index maps names to row indices
+        Raises ValueError for a name that is not in the cohort
+        """
+        def ids(names):
+            found = []
+            for name in names:
+                if name not in person_index:
+                    raise ValueError(f"{name!r} is not in the cohort")
+                found.append(person_index[name])
+            return found
+
+        return cls(len(person_index),
+                   pinned_pairs=[ids(pair) for pair in pinned_pairs],
+                   forbidden_pairs=[ids(pair) for pair in forbidden_pairs],
+                   locked_teams=[ids(team) for team in locked_teams])
+
+    def __bool__(self):
+        return bool(self.pinned_pairs or self.forbidden_pairs or self.locked_teams)
+
+    def group(self, i):
+        """Everyone pinned together with i, i included"""
+        return self._groups.get(i, [i])
+
+    def largest_group(self):
+        return max((len(group) for group in self._groups.values()), default=1)
+
+    def forbids(self, a, b):
+        """True if a and b may not share a team"""
+        return bool(self.forbidden[a, b >> 3] & (0x80 >> (b & 7)))
+
+    def blocked(self, members):
+        """Boolean mask of everyone forbidden with at least one of the members"""
+        rows = np.bitwise_or.reduce(self.forbidden[np.asarray(members, dtype=np.intp)], axis=0)
+        return np.unpackbits(rows, count=self.n).astype(bool)
+
+    def allows(self, team):
+        """True if the team holds the whole pinned group of each member and no forbidden pair"""
+        members = set(team)
+        if any(not members.issuperset(self.group(i)) for i in team):
+            return False
+        return not self.blocked(team)[list(team)].any()
+
+    def restricted(self, rows):
+        """
+        The pinned and forbidden pairs among just these people (by row index),
+        renumbered 0..len(rows)-1 like matrix.submatrix. Locked teams are left out
+        """
+        position = {int(r): i for i, r in enumerate(rows)}
+
+        def inside(pairs):
+            return [(position[a], position[b]) for a, b in pairs if a in position and b in position]
+
+        return TeamConstraints(len(rows), inside(self.pinned_pairs), inside(self.forbidden_pairs))
@@ -0,0 +1,324 @@
+"""
+Graph-partition decomposition of very large cohorts.
+
+Most people only rate people in their own circle of friends and major, so the
+greedy pass over the whole cohort mostly compares people who never mentioned
+each other. decompose_teams splits the cohort into blocks of at most
+block_size people and forms teams in each block independently:
+
+    1. preference_graph: the mutual-preference graph, an edge between two
+       people whose pair score is above the neutral default, weighted by how
+       far above it is
+    2. partition: connected components of that graph. A component larger
+       than block_size is cut into pieces by region growing, then a
+       size-bounded refinement moves people to the neighbouring block they
+       are most strongly tied to. Small components are packed together into blocks
+    3. greedy_teams on every block's sub-matrix, across worker processes
+    4. boundary fixing: the teams of people more strongly tied to someone
+       in another block than to their own team are formed again together
+       (greedy_teams again, in pieces of at most block_size people), and the
+       new teams are kept if their average score is at least as high
+
+Every step keeps min_size..max_size, as greedy_teams does. Blocks and
+boundary pieces only exchange their sub-matrices and teams with the workers,
+so the wall time of steps 3 and 4 shrinks with the number of cores.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import instrumentation
+from compat_matrix import DEFAULT_TEAMMATE_PREF, SparseCompatibilityMatrix
+from matching_algorithm import greedy_teams
+
+DEFAULT_BLOCK_SIZE = 2000
+
+# Refinement sweeps, and how far a block may grow past block_size while refining
+REFINE_PASSES = 2
+REFINE_SLACK = 0.05
+
+
+def decompose_teams(matrix, min_size=2, max_size=3, block_size=DEFAULT_BLOCK_SIZE, workers=None):
+    """
+    Teams of row indices for a CompatibilityMatrix or SparseCompatibilityMatrix,
+    formed block by block
+
+    workers : process count, defaults to os.cpu_count(), 1 solves every block
+              in this process
+    """
+    n = len(matrix)
+    if n <= block_size:
+        return greedy_teams(matrix, min_size, max_size)
+
+    with instrumentation.phase('decompose.partition'):
+        graph = preference_graph(matrix)
+        blocks = partition(graph, n, block_size, min_size)
+    instrumentation.count('decompose.blocks', len(blocks))
+
+    workers = min(workers or os.cpu_count() or 1, len(blocks))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    run = pool.map if pool is not None else map
+    try:
+        with instrumentation.phase('decompose.solve'):
+            tasks = [(matrix.submatrix(block), min_size, max_size) for block in blocks]
+            teams = [[int(block[i]) for i in team]
+                     for block, block_teams in zip(blocks, run(_solve_block, tasks)) for team in block_teams]
+
+        with instrumentation.phase('decompose.stitch'):
+            block_of = np.empty(n, dtype=np.intp)
+            for b, block in enumerate(blocks):
+                block_of[block] = b
+            teams = fix_boundaries(matrix, teams, graph, block_of, min_size, max_size, block_size, map=run)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return teams
+
+
+def preference_graph(matrix):
+    """
+    Symmetric CSR graph (indptr, indices, weights) of the pairs whose pair
+    score is above DEFAULT_TEAMMATE_PREF, weighted by the excess
+    """
+    n = len(matrix)
+    if isinstance(matrix, SparseCompatibilityMatrix):
+        raters = np.repeat(np.arange(n), np.diff(matrix.indptr))
+        rated = matrix.indices.astype(np.intp)
+        values = matrix.data
+    else:
+        explicit = matrix.prefs != DEFAULT_TEAMMATE_PREF
+        np.fill_diagonal(explicit, False)
+        raters, rated = np.nonzero(explicit)
+        values = matrix.prefs[raters, rated]
+
+    # Each stated rating adds half its deviation to the pair, in both directions
+    a = np.concatenate([raters, rated])
+    b = np.concatenate([rated, raters])
+    half = np.concatenate([values, values]) / 2 - DEFAULT_TEAMMATE_PREF / 2
+    keys, inverse = np.unique(a.astype(np.int64) * n + b, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), weights=half, minlength=len(keys))
+    keep = weights > 0
+    keys, weights = keys[keep], weights[keep]
+    sources, targets = keys // n, keys % n
+
+    indptr = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets.astype(np.intp), weights
+
+
+def connected_components(graph, n):
+    """Component label of every person, the lowest row index in their component"""
+    indptr, indices, _ = graph
+    a = np.repeat(np.arange(n), np.diff(indptr))
+    b = indices
+    labels = np.arange(n)
+    while True:
+        # Hook each root onto the smallest root it has an edge to, then jump pointers to the roots
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[a], labels[b])
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def partition(graph, n, block_size, min_size=2):
+    """
+    Blocks (sorted arrays of row indices) of at most about block_size people,
+    each with at least min_size people when the cohort has that many
+    """
+    labels = connected_components(graph, n)
+    order = np.argsort(labels, kind='stable')
+    _, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+    components = [order[s:s + c] for s, c in zip(starts, counts)]
+
+    blocks = []
+    small = []
+    for component in components:
+        if len(component) > block_size:
+            blocks.extend(_split_component(graph, component, block_size))
+        else:
+            small.append(component)
+
+    # Small components are packed largest first, a block is closed once the next one does not fit
+    small.sort(key=len, reverse=True)
+    current = []
+    current_size = 0
+    for component in small:
+        if current and current_size + len(component) > block_size:
+            blocks.append(np.concatenate(current))
+            current, current_size = [], 0
+        current.append(component)
+        current_size += len(component)
+    if current:
+        blocks.append(np.concatenate(current))
+
+    # A block too small for one team joins the smallest other block
+    blocks.sort(key=len)
+    while len(blocks) > 1 and len(blocks[0]) < min_size:
+        merged = np.concatenate([blocks.pop(0), blocks.pop(0)])
+        blocks.append(merged)
+        blocks.sort(key=len)
+    return [np.sort(block) for block in blocks]
+
+
+def fix_boundaries(matrix, teams, graph, block_of, min_size, max_size, block_size=DEFAULT_BLOCK_SIZE, map=map):
+    """
+    Forms the teams of people on a block boundary again, together, in pieces
+    of at most block_size people. A piece's new teams replace the old ones
+    when their average team score is at least as high
+
+    A person is on the boundary when they have a stronger tie to someone in
+    another block than to their whole team. map runs the pieces, e.g. a
+    process pool's map
+    """
+    indptr, indices, weights = graph
+    n = len(block_of)
+    team_of = np.empty(n, dtype=np.intp)
+    for t, team in enumerate(teams):
+        team_of[team] = t
+    sources = np.repeat(np.arange(n), np.diff(indptr))
+    own = np.bincount(sources, weights=np.where(team_of[sources] == team_of[indices], weights, 0.0), minlength=n)
+    crossing = np.flatnonzero(block_of[sources] != block_of[indices])
+    # Strongest tie across blocks, and the block it leads to
+    strongest = np.zeros(n)
+    np.maximum.at(strongest, sources[crossing], weights[crossing])
+    boundary = strongest > own
+    instrumentation.count('decompose.boundary_people', int(boundary.sum()))
+    if not boundary.any():
+        return teams
+    partner_block = np.array(block_of)
+    best = crossing[weights[crossing] == strongest[sources[crossing]]]
+    partner_block[sources[best]] = block_of[indices[best]]
+
+    # Pieces follow the pair of blocks a boundary is between, so both sides of it meet
+    touched = {}
+    for i in np.flatnonzero(boundary).tolist():
+        pair = tuple(sorted((int(block_of[i]), int(partner_block[i]))))
+        touched.setdefault(int(team_of[i]), pair)
+    order = sorted(touched, key=lambda t: (touched[t], t))
+    pieces = [[]]
+    piece_size = 0
+    for t in order:
+        if pieces[-1] and piece_size + len(teams[t]) > block_size:
+            pieces.append([])
+            piece_size = 0
+        pieces[-1].append(t)
+        piece_size += len(teams[t])
+
+    pools = [sorted(p for t in piece for p in teams[t]) for piece in pieces]
+    tasks = [(matrix.submatrix(pool), min_size, max_size) for pool in pools]
+    result = [team for t, team in enumerate(teams) if t not in touched]
+    for piece, pool, solved in zip(pieces, pools, map(_solve_block, tasks)):
+        old = [teams[t] for t in piece]
+        new = [[pool[i] for i in team] for team in solved]
+        result.extend(new if np.mean(matrix.team_scores(new)) >= np.mean(matrix.team_scores(old)) else old)
+    return result
+
+
+def _split_component(graph, component, block_size):
+    """
+    Helper function
+    Cuts one large component into pieces of about block_size people by region
+    growing, then refines the cut
+
+    A piece grows by taking the outside person with the most edge weight into
+    it, so it follows dense circles of friends rather than single long edges.
+    The next piece starts from the previous piece's strongest outside person
+    """
+    indptr, indices, weights = graph
+    n_pieces = -(-len(component) // block_size)
+    target = -(-len(component) // n_pieces)
+
+    piece_of = {}
+    unplaced = sorted(component.tolist(), reverse=True)
+    seed = None
+    for piece in range(n_pieces):
+        # Max-heap on the weight into the piece, with lazy deletion of stale entries
+        tie = {}
+        heap = []
+        size = 0
+        while size < target and len(piece_of) < len(component):
+            if not heap:
+                if seed is None:
+                    # First piece, or the piece ran out of neighbours
+                    while unplaced[-1] in piece_of:
+                        unplaced.pop()
+                    seed = unplaced[-1]
+                tie[seed] = 0.0
+                heap.append((0.0, seed))
+                seed = None
+            neg_weight, i = heapq.heappop(heap)
+            if i in piece_of or -neg_weight != tie[i]:
+                continue
+            piece_of[i] = piece
+            size += 1
+            for j, w in zip(indices[indptr[i]:indptr[i + 1]].tolist(), weights[indptr[i]:indptr[i + 1]].tolist()):
+                if j not in piece_of:
+                    tie[j] = tie.get(j, 0.0) + w
+                    heapq.heappush(heap, (-tie[j], j))
+        while heap:
+            neg_weight, i = heapq.heappop(heap)
+            if i not in piece_of and -neg_weight == tie[i]:
+                seed = i
+                break
+
+    pieces = _refine(graph, piece_of, n_pieces, int(target * (1 + REFINE_SLACK)))
+    return [np.array(sorted(piece), dtype=np.intp) for piece in pieces if piece]
+
+
+def _refine(graph, piece_of, n_pieces, max_piece):
+    """
+    Helper function
+    Moves people to the piece they have the most edge weight to, most gain
+    first, as long as the target piece stays within max_piece people
+    Returns the pieces as lists of row indices
+    """
+    indptr, indices, weights = graph
+    sizes = [0] * n_pieces
+    for piece in piece_of.values():
+        sizes[piece] += 1
+
+    for _ in range(REFINE_PASSES):
+        moves = []
+        for i, piece in piece_of.items():
+            ties = {}
+            for j, w in zip(indices[indptr[i]:indptr[i + 1]].tolist(), weights[indptr[i]:indptr[i + 1]].tolist()):
+                ties[piece_of[j]] = ties.get(piece_of[j], 0.0) + w
+            own = ties.pop(piece, 0.0)
+            if ties:
+                best = max(ties, key=lambda p: (ties[p], -p))
+                if ties[best] > own:
+                    moves.append((own - ties[best], i, best))
+        if not moves:
+            break
+        moves.sort()
+        moved = 0
+        for _, i, best in moves:
+            if sizes[best] < max_piece:
+                sizes[piece_of[i]] -= 1
+                sizes[best] += 1
+                piece_of[i] = best
+                moved += 1
+        if not moved:
+            break
+
+    pieces = [[] for _ in range(n_pieces)]
+    for i, piece in piece_of.items():
+        pieces[piece].append(i)
+    return pieces
+
+
+def _solve_block(task):
+    """
+    Helper function
+    Worker: greedy teams of one block, in the block's own row numbers
+    """
+    submatrix, min_size, max_size = task
+    return greedy_teams(submatrix, min_size, max_size)
@@ -0,0 +1,165 @@
+"""
+Exact team formation for small cohorts.
+
+solve_exact returns the partition of everyone into teams of min_size..max_size
+with the highest average team compatibility score, the same objective the
+local-search pass climbs. It is meant for sections of up to about 20-24
+students and as a reference for how far the greedy result is from optimal.
+
+Method
+~~~~~~
+
+Bitmask dynamic programming over the set of people still to be placed:
+
+    best[R] = max over teams T containing the lowest member of R
+              of (score(T) - lam) + best[R without T]
+
+Fixing the lowest member means each partition is built in exactly one order.
+For a given lowest member b, every remaining set is b plus a subset of the
+people after b. Those subsets are laid out as an array with one length-2 axis
+per person, so the update for one team T is a single in-place np.maximum over
+two strided slices (rest of T absent / rest of T present), with no index arrays.
+
+Because the objective is an average and the number of teams is not fixed, the
+DP maximises sum(score - lam) and lam is refined with Dinkelbach's method
+(lam = average of the last optimum) until no partition beats lam. This takes a
+handful of rounds, usually two or three when started from the greedy teams.
+"""
+import itertools
+import time
+
+import numpy as np
+
+import instrumentation
+
+# 2^n DP table, 24 people is about 200MB
+MAX_EXACT_PEOPLE = 24
+
+# Ignore floating point noise when comparing against lam
+_EPSILON = 1e-9
+
+
+def solve_exact(matrix, min_size=2, max_size=3, initial_teams=None):
+    """
+    Provably optimal teams for a CompatibilityMatrix with at most MAX_EXACT_PEOPLE people
+
+    initial_teams : list[list[int]], optional
+        a known partition (e.g. the greedy teams) used as the starting point
+
+    Returns (teams, stats), where stats holds
+        nodes     : number of (team, remaining set) combinations evaluated
+        rounds    : number of Dinkelbach rounds
+        seconds   : wall-clock time
+        objective : average team compatibility score of the returned teams
+    """
+    start = time.perf_counter()
+    n = len(matrix)
+    if n > MAX_EXACT_PEOPLE:
+        raise ValueError(f"Exact mode supports at most {MAX_EXACT_PEOPLE} people, got {n}")
+    if n == 0:
+        return [], {'nodes': 0, 'rounds': 0, 'seconds': 0.0, 'objective': 0.0}
+
+    team_masks, team_members, team_scores = _candidate_teams(matrix, min_size, max_size)
+
+    best_teams = None
+    lam = 0.0
+    if initial_teams and all(min_size <= len(t) <= max_size for t in initial_teams):
+        best_teams = [sorted(t) for t in initial_teams]
+        lam = float(np.mean(matrix.team_scores(best_teams)))
+
+    nodes = 0
+    rounds = 0
+    while True:
+        rounds += 1
+        value, teams, explored = _solve_for_lambda(n, team_masks, team_members, team_scores, lam)
+        nodes += explored
+        if teams is None:
+            raise ValueError(f"{n} people cannot be split into teams of {min_size}-{max_size}")
+        # Nothing beats the current average, so the partition behind lam is optimal
+        if best_teams is not None and value <= _EPSILON:
+            break
+        best_teams = teams
+        lam = float(np.mean(matrix.team_scores(teams)))
+
+    instrumentation.count('exact.nodes', nodes)
+    instrumentation.count('exact.rounds', rounds)
+    stats = {
+        'nodes': nodes,
+        'rounds': rounds,
+        'seconds': time.perf_counter() - start,
+        'objective': lam,
+    }
+    return best_teams, stats
+
+
+def _candidate_teams(matrix, min_size, max_size):
+    """
+    Helper function
+    Every valid team grouped by its lowest member, with its bitmask and score
+
+    Returns three dicts keyed by lowest member: masks, member tuples, scores
+    """
+    n = len(matrix)
+    team_masks, team_members, team_scores = {}, {}, {}
+    for b in range(n):
+        members = []
+        for size in range(max(min_size, 1), max_size + 1):
+            for rest in itertools.combinations(range(b + 1, n), size - 1):
+                members.append((b,) + rest)
+        team_members[b] = members
+        team_masks[b] = [sum(1 << i for i in team) for team in members]
+        team_scores[b] = matrix.team_scores([list(t) for t in members]) if members else np.empty(0)
+    return team_masks, team_members, team_scores
+
+
+def _solve_for_lambda(n, team_masks, team_members, team_scores, lam):
+    """
+    Helper function
+    Runs the DP for one value of lam
+
+    Returns (best sum of score - lam, teams, nodes explored), teams is None when
+    no valid partition exists
+    """
+    full = (1 << n) - 1
+    best = np.full(1 << n, -np.inf)
+    best[0] = 0.0
+    nodes = 0
+
+    # Later members first, so every smaller remaining set is already solved
+    for b in range(n - 1, -1, -1):
+        higher = n - 1 - b
+        step = 1 << (b + 1)
+        # Sets whose lowest member is after b (already solved) and sets whose lowest
+        # member is b, both indexed by the subset X of people after b. Viewed with one
+        # axis of length 2 per person, "X avoids the team and X + team" is plain slicing.
+        shape = (2,) * higher
+        solved = best[0::step].copy().reshape(shape)
+        target = np.full(1 << higher, -np.inf).reshape(shape)
+        for t, team in enumerate(team_members[b]):
+            # Axis 0 is the last person, the person right after b is the last axis
+            without = [slice(None)] * higher
+            with_team = [slice(None)] * higher
+            for m in team[1:]:
+                without[n - 1 - m] = 0
+                with_team[n - 1 - m] = 1
+            # The trailing Ellipsis keeps a view even when every axis is fixed
+            dst = target[tuple(with_team) + (Ellipsis,)]
+            src = solved[tuple(without) + (Ellipsis,)]
+            np.maximum(dst, src + (team_scores[b][t] - lam), out=dst)
+            nodes += src.size
+        best[1 << b::step] = target.reshape(-1)
+
+    if not np.isfinite(best[full]):
+        return -np.inf, None, nodes
+
+    # Walk back from the full set, at each step taking the first team that explains best[]
+    teams = []
+    remaining = full
+    while remaining:
+        b = (remaining & -remaining).bit_length() - 1
+        for t, mask in enumerate(team_masks[b]):
+            if mask & remaining == mask and best[remaining] == best[remaining ^ mask] + (team_scores[b][t] - lam):
+                break
+        teams.append(list(team_members[b][t]))
+        remaining ^= mask
+    return float(best[full]), teams, nodes
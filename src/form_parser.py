@@ -0,0 +1,176 @@
+"""
+Pure-Python parsing of form response rows into preferences.
+
+Gives the same result as transform_data_for_algorithm in main.py on a
+DataFrame of the same rows, without importing pandas or numpy, so scripts
+that only parse or validate a cohort start quickly.
+
+Rows are lists of cell values as the Sheets API or io_backends return them.
+Short rows are treated as if padded with empty cells. A cell counts as filled
+unless it is None, NaN or a blank string: CSV exports and the Sheets API give
+'' for a blank cell between filled ones.
+"""
+from collections import namedtuple
+
+NAME_COLUMN = 'Please Enter Your Name.'
+PROJECT_PREFIX = 'Rank the projects'
+RANK_PREFIX = "Rank the people you'd like to work with"
+AVOID_PREFIX = "Choose three people you don't want"
+
+# Column positions of each kind of question in the header
+FormLayout = namedtuple('FormLayout', ['name', 'projects', 'project_columns', 'rank_columns', 'avoid_columns'])
+
+
+def parse_header(header):
+    """
+    FormLayout of a header row
+
+    project_columns is [(position, project column)], rank_columns is
+    [(position, score)] where ranking someone k-th scores max(1, 11 - k)
+    Raises KeyError if there is no name column
+    """
+    if NAME_COLUMN not in header:
+        raise KeyError(NAME_COLUMN)
+    projects = []
+    project_columns = []
+    rank_columns = []
+    avoid_columns = []
+    for pos, col in enumerate(header):
+        if col.startswith(PROJECT_PREFIX):
+            project_columns.append((pos, len(projects)))
+            projects.append(col.split('[')[1].rstrip(']'))
+        elif col.startswith(RANK_PREFIX):
+            rank = int(col.split('[Person ')[1].rstrip(']').strip())
+            rank_columns.append((pos, max(1, 11 - rank)))
+        elif col.startswith(AVOID_PREFIX):
+            avoid_columns.append(pos)
+    return FormLayout(header.index(NAME_COLUMN), projects, project_columns, rank_columns, avoid_columns)
+
+
+def parse_row(layout, row):
+    """
+    (person, teammate prefs, project prefs) of one row
+
+    Teammate names are not checked against the cohort. A ranking r scores
+    6 - r, people to avoid score 1 even if they were also ranked
+    """
+    person = _cell(row, layout.name)
+
+    project_prefs = {}
+    for pos, k in layout.project_columns:
+        value = _cell(row, pos)
+        if _filled(value):
+            project_prefs[layout.projects[k]] = 6 - int(value)
+
+    teammate_prefs = {}
+    for pos, score in layout.rank_columns:
+        name = _cell(row, pos)
+        if _filled(name):
+            teammate_prefs[name] = score
+    for pos in layout.avoid_columns:
+        name = _cell(row, pos)
+        if _filled(name):
+            teammate_prefs[name] = 1
+    return person, teammate_prefs, project_prefs
+
+
+def parse_rows(header, rows, check_names=True):
+    """
+    Same result as transform_data_for_algorithm on a DataFrame of these rows:
+    (people, teammate_prefs, projects, project_prefs)
+
+    check_names=False keeps teammates who are not in the name column
+    """
+    layout = parse_header(header)
+    people = []
+    teammate_prefs = {}
+    project_prefs = {}
+    for row in rows:
+        person, teammates, projects = parse_row(layout, row)
+        people.append(person)
+        teammate_prefs[person] = teammates
+        project_prefs[person] = projects
+
+    if check_names:
+        known = set(people)
+        teammate_prefs = {
+            person: {name: score for name, score in prefs.items() if name in known}
+            for person, prefs in teammate_prefs.items()
+        }
+    return people, teammate_prefs, list(layout.projects), project_prefs
+
+
+def check_rows(header, rows):
+    """
+    Problems that would make the responses match badly, as (errors, warnings)
+    lists of messages. Rows are numbered as in the sheet, the header is row 1
+
+    errors   : a missing or malformed header, a missing or repeated name, a
+               project rank that is not a whole number from 1 to the number of
+               projects
+    warnings : teammates who did not respond (they are ignored when
+               matching), people who ranked themselves
+    """
+    try:
+        layout = parse_header(header)
+    except KeyError:
+        return [f"The header has no {NAME_COLUMN!r} column"], []
+    except (IndexError, ValueError):
+        return ["The header has a teammate ranking column without a person number"], []
+
+    errors = []
+    warnings = []
+    if not layout.projects:
+        errors.append("The header has no project ranking columns")
+
+    names = [_cell(row, layout.name) for row in rows]
+    known = set(names)
+    first_row = {}
+    for number, (name, row) in enumerate(zip(names, rows), start=2):
+        if not _filled(name):
+            errors.append(f"Row {number}: no name")
+            continue
+        if name in first_row:
+            errors.append(f"Row {number}: {name!r} already answered in row {first_row[name]}")
+        else:
+            first_row[name] = number
+
+        for pos, k in layout.project_columns:
+            value = _cell(row, pos)
+            if not _filled(value):
+                continue
+            try:
+                rank = int(value)
+            except (TypeError, ValueError):
+                rank = None
+            if rank is None or not 1 <= rank <= len(layout.projects):
+                errors.append(f"Row {number}: rank {value!r} for project {layout.projects[k]!r} "
+                              f"is not between 1 and {len(layout.projects)}")
+
+        for pos in [pos for pos, _ in layout.rank_columns] + layout.avoid_columns:
+            other = _cell(row, pos)
+            if not _filled(other):
+                continue
+            if other == name:
+                warnings.append(f"Row {number}: {name!r} named themselves")
+            elif other not in known:
+                warnings.append(f"Row {number}: {other!r} did not respond and is ignored")
+    return errors, warnings
+
+
+def _cell(row, pos):
+    """
+    Helper function
+    Cell value, None past the end of a short row
+    """
+    return row[pos] if pos < len(row) else None
+
+
+def _filled(value):
+    """
+    Helper function
+    pd.notna for a single cell, with blank strings counted as empty too
+    """
+    if isinstance(value, str):
+        return bool(value.strip())
+    return value is not None and value == value
@@ -0,0 +1,257 @@
+"""
+Per-phase timers, counters and profiling hooks for the matching pipeline.
+
+Code marks its phases and counts its work through the module-level helpers:
+
+    with instrumentation.phase('transform'):
+        ...
+    instrumentation.count('greedy.teams')
+
+Nothing is recorded until enable() is called. While disabled, phase() hands
+back one shared no-op context manager and count() returns straight away, so
+the calls can stay in the code at near-zero cost.
+
+Once enabled, a Recorder collects:
+    phases   : wall-clock seconds and call count per phase name (nested
+               phases are timed independently), plus peak traced memory
+               per phase when trace_memory is on (tracemalloc, slows Python code)
+    counters : totals per counter name
+    max_rss_bytes : the process's peak resident memory
+and, with profiler='cprofile' or 'pyinstrument', profiles everything until
+disable(). report() returns it all as a JSON-ready dict.
+
+main.py turns this on with --profile REPORT.json, or with the environment:
+    CAPSTONE_PROFILE=report.json   (1 writes to DEFAULT_REPORT_FILE)
+    CAPSTONE_PROFILER=cprofile|pyinstrument
+    CAPSTONE_TRACE_MEMORY=1
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_REPORT_FILE = 'profile_report.json'
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# Functions listed in the report's cProfile summary
+PROFILE_TOP = 25
+
+_NULL_PHASE = contextlib.nullcontext()
+_recorder = None
+
+
+def phase(name):
+    """Context manager timing one phase, a no-op while disabled"""
+    if _recorder is None:
+        return _NULL_PHASE
+    return _recorder.phase(name)
+
+
+def count(name, n=1):
+    """Add n to a counter, a no-op while disabled"""
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+
+def active():
+    """The current Recorder, or None while disabled"""
+    return _recorder
+
+
+def enable(profiler=None, trace_memory=False):
+    """Start recording, returns the new Recorder"""
+    global _recorder
+    if _recorder is not None:
+        disable()
+    _recorder = Recorder(profiler=profiler, trace_memory=trace_memory)
+    _recorder.start()
+    return _recorder
+
+
+def disable():
+    """Stop recording, returns the Recorder that was active (or None)"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.stop()
+    return recorder
+
+
+@contextlib.contextmanager
+def recording(profiler=None, trace_memory=False):
+    """enable() for the duration of a with block, yields the Recorder"""
+    recorder = enable(profiler=profiler, trace_memory=trace_memory)
+    try:
+        yield recorder
+    finally:
+        if _recorder is recorder:
+            disable()
+
+
+def settings_from_env(environ=None):
+    """
+    (report path, profiler, trace_memory) from the CAPSTONE_* environment variables
+    The report path is None when profiling is not requested
+    """
+    environ = os.environ if environ is None else environ
+    path = environ.get('CAPSTONE_PROFILE') or None
+    if path in ('1', 'true', 'yes'):
+        path = DEFAULT_REPORT_FILE
+    profiler = environ.get('CAPSTONE_PROFILER') or None
+    trace_memory = environ.get('CAPSTONE_TRACE_MEMORY', '') in ('1', 'true', 'yes')
+    return path, profiler, trace_memory
+
+
+class Recorder:
+    """Collects phase timings, counters and an optional profile"""
+
+    def __init__(self, profiler=None, trace_memory=False):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler!r}, expected one of {', '.join(PROFILERS)}")
+        self.profiler_name = profiler
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.counters = {}
+        self.seconds = None
+        self._profiler = None
+        self._started = None
+        self._started_tracing = False
+        # Running peak of every open phase. Phases may overlap without nesting (the
+        # async pipeline's fetch and transform, or phases on other threads), so
+        # every open phase gets the peak before tracemalloc's is reset
+        self._open_peaks = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.profiler_name == 'cprofile':
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profiler_name == 'pyinstrument':
+            import pyinstrument
+
+            self._profiler = pyinstrument.Profiler()
+            self._profiler.start()
+
+    def stop(self):
+        if self._started is None or self.seconds is not None:
+            return
+        if self.profiler_name == 'cprofile':
+            self._profiler.disable()
+        elif self.profiler_name == 'pyinstrument':
+            self._profiler.stop()
+        if self._started_tracing:
+            tracemalloc.stop()
+        self.seconds = time.perf_counter() - self._started
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            peak = [0]
+            with self._lock:
+                self._fold_peak()
+                tracemalloc.reset_peak()
+                self._open_peaks.append(peak)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = self.phases.get(name)
+                if entry is None:
+                    entry = self.phases[name] = {'seconds': 0.0, 'calls': 0}
+                entry['seconds'] += elapsed
+                entry['calls'] += 1
+                if tracing:
+                    self._fold_peak()
+                    self._open_peaks = [p for p in self._open_peaks if p is not peak]
+                    entry['peak_bytes'] = max(entry.get('peak_bytes', 0), peak[0])
+
+    def _fold_peak(self):
+        """Raise every open phase's peak to tracemalloc's peak since its last reset"""
+        current = tracemalloc.get_traced_memory()[1]
+        for peak in self._open_peaks:
+            peak[0] = max(peak[0], current)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        """Everything recorded so far, as a JSON-ready dict"""
+        seconds = self.seconds
+        if seconds is None and self._started is not None:
+            seconds = time.perf_counter() - self._started
+        report = {
+            'seconds': seconds,
+            'phases': {name: dict(entry) for name, entry in self.phases.items()},
+            'counters': dict(self.counters),
+            'max_rss_bytes': _max_rss_bytes(),
+        }
+        if self.profiler_name == 'cprofile' and self._profiler is not None:
+            report['profile'] = _cprofile_summary(self._profiler)
+        return report
+
+    def write_report(self, path):
+        """
+        Write report() as JSON to path. A cProfile profile is also saved next to
+        it as <path>.prof, a pyinstrument one as <path>.html
+        """
+        report = self.report()
+        if self.profiler_name == 'cprofile' and self._profiler is not None:
+            report['profile_file'] = f'{path}.prof'
+            self._profiler.dump_stats(report['profile_file'])
+        elif self.profiler_name == 'pyinstrument' and self._profiler is not None:
+            report['profile_file'] = f'{path}.html'
+            with open(report['profile_file'], 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+def _cprofile_summary(profiler):
+    """
+    Helper function
+    The PROFILE_TOP functions with the highest cumulative time
+    """
+    import pstats
+
+    stats = pstats.Stats(profiler).stats
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({function})',
+            'calls': calls,
+            'own_seconds': own,
+            'cumulative_seconds': cumulative,
+        })
+    rows.sort(key=lambda r: -r['cumulative_seconds'])
+    return rows[:PROFILE_TOP]
+
+
+def _max_rss_bytes():
+    """
+    Helper function
+    Peak resident memory of this process, None where it is not available
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,166 @@
+"""
+Pluggable sources for form responses and sinks for team results.
+
+A source yields the response tab as (header, rows) chunks, where rows are
+lists of cell values shaped like the Sheets API returns them (trailing empty
+cells left out). A sink takes the finished output table (a list of rows) and
+writes it in one go. transform_chunks, transform_rows_incremental and
+create_capstone_teams work the same behind any of them.
+
+Implementations:
+    FileSource / FileSink  local CSV, Parquet or JSON files (this module)
+    SheetsSource / SheetsSink  Google Sheets (main.py, next to the Sheets calls)
+
+File formats are picked from the extension (.csv, .parquet, .json) unless
+given explicitly. CSV and Parquet sources are streamed in chunk_rows pieces,
+JSON is loaded whole. Parquet needs pyarrow, which is only imported when a
+Parquet file is used.
+"""
+import csv
+import json
+import os
+
+# Rows per chunk when streaming a file
+FILE_CHUNK_ROWS = 10000
+
+FORMATS = ('csv', 'parquet', 'json')
+
+
+class ResponseSource:
+    """Where form responses come from"""
+
+    def iter_row_chunks(self):
+        """Yields (header, rows) pairs, the header is the same for every chunk"""
+        raise NotImplementedError
+
+    def read_rows(self):
+        """The header and every row, (None, []) when there are no responses"""
+        header, rows = None, []
+        for header, chunk in self.iter_row_chunks():
+            rows.extend(chunk)
+        return header, rows
+
+
+class ResultSink:
+    """Where the output table goes"""
+
+    def write(self, values):
+        """Writes a list of rows, returns True on success"""
+        raise NotImplementedError
+
+
+class FileSource(ResponseSource):
+    """Form responses exported to a local CSV, Parquet or JSON file"""
+
+    def __init__(self, path, chunk_rows=FILE_CHUNK_ROWS, file_format=None):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.file_format = file_format or _format_from_path(path)
+
+    def iter_row_chunks(self):
+        if self.file_format == 'csv':
+            return self._csv_chunks()
+        if self.file_format == 'parquet':
+            return self._parquet_chunks()
+        return self._json_chunks()
+
+    def _csv_chunks(self):
+        with open(self.path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            chunk = []
+            for row in reader:
+                chunk.append(_trim(row))
+                if len(chunk) >= self.chunk_rows:
+                    yield header, chunk
+                    chunk = []
+            if chunk:
+                yield header, chunk
+
+    def _parquet_chunks(self):
+        pq = _parquet_module()
+        parquet_file = pq.ParquetFile(self.path)
+        header = parquet_file.schema_arrow.names
+        for batch in parquet_file.iter_batches(batch_size=self.chunk_rows):
+            columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+            rows = [_trim(list(row)) for row in zip(*columns)]
+            if rows:
+                yield header, rows
+
+    def _json_chunks(self):
+        # Either a Sheets-style list of rows (header first) or a list of records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not data:
+            return
+        if isinstance(data[0], dict):
+            header = list(data[0].keys())
+            rows = [[record.get(col) for col in header] for record in data]
+        else:
+            header, rows = data[0], data[1:]
+        for start in range(0, len(rows), self.chunk_rows):
+            yield header, [_trim(list(row)) for row in rows[start:start + self.chunk_rows]]
+
+
+class FileSink(ResultSink):
+    """Writes the output table to a local CSV, Parquet or JSON file"""
+
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = file_format or _format_from_path(path)
+
+    def write(self, values):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        if self.file_format == 'csv':
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(values)
+        elif self.file_format == 'json':
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(values, f, ensure_ascii=False)
+        else:
+            import pandas as pd
+
+            _parquet_module()
+            # First row is the header, cells are stored as text so mixed columns fit
+            header, rows = values[0], values[1:]
+            frame = pd.DataFrame([[str(cell) for cell in row] for row in rows], columns=header)
+            frame.to_parquet(self.path, index=False)
+        return True
+
+
+def _parquet_module():
+    """
+    Helper function
+    pyarrow.parquet, pyarrow is optional so a missing install gets a clear message
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("Parquet files need pyarrow (pip install pyarrow), "
+                          "or use a .csv or .json file instead") from error
+    return pq
+
+
+def _format_from_path(path):
+    """
+    Helper function
+    File format from the extension
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot tell the file format of {path!r}, expected one of {', '.join(FORMATS)}")
+    return extension
+
+
+def _trim(row):
+    """
+    Helper function
+    Drops trailing empty cells, like the Sheets API does
+    """
+    end = len(row)
+    while end and (row[end - 1] is None or row[end - 1] == ''):
+        end -= 1
+    return row[:end]
@@ -0,0 +1,199 @@
+"""
+Local-search improvement pass for teams produced by the greedy algorithm.
+
+The greedy pass never revisits a team once it is formed. improve_teams takes
+its output and repeatedly tries to move one person to another team or swap two
+people between teams, keeping every team within min_size..max_size.
+
+The objective is the average team compatibility score. Each team keeps a cached
+sum of its pair scores, so a candidate move is scored from the pair scores of
+the one or two people involved (at most max_size lookups) instead of
+re-scoring whole teams.
+
+The pass is anytime: it stops when the iteration or wall-clock budget runs out
+and returns the best teams found so far along with a trace of improvements.
+"""
+import random
+import time
+
+import numpy as np
+
+import instrumentation
+from compat_matrix import DEFAULT_TEAMMATE_PREF
+
+DEFAULT_MAX_ITERATIONS = 10000
+
+# Ignore floating point noise when deciding whether a move helps
+_EPSILON = 1e-9
+
+
+def improve_teams(matrix, teams, min_size=2, max_size=3, max_iterations=None, time_budget=None, seed=0):
+    """
+    Improve a list of teams (lists of row indices into matrix) by moves and swaps
+
+    max_iterations : int
+        number of people to try relocating, defaults to DEFAULT_MAX_ITERATIONS
+        when no time_budget is given either
+    time_budget : float
+        wall-clock limit in seconds
+
+    Returns (teams, trace), where trace is a list of
+    (iteration, elapsed seconds, average team score) tuples, starting with the
+    initial solution and adding one entry per accepted improvement
+    """
+    if max_iterations is None and time_budget is None:
+        max_iterations = DEFAULT_MAX_ITERATIONS
+
+    teams = [list(team) for team in teams]
+    start = time.perf_counter()
+    if len(teams) < 2:
+        return teams, [(0, 0.0, _average(matrix.team_scores(teams)))]
+
+    state = _SearchState(matrix, teams)
+    rng = random.Random(seed)
+    n = len(state.team_of)
+    trace = [(0, 0.0, state.objective())]
+
+    iteration = 0
+    while True:
+        if max_iterations is not None and iteration >= max_iterations:
+            break
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            break
+        iteration += 1
+
+        person = rng.randrange(n)
+        best = state.best_move(person, rng, min_size, max_size)
+        if best is not None and best[0] > _EPSILON:
+            state.apply(best)
+            trace.append((iteration, time.perf_counter() - start, state.objective()))
+
+    instrumentation.count('local_search.iterations', iteration)
+    instrumentation.count('local_search.moves_applied', len(trace) - 1)
+    return state.teams, trace
+
+
+class _SearchState:
+    """
+    Helper class
+    Teams plus the cached per-team pair sums used for delta scoring
+    """
+
+    def __init__(self, matrix, teams):
+        self.matrix = matrix
+        self.prefs = matrix.prefs
+        self.teams = teams
+        self.team_of = np.empty(sum(len(t) for t in teams), dtype=np.intp)
+        for t, team in enumerate(teams):
+            self.team_of[team] = t
+        # Sum of pair scores inside each team (not yet divided by the number of pairs)
+        self.sums = [self._pair_sum(team) for team in teams]
+        self.total = sum(_score(s, len(team)) for s, team in zip(self.sums, teams))
+        self._neighbours = {}
+
+    def _pair_sum(self, team):
+        """Sum of pair scores over every pair in a team"""
+        total = 0.0
+        for i, a in enumerate(team):
+            total += float(self.matrix.pair_scores(a, team[i + 1:]).sum())
+        return total
+
+    def affinity(self, person, team):
+        """Sum of pair scores between one person and the members of a team (excluding themselves)"""
+        # Teams hold at most max_size people, scalar lookups beat fancy indexing here
+        prefs = self.prefs
+        total = 0.0
+        for m in team:
+            if m != person:
+                total += prefs[person, m] + prefs[m, person]
+        return float(total) / 2
+
+    def neighbours(self, person):
+        """People with a non-default preference towards or from this person"""
+        found = self._neighbours.get(person)
+        if found is None:
+            prefs = self.matrix.prefs
+            explicit = (prefs[person] != DEFAULT_TEAMMATE_PREF) | (prefs[:, person] != DEFAULT_TEAMMATE_PREF)
+            explicit[person] = False
+            found = np.flatnonzero(explicit)
+            self._neighbours[person] = found
+        return found
+
+    def objective(self):
+        return self.total / len(self.teams)
+
+    def best_move(self, person, rng, min_size, max_size):
+        """
+        Best move or swap for one person into the teams of the people they have
+        explicit preferences with, plus one random team
+
+        Returns (delta, kind, person, source, target, other) or None
+        """
+        source = int(self.team_of[person])
+        targets = {int(self.team_of[q]) for q in self.neighbours(person)}
+        targets.add(rng.randrange(len(self.teams)))
+        targets.discard(source)
+
+        team_a = self.teams[source]
+        size_a = len(team_a)
+        sum_a = self.sums[source]
+        score_a = _score(sum_a, size_a)
+        aff_pa = self.affinity(person, team_a)
+
+        best = None
+        for target in sorted(targets):
+            team_b = self.teams[target]
+            size_b = len(team_b)
+            sum_b = self.sums[target]
+            before = score_a + _score(sum_b, size_b)
+            aff_pb = self.affinity(person, team_b)
+
+            # Move the person to the other team
+            if size_a > min_size and size_b < max_size:
+                delta = (_score(sum_a - aff_pa, size_a - 1)
+                         + _score(sum_b + aff_pb, size_b + 1) - before)
+                if best is None or delta > best[0]:
+                    best = (delta, 'move', person, source, target, None)
+
+            # Swap with each member of the other team
+            for other in team_b:
+                pair = self.matrix.pair_score(person, other)
+                new_a = sum_a - aff_pa + self.affinity(other, team_a) - pair
+                new_b = sum_b - self.affinity(other, team_b) + aff_pb - pair
+                delta = _score(new_a, size_a) + _score(new_b, size_b) - before
+                if best is None or delta > best[0]:
+                    best = (delta, 'swap', person, source, target, other)
+        return best
+
+    def apply(self, move):
+        delta, kind, person, source, target, other = move
+        team_a = self.teams[source]
+        team_b = self.teams[target]
+        if kind == 'move':
+            self.sums[source] -= self.affinity(person, team_a)
+            self.sums[target] += self.affinity(person, team_b)
+            team_a.remove(person)
+            team_b.append(person)
+        else:
+            pair = self.matrix.pair_score(person, other)
+            self.sums[source] += self.affinity(other, team_a) - self.affinity(person, team_a) - pair
+            self.sums[target] += self.affinity(person, team_b) - self.affinity(other, team_b) - pair
+            team_a[team_a.index(person)] = other
+            team_b[team_b.index(other)] = person
+            self.team_of[other] = source
+        self.team_of[person] = target
+        self.total += delta
+
+
+def _score(pair_sum, size):
+    """
+    Helper function
+    Team compatibility score from a cached pair sum
+    """
+    if size < 2:
+        return float(DEFAULT_TEAMMATE_PREF)
+    return pair_sum / (size * (size - 1) // 2)
+
+
+def _average(scores):
+    return float(np.mean(scores)) if len(scores) else 0.0
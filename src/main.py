@@ -1,23 +1,25 @@
-import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import argparse
+import asyncio
+
 from googleapiclient.errors import HttpError
-import pandas as pd
-from matching_algorithm import create_capstone_teams 
+import numpy as np
+import instrumentation
+from async_pipeline import run_pipeline_async
+from io_backends import FileSink, FileSource, ResponseSource, ResultSink
+from pipeline import format_results, match_incremental, run_pipeline, transform_rows_incremental
+from run_state import DEFAULT_STATE_FILE
+from sheets_client import (BatchWriter, column_letter as _column_letter, execute_with_retry, get_service,
+                           write_changed_cells)
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+# Rows per range when reading a tab, and ranges per batchGet request
+DEFAULT_CHUNK_ROWS = 500
+DEFAULT_RANGES_PER_REQUEST = 4
 
 def get_google_sheets_service():
+    """The shared Sheets client, credentials and discovery are only loaded on first use."""
     try:
-        with open('credentials.json', 'r') as f:
-            service_account_info = json.load(f)
-        
-        credentials = service_account.Credentials.from_service_account_info(
-            service_account_info, scopes=SCOPES)
-        
-        service = build('sheets', 'v4', credentials=credentials)
-        return service
+        with instrumentation.phase('sheets.service'):
+            return get_service()
     except Exception as e:
         print(f"Error initializing Google Sheets service: {e}")
         return None
@@ -29,8 +31,8 @@ def read_spreadsheet_data(spreadsheet_id, range_name):
         return None
     
     try:
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id, range=range_name).execute()
+        result = execute_with_retry(service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id, range=range_name))
         values = result.get('values', [])
         
         if not values:
@@ -42,50 +44,193 @@ def read_spreadsheet_data(spreadsheet_id, range_name):
         print(f'An error occurred: {error}')
         return None
 
+def get_sheet_dimensions(service, spreadsheet_id, sheet_name):
+    """Row and column count of one tab, from the spreadsheet metadata."""
+    result = execute_with_retry(service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties(title,gridProperties(rowCount,columnCount))'
+    ))
+    for sheet in result.get('sheets', []):
+        properties = sheet.get('properties', {})
+        if properties.get('title') == sheet_name:
+            grid = properties.get('gridProperties', {})
+            return grid.get('rowCount', 0), grid.get('columnCount', 0)
+    raise ValueError(f"No tab named {sheet_name!r} in spreadsheet {spreadsheet_id}")
+
+def read_spreadsheet_chunks(spreadsheet_id, sheet_name, chunk_rows=DEFAULT_CHUNK_ROWS,
+                            ranges_per_request=DEFAULT_RANGES_PER_REQUEST):
+    """
+    Read a whole tab as a generator of DataFrames of at most chunk_rows rows.
+
+    The tab's real size comes from its metadata, so no rows are cut off and no
+    fixed range has to be kept up to date. Several chunk ranges are fetched
+    per batchGet request. Every chunk up to the last grid row is read, and
+    blank rows (e.g. cleared by hand) are skipped.
+    """
+    for header, rows in read_spreadsheet_row_chunks(spreadsheet_id, sheet_name, chunk_rows, ranges_per_request):
+        yield _rows_to_frame(header, rows)
+
+def read_spreadsheet_row_chunks(spreadsheet_id, sheet_name, chunk_rows=DEFAULT_CHUNK_ROWS,
+                                ranges_per_request=DEFAULT_RANGES_PER_REQUEST):
+    """
+    Same as read_spreadsheet_chunks, but yields (header, raw rows) pairs.
+
+    An HttpError that outlasts the retries is raised, so a partly read tab
+    never reaches the match.
+    """
+    service = get_google_sheets_service()
+    if not service:
+        return
+
+    try:
+        row_count, column_count = get_sheet_dimensions(service, spreadsheet_id, sheet_name)
+        last_column = _column_letter(max(column_count, 1))
+        quoted = "'" + sheet_name.replace("'", "''") + "'"
+
+        header = None
+        start = 1
+        while start <= row_count:
+            ranges = []
+            while start <= row_count and len(ranges) < ranges_per_request:
+                end = min(start + chunk_rows - 1, row_count)
+                ranges.append(f'{quoted}!A{start}:{last_column}{end}')
+                start = end + 1
+
+            result = execute_with_retry(service.spreadsheets().values().batchGet(
+                spreadsheetId=spreadsheet_id, ranges=ranges))
+
+            for value_range in result.get('valueRanges', []):
+                # Blank rows are left out, the API drops them at the end of a range but not in between
+                values = [row for row in value_range.get('values', []) if row]
+                if header is None:
+                    if not values:
+                        continue
+                    header, values = values[0], values[1:]
+                if values:
+                    yield header, values
+        if header is None:
+            print('No data found.')
+    except HttpError as error:
+        # A cut-off roster must not be matched as if it were the whole cohort
+        print(f'An error occurred: {error}')
+        raise
+
+def _rows_to_frame(header, rows):
+    """
+    DataFrame from raw sheet rows, the API leaves out trailing empty cells so
+    short rows are padded with None
+    """
+    import pandas as pd
+
+    width = len(header)
+    return pd.DataFrame([row + [None] * (width - len(row)) for row in rows], columns=header)
+
 def transform_data_for_algorithm(df):
     """Transform spreadsheet data into format needed by create_capstone_teams."""
-    
-    people = df['Please Enter Your Name.'].tolist()
-    
-    project_cols = [col for col in df.columns if col.startswith('Rank the projects')]
+    return _transform_frame(df, check_names=True)
+
+
+def transform_chunks(frames):
+    """
+    Transform DataFrame chunks (e.g. from read_spreadsheet_chunks) one at a time
+    and combine them, same result as transforming all rows in one DataFrame.
+    """
+    people = []
+    teammate_prefs = {}
     projects = []
-    for col in project_cols:
-        project_name = col.split('[')[1].rstrip(']')
-        projects.append(project_name)
-    
     project_prefs = {}
-    for idx, person in enumerate(people):
-        project_prefs[person] = {}
-        person_row = df.iloc[idx]
-        for col in project_cols:
-            project_name = col.split('[')[1].rstrip(']')
-            ranking = person_row[col]
-            if pd.notna(ranking):
-                project_prefs[person][project_name] = 6 - int(ranking)
+    for df in frames:
+        # Teammates may be named in a later chunk, so names are checked at the end
+        chunk_people, chunk_teammates, projects, chunk_projects = _transform_frame(df, check_names=False)
+        people.extend(chunk_people)
+        teammate_prefs.update(chunk_teammates)
+        project_prefs.update(chunk_projects)
+
+    # Dropping unknown names afterwards leaves the known entries exactly as if they
+    # had been filtered cell by cell
+    known = set(people)
+    teammate_prefs = {
+        person: {name: score for name, score in prefs.items() if name in known}
+        for person, prefs in teammate_prefs.items()
+    }
+    return people, teammate_prefs, projects, project_prefs
+
+
+def _transform_frame(df, check_names):
+    """
+    Helper function
+    Body of transform_data_for_algorithm, check_names=False keeps teammates that
+    are not in this DataFrame's name column
+    """
+    import pandas as pd
+
+    people = df['Please Enter Your Name.'].tolist()
     
+    # Headers are parsed once, not once per person
+    project_cols = [col for col in df.columns if col.startswith('Rank the projects')]
+    projects = [col.split('[')[1].rstrip(']') for col in project_cols]
+
+    # Every filled ranking cell at once, ranking r -> score 6 - r
+    rankings = df[project_cols].to_numpy(dtype=object)
+    filled = _filled_cells(rankings)
+    rows, cols = np.nonzero(filled)
+    scores = 6 - pd.Series(rankings[filled], dtype=object).astype(int).to_numpy()
+    project_prefs = _prefs_by_row(people, rows, [projects[c] for c in cols], scores)
 
     teammate_rank_cols = [col for col in df.columns if col.startswith("Rank the people you'd like to work with")]
     teammate_avoid_cols = [col for col in df.columns if col.startswith("Choose three people you don't want")]
-    
-    teammate_prefs = {}
-    for idx, person in enumerate(people):
-        teammate_prefs[person] = {}
-        person_row = df.iloc[idx]
-        
-        for col in teammate_rank_cols:
-            teammate_name = person_row[col]
-            if pd.notna(teammate_name) and teammate_name in people:
-                rank_num = int(col.split('[Person ')[1].rstrip(']').strip())
-        
-                teammate_prefs[person][teammate_name] = max(1, 11 - rank_num)
-       
-        for col in teammate_avoid_cols:
-            teammate_name = person_row[col]
-            if pd.notna(teammate_name) and teammate_name in people:
-                teammate_prefs[person][teammate_name] = 1  
-    
+    rank_scores = np.array([max(1, 11 - int(col.split('[Person ')[1].rstrip(']').strip()))
+                            for col in teammate_rank_cols], dtype=int)
+
+    # isin looks names up in a hash table instead of scanning the people list per cell
+    ranked = df[teammate_rank_cols].to_numpy(dtype=object)
+    ranked_ok = _filled_cells(ranked)
+    avoided = df[teammate_avoid_cols].to_numpy(dtype=object)
+    avoided_ok = _filled_cells(avoided)
+    if check_names:
+        ranked_ok &= df[teammate_rank_cols].isin(people).to_numpy()
+        avoided_ok &= df[teammate_avoid_cols].isin(people).to_numpy()
+
+    rank_rows, rank_cols = np.nonzero(ranked_ok)
+    avoid_rows = np.nonzero(avoided_ok)[0]
+    # Within a row, ranked people come first and avoided people override them with 1
+    rows = np.concatenate([rank_rows, avoid_rows])
+    order = np.argsort(rows, kind='stable')
+    names = np.concatenate([ranked[ranked_ok], avoided[avoided_ok]])
+    scores = np.concatenate([rank_scores[rank_cols], np.ones(len(avoid_rows), dtype=int)])
+    teammate_prefs = _prefs_by_row(people, rows[order], names[order].tolist(), scores[order])
+
     return people, teammate_prefs, projects, project_prefs
 
+
+def _filled_cells(values):
+    """
+    Helper function
+    pd.notna of an object array with blank strings counted as empty, CSV files
+    and the Sheets API give '' for a blank cell between filled ones
+    """
+    import pandas as pd
+
+    blank = np.array([isinstance(v, str) and not v.strip() for v in values.ravel()],
+                     dtype=bool).reshape(values.shape)
+    return pd.notna(values) & ~blank
+
+def _prefs_by_row(people, rows, keys, values):
+    """
+    Helper function
+    Builds {person: {key: value}} from flat entries sorted by row
+
+    Entries keep their order within a row, a repeated key keeps its first position
+    and its last value, the same as assigning them one at a time
+    """
+    prefs = {}
+    values = np.asarray(values).tolist()
+    bounds = np.searchsorted(rows, np.arange(len(people) + 1))
+    for idx, person in enumerate(people):
+        lo, hi = bounds[idx], bounds[idx + 1]
+        prefs[person] = dict(zip(keys[lo:hi], values[lo:hi]))
+    return prefs
+
 def write_to_spreadsheet(spreadsheet_id, range_name, values):
     """Write data to a Google Spreadsheet."""
     service = get_google_sheets_service()
@@ -94,48 +239,120 @@ def write_to_spreadsheet(spreadsheet_id, range_name, values):
     
     try:
         body = {'values': values}
-        result = service.spreadsheets().values().update(
+        result = execute_with_retry(service.spreadsheets().values().update(
             spreadsheetId=spreadsheet_id,
             range=range_name,
             valueInputOption='RAW',
             body=body
-        ).execute()
+        ))
         print(f"{result.get('updatedCells')} cells updated.")
         return True
     except HttpError as error:
         print(f'An error occurred: {error}')
         return False
+
+def write_ranges_to_spreadsheet(spreadsheet_id, updates):
+    """Write several {range: values} updates with one batchUpdate request."""
+    service = get_google_sheets_service()
+    if not service:
+        return False
+
+    try:
+        writer = BatchWriter(spreadsheet_id, service=service)
+        for range_name, values in updates.items():
+            writer.add(range_name, values)
+        print(f"{writer.flush()} cells updated.")
+        return True
+    except HttpError as error:
+        print(f'An error occurred: {error}')
+        return False
+
+def write_changed_to_spreadsheet(spreadsheet_id, range_name, values):
+    """
+    Write data to a Google Spreadsheet, sending only the cells that differ from
+    what the range holds now and clearing the ones values no longer reach.
+    """
+    service = get_google_sheets_service()
+    if not service:
+        return False
+
+    try:
+        stats = write_changed_cells(spreadsheet_id, range_name, values, service=service)
+        print(f"{stats.cells_written + stats.cells_cleared} cells touched "
+              f"({stats.cells_written} updated, {stats.cells_cleared} cleared).")
+        return True
+    except HttpError as error:
+        print(f'An error occurred: {error}')
+        return False
     
+class SheetsSource(ResponseSource):
+    """Form responses read from one tab of a Google Spreadsheet"""
+
+    def __init__(self, spreadsheet_id, sheet_name, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 ranges_per_request=DEFAULT_RANGES_PER_REQUEST):
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.chunk_rows = chunk_rows
+        self.ranges_per_request = ranges_per_request
+
+    def iter_row_chunks(self):
+        return read_spreadsheet_row_chunks(self.spreadsheet_id, self.sheet_name,
+                                           self.chunk_rows, self.ranges_per_request)
+
+
+class SheetsSink(ResultSink):
+    """
+    Results written to a range of a Google Spreadsheet, a re-run only sends
+    the cells that changed since the last write
+    """
+
+    def __init__(self, spreadsheet_id, range_name):
+        self.spreadsheet_id = spreadsheet_id
+        self.range_name = range_name
+
+    def write(self, values):
+        return write_changed_to_spreadsheet(self.spreadsheet_id, self.range_name, values)
+
+
 if __name__ == "__main__":
     
     SPREADSHEET_ID = '1yCtVanPpqrmO_nhFk4V6eecgrj1XmWSVq3w9ZclYS6Q'
-    INPUT_RANGE = 'Form Responses 1!A1:AL100'
+    INPUT_SHEET = 'Form Responses 1'
     OUTPUT_RANGE = 'Team Results!A1' 
-    
-    data = read_spreadsheet_data(SPREADSHEET_ID, INPUT_RANGE)
-    if data:
+    STATE_FILE = DEFAULT_STATE_FILE
 
-        if len(data) > 1:
-            df = pd.DataFrame(data[1:], columns=data[0])
-        else:
-            df = pd.DataFrame(data)
-        
-        print(f"\nDataFrame shape: {df.shape}")
-        
-        people, teammate_prefs, projects, project_prefs = transform_data_for_algorithm(df)
-        
-        results, total_score = create_capstone_teams(
-            people, teammate_prefs, projects, project_prefs
-        )
-        
-        output_values = [['Team Members', 'Project', 'Score']]
-        for team, project, score in results:
-            output_values.append([', '.join(team), project, score])
-        output_values.append(['', 'Overall Score', total_score])
-        
-        write_to_spreadsheet(SPREADSHEET_ID, OUTPUT_RANGE, output_values)
+    # Local CSV/Parquet/JSON files can stand in for either side of the spreadsheet
+    parser = argparse.ArgumentParser(description='Form capstone teams from form responses.')
+    parser.add_argument('--input', help='read responses from this file instead of the spreadsheet')
+    parser.add_argument('--output', help='write results to this file instead of the spreadsheet')
+    parser.add_argument('--state-file', default=STATE_FILE, help='incremental run state (default: %(default)s)')
+    # Per-phase timings and counters, also enabled by CAPSTONE_PROFILE=report.json
+    env_report, env_profiler, env_trace_memory = instrumentation.settings_from_env()
+    parser.add_argument('--profile', metavar='REPORT', default=env_report,
+                        help='write a JSON report of phase timings and counters')
+    parser.add_argument('--profiler', choices=instrumentation.PROFILERS, default=env_profiler,
+                        help='also profile the run (needs --profile)')
+    parser.add_argument('--trace-memory', action='store_true', default=env_trace_memory,
+                        help='record peak memory per phase (slower)')
+    args = parser.parse_args()
+    if args.profile:
+        instrumentation.enable(profiler=args.profiler, trace_memory=args.trace_memory)
+
+    source = FileSource(args.input) if args.input else SheetsSource(SPREADSHEET_ID, INPUT_SHEET)
+    sink = FileSink(args.output) if args.output else SheetsSink(SPREADSHEET_ID, OUTPUT_RANGE)
+    
+    # Only rows that changed since the last run are transformed and re-matched, pages of
+    # the tab are transformed while the next ones download
+    outcome = asyncio.run(run_pipeline_async(source, sink, state_file=args.state_file))
+    if outcome:
+        results, total_score, stats = outcome
+        print(f"\nResponses read: {stats['rows']} ({stats['rows_transformed']} new or changed)")
         
         print("\n=== Team Results ===")
         for team, project, score in results:
             print(f"Team: {team} → {project} (Score: {score}/100)")
-        print(f"\nOverall Score: {total_score}/100")
\ No newline at end of file
+        print(f"\nOverall Score: {total_score}/100")
+
+    if args.profile:
+        instrumentation.disable().write_report(args.profile)
+        print(f"\nProfile report written to {args.profile}")
\ No newline at end of file
@@ -1,4 +1,15 @@
-import itertools
+import heapq
+
+import numpy as np
+
+import instrumentation
+from assignment import assign_projects
+from compat_matrix import CompatibilityMatrix, DEFAULT_TEAMMATE_PREF, SparseCompatibilityMatrix
+from constraints import TeamConstraints
+from exact_solver import solve_exact
+from local_search import improve_teams
+from results import ResultTable
+from scoring import normalize_score
 
 """
 Creates teams of 2-3 people for capstone projects based on compatibility factors.
@@ -8,6 +19,8 @@ a scale from 1-10 and also factors in project preference given a rating of 1-5
 
 This is done deterministically so that the output is repeatable
 Uses a greedy algorithm as well for the sake of efficiency
+Preferences are loaded into dense score matrices once (see compat_matrix.py) so
+the greedy pass and the scoring work on array slices instead of dict lookups
 
 Input Parameters
 ~~~~~~~~~~~~~~~~~
@@ -30,9 +43,78 @@ Input Parameters
 
     teammate_weight, project_weight : float
         How much each preference type matters for the final score
-        Note: This is currently hard-coded
+        sweep.py compares many weightings without re-running the matching
+
+    improve_iterations, improve_seconds : int, float
+        Optional budget for the local-search pass in local_search.py that
+        moves and swaps people between the greedy teams
+        Off by default, so the plain greedy result is returned
+
+    seed : int
+        Random seed for the local-search pass and the portfolio runs, the same
+        seed gives the same teams
+
+    assignment : str
+        'alphabetical' hands projects out in alphabetical order, best team first
+        'optimal' picks the team-to-project assignment with the highest total
+        combined score (Hungarian algorithm in assignment.py)
+
+    project_capacities : dict[str, int]
+        How many teams each project can take, projects not listed take one
+
+    exact : bool
+        Return the partition with the highest average team compatibility score
+        instead of the greedy one (exact_solver.py), for cohorts of up to 24 people
+        The local-search budget is ignored since there is nothing left to improve
+
+    portfolio_runs, workers : int
+        Keep the best of this many perturbed greedy runs, spread over `workers`
+        processes (portfolio.py), each run gets the local-search budget
+
+    previous_teams : list[list[str]], changed_people : iterable of str
+        Warm start from an earlier result. Previous teams that contain nobody in
+        changed_people (and nobody who has left) are kept as they are, the
+        remaining people are regrouped with the greedy algorithm (repair_teams)
+
+    sparse : bool
+        Store only the stated teammate ratings (SparseCompatibilityMatrix)
+        instead of an n x n matrix, for cohorts too large for memory. None picks
+        it from SPARSE_MIN_PEOPLE people up. Local search, the exact solver and
+        the portfolio need the dense matrix
+
+    pinned_pairs, forbidden_pairs : list[tuple[str, str]]
+    locked_teams : list[list[str]]
+        Hard constraints (constraints.py): pinned people always share a team,
+        forbidden pairs never do and locked teams are kept as given. With
+        previous_teams only the teams that break a constraint are formed
+        again. Not available with local search, the exact solver, the
+        portfolio or the sparse matrix
+
+    matrix : CompatibilityMatrix or SparseCompatibilityMatrix
+        Match this matrix instead of building one from the preferences, e.g.
+        a cohort loaded with snapshot.load_snapshot. teammate_prefs and
+        project_prefs are not used and sparse follows the matrix
+
+    decompose : bool
+        Split the cohort into blocks of closely tied people and form teams in
+        each block in parallel across `workers` processes, then fix the block
+        boundaries (decomposition.py). None picks it from DECOMPOSE_MIN_PEOPLE
+        people up. Only replaces the plain greedy pass, so it is not used for
+        warm starts, the exact solver, the portfolio or with constraints
+
+Returns
+~~~~~~~
+
+    (results, overall score), results is a ResultTable (results.py) of
+    (team names, project, 1-100 score) rows with the best team first
 """
 
+# Cohort size from which create_capstone_teams uses the sparse matrix by default
+SPARSE_MIN_PEOPLE = 2000
+
+# Cohort size from which create_capstone_teams decomposes the cohort by default
+DECOMPOSE_MIN_PEOPLE = 20000
+
 def create_capstone_teams(
         people,
         teammate_prefs,
@@ -41,103 +123,169 @@ def create_capstone_teams(
         min_size=2,
         max_size=3,
         teammate_weight=0.7,
-        project_weight=0.3
+        project_weight=0.3,
+        improve_iterations=None,
+        improve_seconds=None,
+        seed=0,
+        assignment='alphabetical',
+        project_capacities=None,
+        exact=False,
+        portfolio_runs=None,
+        workers=None,
+        previous_teams=None,
+        changed_people=(),
+        sparse=None,
+        pinned_pairs=None,
+        forbidden_pairs=None,
+        locked_teams=None,
+        decompose=None,
+        matrix=None
 ):  
-    def calc_pair_compatibility_score(p1, p2):
-        """
-        Helper function
-        Calculates compatibility scores for pairs specifically
-        """
-        return ((teammate_prefs.get(p1, {}).get(p2, 5) # Defaults to preference value of 5 if p1 does not have a preference for p2
-                + teammate_prefs.get(p2, {}).get(p1, 5)) / 2) 
-
-    def calc_team_compatibility_score(team):
-        """
-        Helper function
-        Calculates teammate compatibility scores between each teammate
-        """
-        # Ensure that an error is not thrown if a team of only one person exists for some reason
-        if len(team) < 2:
-            return 5
-        pairs = list(itertools.combinations(team, 2))
-        return sum(calc_pair_compatibility_score(a, b) for a, b in pairs) / len(pairs) 
-
-    
-    def calc_project_compatibility_score(team, project):
-        """
-        Helper function
-        Calculates collective project preference score for a given team
-        """
-        # Add together preference scores for a particular project for each person on a potential team
-        total = sum(project_prefs.get(p, {}).get(project, 3) for p in team) # Default score is 3 if there was no project preference given
-        # Average the project preference scores
-        return total / len(team)
-    
-    # Sort everyone deterministically
-    people = sorted(people)
-    remaining = set(people)
-    teams = []
-
-    # Form teams using a greedy but balanced algorithm
-    while remaining:
-        # Chose the person with the greatest number of potential partners that selected them
-        current = max(
-            remaining,
-            key=lambda p: sum(teammate_prefs.get(p, {}).get(other, 5) for other in remaining if other != p)
-        )
-        remaining.remove(current)
-
-        # Find the most compatible teammates for this person
-        candidates = sorted(
-            remaining,
-            key=lambda x: teammate_prefs.get(current, {}).get(x, 5)
-                        + teammate_prefs.get(x, {}).get(current, 5),
-            reverse=True
-        )
-
-        # Team size logic
-        if len(remaining) == 0:
-            team = [current]
-        else:
-            # Predict if making a max-size team would leave a leftover smaller than min_size
-            remainder = (len(remaining) - (max_size - 1)) % max_size
-
-            if remainder < min_size and len(remaining) >= min_size:
-                # Form smaller team to balance group sizes later
-                team_size = min(min_size - 1, len(candidates))
-            else:
-                # Safe to form a full-size team
-                team_size = min(max_size - 1, len(candidates))
-
-            team = [current] + candidates[:team_size]
-            remaining.difference_update(candidates[:team_size])
-
-        teams.append(team)
-
-
-    teams_sorted = sorted(teams, key=lambda t: calc_team_compatibility_score(t), reverse=True)
-    projects_sorted = sorted(projects)
-
-    results = []
+    searching = exact or bool(portfolio_runs) or improve_iterations is not None or improve_seconds is not None
+    constrained = bool(pinned_pairs or forbidden_pairs or locked_teams)
+    if constrained and searching:
+        raise ValueError("Pinned, forbidden and locked teams only work with the greedy pass")
+    if decompose is None:
+        decompose = len(people) >= DECOMPOSE_MIN_PEOPLE and not (exact or portfolio_runs or constrained)
+    elif decompose and (exact or portfolio_runs or constrained):
+        raise ValueError("Decomposition replaces the greedy pass, it cannot be combined with exact or "
+                         "portfolio runs or constraints")
+    needs_dense = searching or constrained
+    if matrix is not None:
+        sparse = isinstance(matrix, SparseCompatibilityMatrix)
+        if sparse and needs_dense:
+            raise ValueError("Local search, exact and portfolio runs and constraints need a dense matrix")
+    elif sparse is None:
+        sparse = len(people) >= SPARSE_MIN_PEOPLE and not needs_dense
+    elif sparse and needs_dense:
+        raise ValueError("Local search, exact and portfolio runs and constraints need the dense matrix, "
+                         "use sparse=False")
+
+    # Build the pair and project matrices once, people are sorted deterministically
+    with instrumentation.phase('matrix'):
+        if matrix is None:
+            matrix_class = SparseCompatibilityMatrix if sparse else CompatibilityMatrix
+            matrix = matrix_class(people, teammate_prefs, projects, project_prefs)
+        constraints = TeamConstraints.from_names(matrix.person_index, pinned_pairs or (), forbidden_pairs or (),
+                                                 locked_teams or ()) if constrained else None
+
+    with instrumentation.phase('teams'):
+        teams = _form_teams(matrix, min_size, max_size, improve_iterations, improve_seconds, seed,
+                            exact, portfolio_runs, workers, previous_teams, changed_people, constraints, decompose)
+
+    with instrumentation.phase('assignment'):
+        team_scores = matrix.team_scores(teams)
+        assigned = assign_team_projects(matrix, teams, team_scores, projects, teammate_weight, project_weight,
+                                        assignment, project_capacities)
+    with instrumentation.phase('normalize'):
+        return score_results(matrix, teams, team_scores, assigned, teammate_weight, project_weight)
+
+
+def _form_teams(matrix, min_size, max_size, improve_iterations, improve_seconds, seed,
+                exact, portfolio_runs, workers, previous_teams, changed_people, constraints=None,
+                decompose=False):
+    """
+    Helper function
+    Team formation step of create_capstone_teams, returns teams of row indices
+    """
+    if constraints:
+        # Locked teams are set aside and the rest is grouped around the pinned and forbidden pairs,
+        # a warm start keeps every previous team that still meets the constraints
+        return repair_teams(matrix, previous_teams or [], changed_people, min_size, max_size, constraints)
+    if previous_teams is not None and not exact:
+        # Warm start, only the teams touched by a change are formed again
+        teams = repair_teams(matrix, previous_teams, changed_people, min_size, max_size)
+        if improve_iterations is not None or improve_seconds is not None:
+            teams, _ = improve_teams(matrix, teams, min_size, max_size,
+                                     max_iterations=improve_iterations,
+                                     time_budget=improve_seconds, seed=seed)
+    elif portfolio_runs and not exact:
+        # Imported here since portfolio.py builds on greedy_teams from this module
+        from portfolio import portfolio_teams
+
+        # Many perturbed greedy runs (each with the optional local search) across processes
+        teams, _ = portfolio_teams(matrix, runs=portfolio_runs, workers=workers, seed=seed,
+                                   min_size=min_size, max_size=max_size,
+                                   improve_iterations=improve_iterations,
+                                   improve_seconds=improve_seconds)
+    elif decompose:
+        # Imported here since decomposition.py builds on greedy_teams from this module
+        from decomposition import decompose_teams
+
+        # Greedy teams block by block across processes, then the block boundaries are fixed
+        teams = decompose_teams(matrix, min_size, max_size, workers=workers)
+        if improve_iterations is not None or improve_seconds is not None:
+            teams, _ = improve_teams(matrix, teams, min_size, max_size,
+                                     max_iterations=improve_iterations,
+                                     time_budget=improve_seconds, seed=seed)
+    else:
+        # Form teams using a greedy but balanced algorithm
+        teams = greedy_teams(matrix, min_size, max_size)
+
+        if exact:
+            # Small sections can be solved to optimality, the greedy teams are the starting point.
+            # The search size is reported as the exact.nodes and exact.rounds counters
+            with instrumentation.phase('exact'):
+                teams, _ = solve_exact(matrix, min_size, max_size, initial_teams=teams)
+        elif improve_iterations is not None or improve_seconds is not None:
+            # Optionally spend a fixed budget revisiting the greedy choices
+            teams, _ = improve_teams(matrix, teams, min_size, max_size,
+                                     max_iterations=improve_iterations,
+                                     time_budget=improve_seconds, seed=seed)
+
+    return teams
+
+
+def assign_team_projects(matrix, teams, team_scores, projects, teammate_weight=0.7, project_weight=0.3,
+                         assignment='alphabetical', project_capacities=None):
+    """
+    Pairs teams with projects, see create_capstone_teams for the modes
+    Returns [(team index, project column)] with the best team first
+    """
+    # Stable sort keeps formation order between teams with equal scores
+    order = np.argsort(-team_scores, kind='stable')
+
+    if assignment == 'optimal':
+        # Whole team x project table in one step, then a maximum-score assignment
+        combined_table = (teammate_weight * team_scores[:, None]
+                          + project_weight * matrix.team_project_scores(teams))
+        capacities = [(project_capacities or {}).get(p, 1) for p in matrix.projects]
+        project_of_team = assign_projects(combined_table, capacities)
+        return [(int(t), int(project_of_team[t])) for t in order if project_of_team[t] >= 0]
+    if assignment == 'alphabetical':
+        # Best teams take projects in alphabetical order
+        projects_sorted = [matrix.project_index[p] for p in sorted(projects)
+                           for _ in range((project_capacities or {}).get(p, 1))]
+        return [(int(t), k) for t, k in zip(order, projects_sorted)]
+    raise ValueError(f"Unknown assignment mode: {assignment}")
+
+
+def score_results(matrix, teams, team_scores, assigned, teammate_weight=0.7, project_weight=0.3):
+    """
+    Combined scores of the assigned teams, normalized to 1-100
+    Returns (ResultTable, overall score) as create_capstone_teams does
+    """
+    team_scores_out = []
     raw_score = []
 
-    # Possible score ranges
-    min_possible = teammate_weight * 1 + project_weight * 1
-    max_possible = teammate_weight * 10 + project_weight * 5
-
     def normalize(value):
         """Convert a raw score to 1–100 range, clamped to avoid overflow."""
-        norm = ((value - min_possible) / (max_possible - min_possible)) * 99 + 1
-        return round(max(1, min(100, norm)), 2)
+        return normalize_score(value, teammate_weight, project_weight)
 
-    for team, project in zip(teams_sorted, projects_sorted):
-        t_score = calc_team_compatibility_score(team)
-        p_score = calc_project_compatibility_score(team, project)
+    for t, k in assigned:
+        t_score = float(team_scores[t])
+        p_score = matrix.project_score(teams[t], k)
         combined = teammate_weight * t_score + project_weight * p_score
         raw_score.append(combined)
 
         team_normalized = normalize(combined)
-        results.append((team, project, int(round(team_normalized))))
+        team_scores_out.append(int(round(team_normalized)))
+
+    # Names stay as ids until a row of the table is read
+    with_project = {t for t, _ in assigned}
+    results = ResultTable([teams[t] for t, _ in assigned], [k for _, k in assigned], team_scores_out,
+                          matrix.people, matrix.projects,
+                          unassigned=[team for t, team in enumerate(teams) if t not in with_project])
 
     # Overall normalized score
     if raw_score:
@@ -147,6 +295,475 @@ def create_capstone_teams(
         normalized_total = 0
 
     return results, int(round(normalized_total))
+
+
+def greedy_teams(matrix, min_size=2, max_size=3, noise=0.0, seed=None, constraints=None):
+    """
+    Greedy team formation on a CompatibilityMatrix
+    Returns a list of teams, each a list of row indices
+
+    Ties are broken by row index, which is alphabetical name order
+
+    noise > 0 adds a random amount in [0, noise) preference points to every
+    popularity score and candidate key, giving a perturbed but reproducible
+    (for a given seed) variant of the greedy pass
+
+    constraints (a TeamConstraints on the matrix's rows) makes every team
+    start from its first person's pinned group and only take people whose
+    whole group fits and who are not forbidden with anyone already in it.
+    Teams that end up below min_size are then filled up from the others,
+    ValueError is raised if the constraints allow no valid split
+    """
+    if isinstance(matrix, SparseCompatibilityMatrix):
+        if noise:
+            raise ValueError("Noisy greedy runs need the dense CompatibilityMatrix")
+        if constraints:
+            raise ValueError("Constraints need the dense CompatibilityMatrix")
+        return _greedy_sparse(matrix, min_size, max_size)
+    if constraints and constraints.largest_group() > max_size:
+        raise ValueError(f"More than {max_size} people are pinned together")
+
+    n = len(matrix)
+    rng = np.random.default_rng(seed) if noise else None
+    alive = np.ones(n, dtype=bool)
+    remaining_count = n
+    teams = []
+
+    # Popularity of each person is the sum of their preferences over everyone still
+    # remaining. Every remaining person gets the same DEFAULT_TEAMMATE_PREF * (m - 1)
+    # term, so only the deviation from the default decides who goes first. Removing
+    # a person only changes the deviation of people who rated them explicitly.
+    explicit = matrix.prefs != DEFAULT_TEAMMATE_PREF
+    np.fill_diagonal(explicit, False)
+    # The diagonal is zero, so the row sum covers the other n - 1 people
+    deviation = matrix.prefs.sum(axis=1) - DEFAULT_TEAMMATE_PREF * (n - 1)
+    if rng is not None:
+        deviation += rng.uniform(0, noise, n)
+
+    # Max-heap on deviation with lazy deletion, (-deviation, index) so ties go to
+    # the lowest index
+    heap = [(-float(d), i) for i, d in enumerate(deviation)]
+    heapq.heapify(heap)
+
+    def remove(members):
+        """
+        Helper function
+        Takes people out of the pool and refreshes the popularity of those who rated them
+        """
+        alive[members] = False
+        touched = np.flatnonzero(explicit[:, members].any(axis=1) & alive)
+        if len(touched):
+            deviation[touched] -= (matrix.prefs[np.ix_(touched, members)] - DEFAULT_TEAMMATE_PREF).sum(axis=1)
+            for i in touched:
+                heapq.heappush(heap, (-float(deviation[i]), int(i)))
+
+    heap_pops = 0
+    while remaining_count:
+        # Chose the person with the greatest number of potential partners that selected them
+        # Entries for removed people or stale scores are skipped
+        while True:
+            neg_score, current = heapq.heappop(heap)
+            heap_pops += 1
+            if alive[current] and -neg_score == deviation[current]:
+                break
+        alive[current] = False
+        remaining_count -= 1
+
+        # Team size logic
+        if constraints:
+            team = _constrained_team(matrix, constraints, current, alive, remaining_count, min_size, max_size,
+                                     rng, noise)
+            remaining_count -= len(team) - 1
+            remove(np.array(team[1:], dtype=np.intp))
+        elif remaining_count == 0:
+            team = [current]
+        else:
+            team_size = _teammates_needed(remaining_count, min_size, max_size)
+
+            # Find the most compatible teammates for this person
+            remaining = np.flatnonzero(alive)
+            keys = matrix.prefs[current, remaining] + matrix.prefs[remaining, current]
+            if rng is not None:
+                keys = keys + rng.uniform(0, noise, len(keys))
+            chosen = remaining[_top_k(keys, team_size)]
+            team = [current] + [int(i) for i in chosen]
+            remaining_count -= len(chosen)
+            remove(chosen)
+
+        remove(np.array([current], dtype=np.intp))
+        teams.append(team)
+
+    instrumentation.count('greedy.iterations', len(teams))
+    instrumentation.count('greedy.heap_pops', heap_pops)
+    if constraints:
+        teams = _merge_small_teams(matrix, teams, constraints, min_size, max_size)
+    return teams
+
+
+def _constrained_team(matrix, constraints, current, alive, remaining_count, min_size, max_size, rng, noise):
+    """
+    Helper function
+    The team greedy_teams forms around current under hard constraints
+
+    Starts from current's pinned group and walks the remaining people by
+    candidate key, taking each one's whole group if it fits in the free
+    places and nobody in it is forbidden with the team so far. Team members
+    are marked as no longer alive, current already is
+    """
+    team = [current] + [i for i in constraints.group(current) if i != current]
+    alive[team] = False
+    places = _teammates_needed(remaining_count, min_size, max_size) - (len(team) - 1) if remaining_count else 0
+
+    remaining = np.flatnonzero(alive)
+    if places <= 0 or not len(remaining):
+        return team
+    keys = matrix.prefs[current, remaining] + matrix.prefs[remaining, current]
+    if rng is not None:
+        keys = keys + rng.uniform(0, noise, len(keys))
+    # One OR over the team's bitset rows rules out everyone forbidden with it
+    blocked = constraints.blocked(team)
+    for position in np.argsort(-keys, kind='stable'):
+        candidate = int(remaining[position])
+        if blocked[candidate] or not alive[candidate]:
+            continue
+        group = constraints.group(candidate)
+        if len(group) > places or blocked[group].any():
+            continue
+        team.extend(group)
+        alive[group] = False
+        places -= len(group)
+        if places == 0:
+            break
+        blocked |= constraints.blocked(group)
+    return team
+
+
+def _merge_small_teams(matrix, teams, constraints, min_size, max_size):
+    """
+    Helper function
+    Brings every team below min_size up to size without breaking a pinned or
+    forbidden pair (see _grow_team). If that gets stuck, any valid split is
+    searched for instead, and ValueError is raised when there is none
+    """
+    teams = [list(team) for team in teams]
+    while True:
+        small = [team for team in teams if len(team) < min_size]
+        if not small:
+            return teams
+        if not _grow_team(matrix, teams, min(small, key=len), constraints, min_size, max_size):
+            split = _valid_split(constraints, sorted(i for team in teams for i in team), min_size, max_size)
+            if split is None:
+                raise ValueError(f"The pinned and forbidden pairs leave no way to form teams of "
+                                 f"{min_size}-{max_size}")
+            return split
+
+
+def _grow_team(matrix, teams, small, constraints, min_size, max_size):
+    """
+    Helper function
+    One step that shrinks how far the teams are below min_size, the first of
+        merge  : small joins the team with room it fits best with
+        pull   : a pinned group (or single person) that a team can spare joins small
+        swap   : a group leaves a team for another team with room, small takes its place
+        spread : small's groups join different teams with room
+    that applies. teams is changed in place, returns False if none applies
+    """
+    def fits(members, team):
+        return len(team) + len(members) <= max_size and not constraints.blocked(members)[team].any()
+
+    def affinity(a, b):
+        return matrix.block_sum(a, b) + matrix.block_sum(b, a)
+
+    def take(unit, team):
+        team[:] = [i for i in team if i not in unit]
+
+    others = [team for team in teams if team is not small]
+    targets = [team for team in others if fits(small, team)]
+    if targets:
+        max(targets, key=lambda team: affinity(small, team)).extend(small)
+        teams.remove(small)
+        return True
+
+    pulls = [(unit, team) for team in others for unit in _units(constraints, team)
+             if len(team) - len(unit) >= min_size and fits(unit, small)]
+    if pulls:
+        unit, donor = max(pulls, key=lambda pull: affinity(pull[0], small))
+        take(unit, donor)
+        small.extend(unit)
+        return True
+
+    blocked = constraints.blocked(small)
+    swaps = []
+    for team in others:
+        for unit in _units(constraints, team):
+            rest = [i for i in team if i not in unit]
+            if not rest or len(rest) + len(small) > max_size or blocked[rest].any():
+                continue
+            for other in others:
+                if other is not team and fits(unit, other):
+                    swaps.append((affinity(small, rest) + affinity(unit, other), unit, team, other))
+    if swaps:
+        _, unit, team, other = max(swaps, key=lambda swap: swap[0])
+        take(unit, team)
+        other.extend(unit)
+        team.extend(small)
+        teams.remove(small)
+        return True
+
+    placed = [list(team) for team in others]
+    for unit in _units(constraints, small):
+        targets = [team for team in placed if fits(unit, team)]
+        if not targets:
+            return False
+        max(targets, key=lambda team: affinity(unit, team)).extend(unit)
+    teams[:] = placed
+    return True
+
+
+def _units(constraints, team):
+    """
+    Helper function
+    The pinned groups (or single people) a valid team is made of
+    """
+    units = []
+    seen = set()
+    for i in team:
+        if i not in seen:
+            unit = list(constraints.group(i))
+            seen.update(unit)
+            units.append(unit)
+    return units
+
+
+def _valid_split(constraints, people, min_size, max_size):
+    """
+    Helper function
+    Any split of people into teams of min_size..max_size that keeps every
+    constraint, by backtracking over the pinned groups, or None
+    """
+    n = len(people)
+    max_teams = n // min_size
+    if max_teams * max_size < n:
+        return None
+    # Groups with the most forbidden partners are placed first, they fail soonest
+    units = sorted(_units(constraints, people),
+                   key=lambda unit: (-len(unit), -int(constraints.blocked(unit).sum())))
+    remaining = [0] * (len(units) + 1)
+    for k in range(len(units) - 1, -1, -1):
+        remaining[k] = remaining[k + 1] + len(units[k])
+    teams = []
+
+    def place(k):
+        if sum(max(0, min_size - len(team)) for team in teams) > remaining[k]:
+            return False
+        if sum(max_size - len(team) for team in teams) + (max_teams - len(teams)) * max_size < remaining[k]:
+            return False
+        if k == len(units):
+            return True
+        unit = units[k]
+        blocked = constraints.blocked(unit)
+        for team in teams:
+            if len(team) + len(unit) <= max_size and not blocked[team].any():
+                team.extend(unit)
+                if place(k + 1):
+                    return True
+                del team[-len(unit):]
+        if len(unit) > max_size or len(teams) == max_teams:
+            return False
+        teams.append(list(unit))
+        if place(k + 1):
+            return True
+        teams.pop()
+        return False
+
+    return teams if place(0) else None
+
+
+def _greedy_sparse(matrix, min_size, max_size):
+    """
+    Helper function
+    greedy_teams on a SparseCompatibilityMatrix, same teams as the dense pass
+
+    Everyone without an explicit rating in either direction has the same
+    candidate key (twice the default), so the candidates are the current
+    person's rated and rating neighbours plus the lowest-numbered remaining
+    people, found through a next-remaining-person table instead of a scan
+    """
+    n = len(matrix)
+    alive = np.ones(n, dtype=bool)
+    remaining_count = n
+    teams = []
+
+    # next_alive[i] leads to the lowest remaining index >= i, n when there is none
+    next_alive = np.arange(n + 1)
+
+    def first_alive(i):
+        root = i
+        while next_alive[root] != root:
+            root = next_alive[root]
+        while next_alive[i] != root:
+            next_alive[i], i = root, next_alive[i]
+        return root
+
+    # Popularity deviation as in greedy_teams, from the stored ratings only
+    raters = np.repeat(np.arange(n), np.diff(matrix.indptr))
+    deviation = np.bincount(raters, weights=matrix.data - DEFAULT_TEAMMATE_PREF, minlength=n)
+    heap = [(-float(d), i) for i, d in enumerate(deviation)]
+    heapq.heapify(heap)
+
+    def remove(members):
+        for m in members:
+            alive[m] = False
+            next_alive[m] = m + 1
+        received = [matrix.received(m) for m in members]
+        if not received:
+            return
+        who = np.concatenate([r for r, _ in received])
+        values = np.concatenate([v for _, v in received])
+        keep = alive[who]
+        if keep.any():
+            touched, inverse = np.unique(who[keep], return_inverse=True)
+            deviation[touched] -= np.bincount(inverse, weights=values[keep] - DEFAULT_TEAMMATE_PREF)
+            for i in touched:
+                heapq.heappush(heap, (-float(deviation[i]), int(i)))
+
+    default_key = 2 * DEFAULT_TEAMMATE_PREF
+    heap_pops = 0
+    while remaining_count:
+        while True:
+            neg_score, current = heapq.heappop(heap)
+            heap_pops += 1
+            if alive[current] and -neg_score == deviation[current]:
+                break
+        alive[current] = False
+        next_alive[current] = current + 1
+        remaining_count -= 1
+
+        if remaining_count == 0:
+            team = [current]
+        else:
+            team_size = _teammates_needed(remaining_count, min_size, max_size)
+
+            given, given_values = matrix.given(current)
+            received, received_values = matrix.received(current)
+            neighbours = np.concatenate([given, received])
+            offsets = np.concatenate([given_values, received_values]) - DEFAULT_TEAMMATE_PREF
+            keep = alive[neighbours]
+            neighbours, inverse = np.unique(neighbours[keep], return_inverse=True)
+            keys = default_key + np.bincount(inverse, weights=offsets[keep], minlength=len(neighbours))
+
+            # Enough default-keyed people to fill the team if no neighbour beats them
+            known = set(neighbours.tolist())
+            fillers = []
+            i = first_alive(0)
+            while i < n and len(fillers) < team_size:
+                if i not in known:
+                    fillers.append(i)
+                i = first_alive(i + 1)
+
+            candidates = np.concatenate([neighbours, np.array(fillers, dtype=np.intp)])
+            keys = np.concatenate([keys, np.full(len(fillers), float(default_key))])
+            order = np.argsort(candidates, kind='stable')
+            chosen = candidates[order][_top_k(keys[order], team_size)]
+            team = [current] + [int(i) for i in chosen]
+            remaining_count -= len(chosen)
+            remove(chosen)
+
+        remove([current])
+        teams.append(team)
+
+    instrumentation.count('greedy.iterations', len(teams))
+    instrumentation.count('greedy.heap_pops', heap_pops)
+    return teams
+
+
+def _teammates_needed(remaining_count, min_size, max_size):
+    """
+    Helper function
+    How many teammates the next team takes from the remaining_count people left
+    """
+    # Predict if making a max-size team would leave a leftover smaller than min_size
+    remainder = (remaining_count - (max_size - 1)) % max_size
+
+    if remainder < min_size and remaining_count >= min_size:
+        # Form smaller team to balance group sizes later
+        return min(min_size - 1, remaining_count)
+    # Safe to form a full-size team
+    return min(max_size - 1, remaining_count)
+
+
+def repair_teams(matrix, previous_teams, changed_people, min_size=2, max_size=3, constraints=None):
+    """
+    Warm-started team formation on a CompatibilityMatrix
+    previous_teams are lists of names, the result is a list of teams of row indices
+
+    A previous team is kept if all of its members are still in the cohort, none
+    of them is in changed_people and its size is still within the bounds. Everyone else (members of broken teams
+    and people not in any previous team) is regrouped by greedy_teams on their
+    own sub-matrix. If that pool is too small to form a team, the kept team it
+    fits best with is broken up and added to it.
+
+    With constraints (a TeamConstraints) the locked teams come first and are
+    never broken up, and a previous team is also dropped if it breaks a
+    pinned or forbidden pair, so a new constraint only re-forms the teams it
+    touches. If the pool cannot form valid teams on its own, its people are
+    fitted in among the kept teams, moving as few of them as possible.
+    """
+    changed = set(changed_people)
+    index = matrix.person_index
+    locked = [list(team) for team in constraints.locked_teams] if constraints else []
+    placed = {i for team in locked for i in team}
+    kept = []
+    for team in previous_teams:
+        members = [index[p] for p in team if p in index]
+        valid = len(members) == len(team) and min_size <= len(team) <= max_size
+        if valid and not changed.intersection(team) and not placed.intersection(members) \
+                and (not constraints or constraints.allows(members)):
+            kept.append(members)
+            placed.update(members)
+    pool = [i for i in range(len(matrix)) if i not in placed]
+
+    # Pull in whole kept teams until the pool can form at least one valid team
+    while pool and len(pool) < min_size and kept:
+        affinity = [matrix.block_sum(pool, team) + matrix.block_sum(team, pool) for team in kept]
+        pool = sorted(pool + kept.pop(int(np.argmax(affinity))))
+
+    if not pool:
+        return locked + kept
+    submatrix = matrix.submatrix(pool)
+    pool_constraints = constraints.restricted(pool) if constraints else None
+    try:
+        regrouped = [[pool[i] for i in team]
+                     for team in greedy_teams(submatrix, min_size, max_size, constraints=pool_constraints)]
+    except ValueError:
+        if not constraints or not kept:
+            raise
+        # The pool cannot be split on its own, its pinned groups are fitted in among the kept teams
+        return locked + _merge_small_teams(matrix, kept + _units(constraints, pool), constraints,
+                                           min_size, max_size)
+    return locked + kept + regrouped
+
+
+def _top_k(keys, k):
+    """
+    Helper function
+    Positions of the k largest keys, ordered by key (descending) then position
+
+    Same as the first k entries of a stable descending sort, without sorting everything
+    """
+    instrumentation.count('greedy.candidate_selections')
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= len(keys):
+        return np.argsort(-keys, kind='stable')
+    # k-th largest key
+    kth = np.partition(keys, len(keys) - k)[len(keys) - k]
+    above = np.flatnonzero(keys > kth)
+    tied = np.flatnonzero(keys == kth)[:k - len(above)]
+    picked = np.sort(np.concatenate([above, tied]))
+    return picked[np.argsort(-keys[picked], kind='stable')]
+
+
 # ~~~ Examples ~~~
 
 """
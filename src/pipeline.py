@@ -0,0 +1,203 @@
+"""
+The read -> transform -> match -> write run shared by main.py, batch.py and cli.py.
+
+Rows are parsed with form_parser, so nothing here needs pandas or the Google
+client libraries: a run between local files only imports numpy and the
+matching modules. main.py re-exports these functions, async_pipeline.py runs
+the same stages with the fetch overlapping the transform (RowTransform).
+"""
+import instrumentation
+from compat_matrix import CompatibilityMatrix
+from form_parser import parse_header, parse_row, parse_rows
+from matching_algorithm import create_capstone_teams, score_results
+from run_state import diff_rows, load_run_state, row_hash, save_run_state
+
+
+def transform_rows_incremental(header, rows, state):
+    """
+    Transform raw sheet rows, reusing the saved result of every unchanged row.
+
+    state is the previous run's state from run_state.load_run_state (or None).
+    Returns ((people, teammate_prefs, projects, project_prefs), row entries for
+    the next state, changed people, number of rows transformed). The
+    preferences are identical to a full transform of all rows.
+    """
+    transform = RowTransform(header, state)
+    transform.add(rows)
+    return transform.finish()
+
+
+class RowTransform:
+    """
+    transform_rows_incremental fed chunk by chunk, so rows can be parsed while
+    later chunks are still being read. finish() returns the same as
+    transform_rows_incremental on all the rows added
+    """
+
+    def __init__(self, header, state):
+        self.header = header
+        self.layout = parse_header(header)
+        self.saved_rows = state.get('rows', []) if state and state.get('header') == header else []
+        self.entries = []
+        self.changed_people = set()
+        self.transformed = 0
+
+    def add(self, rows):
+        """Transform the next rows of the tab"""
+        offset = len(self.entries)
+        # The saved rows at the same positions stand in for the whole state
+        saved = {'header': self.header, 'rows': self.saved_rows[offset:offset + len(rows)]}
+        cached, changed_rows, changed_people = diff_rows(self.header, rows, saved)
+        entries = dict(cached)
+        with instrumentation.phase('parse'):
+            for i in changed_rows:
+                person, teammates, projects = parse_row(self.layout, rows[i])
+                entries[i] = {
+                    'hash': row_hash(rows[i]),
+                    'person': person,
+                    'teammates': teammates,
+                    'projects': projects,
+                }
+                changed_people.add(person)
+        self.entries.extend(entries[i] for i in range(len(rows)))
+        self.changed_people |= changed_people
+        self.transformed += len(changed_rows)
+
+    def finish(self):
+        row_entries = self.entries
+        # Rows that were deleted from the end of the tab
+        changed_people = self.changed_people | {entry['person'] for entry in self.saved_rows[len(row_entries):]}
+
+        people = [entry['person'] for entry in row_entries]
+        known = set(people)
+        teammate_prefs = {}
+        project_prefs = {}
+        for entry in row_entries:
+            teammate_prefs[entry['person']] = {name: score for name, score in entry['teammates'].items()
+                                               if name in known}
+            project_prefs[entry['person']] = dict(entry['projects'])
+        projects = list(self.layout.projects)
+        return (people, teammate_prefs, projects, project_prefs), row_entries, changed_people, self.transformed
+
+
+def match_incremental(header, rows, state, min_size=2, max_size=3, **match_options):
+    """
+    Transform and match, starting from the previous run's state.
+
+    Only new or edited rows are transformed and only teams containing someone
+    whose row changed are formed again. Returns (results, total_score,
+    new_state, stats), new_state is ready for run_state.save_run_state.
+    """
+    with instrumentation.phase('transform'):
+        transformed = transform_rows_incremental(header, rows, state)
+    return match_transformed(header, state, transformed, min_size, max_size, **match_options)
+
+
+def match_transformed(header, state, transformed, min_size=2, max_size=3, **match_options):
+    """
+    The match step of match_incremental, transformed is what
+    transform_rows_incremental (or RowTransform.finish) returned
+    """
+    (people, teammate_prefs, projects, project_prefs), row_entries, changed_people, n_transformed = transformed
+    instrumentation.count('rows.read', len(row_entries))
+    instrumentation.count('rows.transformed', n_transformed)
+
+    params = {'min_size': min_size, 'max_size': max_size}
+    warm = bool(state) and state.get('params') == params and state.get('teams') is not None
+    with instrumentation.phase('match'):
+        results, total_score = create_capstone_teams(
+            people, teammate_prefs, projects, project_prefs,
+            min_size=min_size, max_size=max_size,
+            previous_teams=state['teams'] if warm else None,
+            changed_people=changed_people,
+            **match_options
+        )
+
+    new_state = {
+        'header': header,
+        'rows': row_entries,
+        'projects': projects,
+        'params': params,
+        # Teams left without a project are kept too, or a warm start would regroup them
+        'teams': [team for team, _, _ in results] + results.unassigned_teams(),
+    }
+    stats = {
+        'rows': len(row_entries),
+        'rows_transformed': n_transformed,
+        'changed_people': len(changed_people),
+        'warm_start': warm,
+    }
+    return results, total_score, new_state, stats
+
+
+def format_results(results, total_score):
+    """The output table written to the sink, header row first."""
+    output_values = [['Team Members', 'Project', 'Score']]
+    for team, project, score in results:
+        output_values.append([', '.join(team), project, score])
+    output_values.append(['', 'Overall Score', total_score])
+    return output_values
+
+
+def run_pipeline(source, sink, state_file=None, **match_options):
+    """
+    Read responses from source, match them and write the results to sink.
+
+    With a state_file the run is incremental (see match_incremental) and the
+    state is saved once the write succeeds. Returns (results, total_score,
+    stats), or None when the source has no responses.
+    """
+    with instrumentation.phase('fetch'):
+        header, rows = source.read_rows()
+    if not rows:
+        return None
+
+    state = load_run_state(state_file) if state_file else None
+    results, total_score, new_state, stats = match_incremental(header, rows, state, **match_options)
+    with instrumentation.phase('write'):
+        written = sink.write(format_results(results, total_score))
+    if written and state_file:
+        save_run_state(new_state, state_file)
+    return results, total_score, stats
+
+
+def load_results(header, rows, output_values):
+    """
+    The matrix of the responses and the teams of a results table (as
+    format_results writes it): (matrix, teams of row indices, project columns)
+
+    Raises ValueError for a person or project that is not in the responses.
+    """
+    people, teammate_prefs, projects, project_prefs = parse_rows(header, rows)
+    matrix = CompatibilityMatrix(people, teammate_prefs, projects, project_prefs)
+
+    teams = []
+    project_ids = []
+    for members, project, *_ in output_values[1:]:
+        if not members:
+            # The overall score row
+            continue
+        team = []
+        for name in members.split(', '):
+            if name not in matrix.person_index:
+                raise ValueError(f"{name!r} is not in the responses")
+            team.append(matrix.person_index[name])
+        if project not in matrix.project_index:
+            raise ValueError(f"Unknown project {project!r}")
+        teams.append(team)
+        project_ids.append(matrix.project_index[project])
+    return matrix, teams, project_ids
+
+
+def rescore(header, rows, output_values, teammate_weight=0.7, project_weight=0.3):
+    """
+    Score the teams of a results table against the responses, e.g. after the
+    teams were edited by hand.
+
+    Returns (results, total_score) like create_capstone_teams. Raises
+    ValueError for a person or project that is not in the responses.
+    """
+    matrix, teams, project_ids = load_results(header, rows, output_values)
+    team_scores = matrix.team_scores(teams)
+    return score_results(matrix, teams, team_scores, list(enumerate(project_ids)),
+                         teammate_weight, project_weight)
@@ -0,0 +1,143 @@
+"""
+Portfolio search: many perturbed greedy runs in parallel, keep the best.
+
+The greedy pass is deterministic, so a single bad early seed choice decides the
+whole result. portfolio_teams runs the plain greedy pass plus runs - 1 noisy
+variants (greedy_teams with noise and a per-run seed), each optionally followed
+by the local-search pass, across a ProcessPoolExecutor. The teams with the
+highest average team compatibility score win, ties go to the lowest run number.
+
+The n x n prefs matrix is copied into one multiprocessing.shared_memory block
+when the pool starts. Workers attach to it in their initializer and wrap it
+with CompatibilityMatrix.from_arrays, so tasks only carry a run number and a
+seed, never the matrix. A matrix loaded from a snapshot (snapshot.py) is not
+copied at all, workers map the same snapshot file.
+
+Per-run seeds are spawned from the master seed with numpy's SeedSequence, so a
+given (seed, runs) pair always produces the same result whatever the number
+of workers.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from compat_matrix import CompatibilityMatrix
+from local_search import improve_teams
+from matching_algorithm import greedy_teams
+
+DEFAULT_NOISE = 2.0
+
+# Matrix attached by each worker process in _attach_shared_matrix
+_worker_matrix = None
+_worker_memory = None
+
+
+def portfolio_teams(matrix, runs=8, workers=None, seed=0, min_size=2, max_size=3,
+                    noise=DEFAULT_NOISE, improve_iterations=None, improve_seconds=None):
+    """
+    Best teams out of `runs` greedy runs on a CompatibilityMatrix
+
+    workers : int
+        process count, defaults to os.cpu_count(), 1 runs everything in this process
+    noise : float
+        perturbation for runs after the first, in preference points (see greedy_teams)
+    improve_iterations, improve_seconds : optional local-search budget per run
+
+    Returns (teams, stats), where stats holds
+        best_run : index of the winning run (0 is the plain greedy pass)
+        scores   : average team score of every run, in run order
+        seconds  : wall-clock time
+    """
+    start = time.perf_counter()
+    outcomes = greedy_runs(matrix, runs, workers, seed, min_size, max_size, noise,
+                           improve_iterations, improve_seconds)
+
+    scores = [score for _, score in outcomes]
+    # max keeps the first of equal scores, so ties go to the lowest run
+    best_run = max(range(runs), key=lambda r: scores[r])
+    stats = {
+        'best_run': best_run,
+        'scores': scores,
+        'seconds': time.perf_counter() - start,
+    }
+    return outcomes[best_run][0], stats
+
+
+def greedy_runs(matrix, runs, workers=None, seed=0, min_size=2, max_size=3,
+                noise=DEFAULT_NOISE, improve_iterations=None, improve_seconds=None):
+    """
+    Every run of a portfolio, see portfolio_teams for the arguments
+    Returns [(teams, average team score)] in run order
+    """
+    if runs < 1:
+        raise ValueError("runs must be at least 1")
+    run_seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(runs)]
+    tasks = [(run, run_seeds[run], min_size, max_size, noise, improve_iterations, improve_seconds)
+             for run in range(runs)]
+
+    workers = min(workers or os.cpu_count() or 1, runs)
+    snapshot_path = getattr(matrix, 'snapshot_path', None)
+    if workers == 1 or len(matrix) == 0:
+        return [_run(matrix, *task) for task in tasks]
+    if snapshot_path is not None:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_snapshot,
+                                 initargs=(snapshot_path,)) as pool:
+            return list(pool.map(_run_in_worker, tasks))
+
+    memory = shared_memory.SharedMemory(create=True, size=max(matrix.prefs.nbytes, 1))
+    try:
+        shared = np.ndarray(matrix.prefs.shape, dtype=matrix.prefs.dtype, buffer=memory.buf)
+        shared[:] = matrix.prefs
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_matrix,
+                                 initargs=(memory.name, matrix.prefs.shape, matrix.prefs.dtype.str)) as pool:
+            outcomes = list(pool.map(_run_in_worker, tasks))
+        del shared
+    finally:
+        memory.close()
+        memory.unlink()
+    return outcomes
+
+
+def _run(matrix, run, run_seed, min_size, max_size, noise, improve_iterations, improve_seconds):
+    """
+    Helper function
+    One portfolio run, returns (teams, average team score)
+    """
+    teams = greedy_teams(matrix, min_size, max_size,
+                         noise=noise if run else 0.0, seed=run_seed)
+    if improve_iterations is not None or improve_seconds is not None:
+        teams, _ = improve_teams(matrix, teams, min_size, max_size,
+                                 max_iterations=improve_iterations,
+                                 time_budget=improve_seconds, seed=run_seed)
+    score = float(np.mean(matrix.team_scores(teams))) if teams else 0.0
+    return teams, score
+
+
+def _attach_shared_matrix(name, shape, dtype):
+    """
+    Helper function
+    Pool initializer, maps the parent's shared prefs block into this worker
+    """
+    global _worker_matrix, _worker_memory
+    # Workers share the parent's resource tracker, the parent unlinks the block when done
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    prefs = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_worker_memory.buf)
+    _worker_matrix = CompatibilityMatrix.from_arrays(prefs)
+
+
+def _attach_snapshot(path):
+    """
+    Helper function
+    Pool initializer, maps the snapshot the parent's matrix was loaded from
+    """
+    global _worker_matrix
+    from snapshot import load_snapshot
+
+    _worker_matrix = load_snapshot(path).matrix
+
+
+def _run_in_worker(task):
+    return _run(_worker_matrix, *task)
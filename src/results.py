@@ -0,0 +1,157 @@
+"""
+Compact result objects for create_capstone_teams.
+
+The matching runs on integer row and project ids (see compat_matrix.py), and
+the results stay in that form: a ResultTable keeps the team members, project
+ids and scores in numpy arrays and shares the cohort's people and project
+lists by reference. Names are only looked up when a row is read.
+
+Rows come back as Assignment objects holding a Team. Both use __slots__ and
+behave like the plain values create_capstone_teams used to return:
+
+    team, project, score = results[0]        # team is a list of names
+    results == [(["A", "B"], "X", 90), ...]  # compares by names
+
+so callers that unpack or compare the old (team, project, score) tuples keep
+working unchanged.
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class Team:
+    """Member ids of one team, names are looked up on access"""
+
+    __slots__ = ('ids', '_people')
+
+    def __init__(self, ids, people):
+        self.ids = ids
+        self._people = people
+
+    @property
+    def names(self):
+        return [self._people[i] for i in self.ids]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getitem__(self, i):
+        return self.names[i]
+
+    def __eq__(self, other):
+        if isinstance(other, Team):
+            return self.names == other.names
+        if isinstance(other, (list, tuple)):
+            return self.names == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Team({self.names!r})'
+
+
+class Assignment:
+    """One team with its project and 1-100 score, unpacks as (names, project, score)"""
+
+    __slots__ = ('team', 'project_id', 'score', '_projects')
+
+    def __init__(self, team, project_id, score, projects):
+        self.team = team
+        self.project_id = project_id
+        self.score = score
+        self._projects = projects
+
+    @property
+    def project(self):
+        return self._projects[self.project_id]
+
+    def as_tuple(self):
+        return self.team.names, self.project, self.score
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __getitem__(self, i):
+        return self.as_tuple()[i]
+
+    def __eq__(self, other):
+        if isinstance(other, Assignment):
+            return self.as_tuple() == other.as_tuple()
+        if isinstance(other, (list, tuple)):
+            return self.as_tuple() == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Assignment({self.team.names!r}, {self.project!r}, {self.score!r})'
+
+
+class ResultTable(Sequence):
+    """
+    Array-backed list of Assignments, best team first
+
+    members     : T x (largest team size) member ids, padded with -1
+    sizes       : team sizes
+    project_ids : column of each team's project in `projects`
+    scores      : 1-100 team scores
+    unassigned  : member ids of the formed teams that got no project, they
+                  are not rows of the table
+    """
+
+    __slots__ = ('members', 'sizes', 'project_ids', 'scores', 'people', 'projects', 'unassigned')
+
+    def __init__(self, teams, project_ids, scores, people, projects, unassigned=()):
+        width = max((len(team) for team in teams), default=0)
+        self.members = np.full((len(teams), width), -1, dtype=np.int32)
+        for t, team in enumerate(teams):
+            self.members[t, :len(team)] = team
+        self.sizes = np.array([len(team) for team in teams], dtype=np.int32)
+        self.project_ids = np.asarray(project_ids, dtype=np.int32).reshape(len(teams))
+        self.scores = np.asarray(scores, dtype=np.int32).reshape(len(teams))
+        self.people = people
+        self.projects = projects
+        self.unassigned = [list(team) for team in unassigned]
+
+    def team_ids(self, t):
+        """Member ids of team t"""
+        return self.members[t, :self.sizes[t]].tolist()
+
+    def unassigned_teams(self):
+        """Names of the teams without a project, e.g. more teams than projects"""
+        return [[self.people[i] for i in team] for team in self.unassigned]
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __getitem__(self, t):
+        if isinstance(t, slice):
+            return [self[i] for i in range(*t.indices(len(self)))]
+        if t < 0:
+            t += len(self)
+        if not 0 <= t < len(self):
+            raise IndexError('result index out of range')
+        return Assignment(Team(self.team_ids(t), self.people), int(self.project_ids[t]),
+                          int(self.scores[t]), self.projects)
+
+    def to_rows(self):
+        """The results as plain (names, project, score) tuples"""
+        return [assignment.as_tuple() for assignment in self]
+
+    def __eq__(self, other):
+        if isinstance(other, (ResultTable, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'ResultTable({self.to_rows()!r})'
@@ -0,0 +1,76 @@
+"""
+Persisted state between runs of main.py, for incremental re-matching.
+
+The state file (JSON) records, for the last run:
+    header   : the response tab's header row
+    rows     : one entry per response row with its content hash, the respondent
+               and the row's transformed preferences (teammate names not yet
+               checked against the cohort)
+    projects : project list parsed from the header
+    params   : team size bounds the teams were formed with
+    teams    : every formed team (lists of names), with a project or not
+
+diff_rows compares the current rows against it, so only new or changed rows
+need transforming and only teams containing changed people need re-forming.
+"""
+import hashlib
+import json
+import os
+
+STATE_VERSION = 1
+DEFAULT_STATE_FILE = 'matching_state.json'
+
+
+def row_hash(row):
+    """Content hash of one sheet row (a list of cell values)"""
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def load_run_state(path=DEFAULT_STATE_FILE):
+    """The saved state, or None if there is none or it cannot be used"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def save_run_state(state, path=DEFAULT_STATE_FILE):
+    """Write the state atomically, so an interrupted run never leaves half a file"""
+    state = dict(state, version=STATE_VERSION)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def diff_rows(header, rows, state):
+    """
+    Compare current rows with the saved state
+
+    Returns (cached, changed_rows, changed_people)
+        cached         : {row position: saved row entry} for rows whose content is unchanged
+        changed_rows   : positions of new or edited rows
+        changed_people : respondents of edited, new or deleted rows, under their
+                         old and new names
+    A different header invalidates every row.
+    """
+    saved_rows = state.get('rows', []) if state and state.get('header') == header else []
+    cached = {}
+    changed_rows = []
+    changed_people = set()
+    for i, row in enumerate(rows):
+        digest = row_hash(row)
+        if i < len(saved_rows) and saved_rows[i]['hash'] == digest:
+            cached[i] = saved_rows[i]
+        else:
+            changed_rows.append(i)
+            if i < len(saved_rows):
+                changed_people.add(saved_rows[i]['person'])
+    # Rows that were deleted from the end of the tab
+    for entry in saved_rows[len(rows):]:
+        changed_people.add(entry['person'])
+    return cached, changed_rows, changed_people
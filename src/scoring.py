@@ -0,0 +1,220 @@
+"""
+Cached team scoring and what-if questions on finished teams.
+
+TeamScorer answers the same team and team-project scores as the matrix it
+wraps (compat_matrix.py), but remembers each team's pair sum and project sums
+in a size-bounded LRU cache keyed on the team's members (as a frozenset, plus
+the project column for project sums). Repeated questions about the same teams
+cost a dict lookup.
+
+evaluate_swap and evaluate_move answer "what if these people changed teams?"
+from the cached sums: only the pair scores of the people who move are looked
+up (at most 2 * max_size lookups), the teams are never re-scored from scratch.
+
+    scorer = TeamScorer(matrix)
+    outcome = scorer.evaluate_swap(team_a, team_b, a, b)
+    outcome.delta   # change in the two teams' summed scores, > 0 is better
+
+Teams are lists of row indices into the matrix, scorer.ids maps names to them.
+"""
+from collections import OrderedDict, namedtuple
+
+from compat_matrix import DEFAULT_TEAMMATE_PREF
+
+DEFAULT_MAX_ENTRIES = 100000
+
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'size', 'max_entries'])
+
+# Scores of the two teams involved before and after a change, and the change in their sum
+Evaluation = namedtuple('Evaluation', ['before', 'after', 'delta'])
+
+
+def normalize_score(value, teammate_weight=0.7, project_weight=0.3):
+    """A combined team score on the 1-100 scale of the results, clamped to avoid overflow"""
+    min_possible = teammate_weight * 1 + project_weight * 1
+    max_possible = teammate_weight * 10 + project_weight * 5
+    norm = ((value - min_possible) / (max_possible - min_possible)) * 99 + 1
+    return round(max(1, min(100, norm)), 2)
+
+
+class ScoreCache:
+    """Least recently used cache holding at most max_entries values"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """The cached value, None on a miss"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        entries = self._entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self.max_entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TeamScorer:
+    """
+    Team, project and combined scores of one cohort, with an LRU cache of
+    team pair sums and project sums
+
+    Works with CompatibilityMatrix and SparseCompatibilityMatrix. Not meant to
+    be shared between threads
+    """
+
+    def __init__(self, matrix, teammate_weight=0.7, project_weight=0.3, max_entries=DEFAULT_MAX_ENTRIES):
+        self.matrix = matrix
+        self.teammate_weight = teammate_weight
+        self.project_weight = project_weight
+        self.cache = ScoreCache(max_entries)
+
+    def ids(self, names):
+        """Row indices of people by name"""
+        return [self.matrix.person_index[name] for name in names]
+
+    def team_score(self, team):
+        """Average pair score over every pair in the team, as matrix.team_score"""
+        return _score(self._pair_sum(frozenset(team)), len(team))
+
+    def project_score(self, team, project):
+        """Average preference of the team for a project (by column index), as matrix.project_score"""
+        return self._project_sum(frozenset(team), project) / len(team)
+
+    def combined_score(self, team, project):
+        """Weighted team and project score, before normalizing"""
+        return self.teammate_weight * self.team_score(team) + self.project_weight * self.project_score(team, project)
+
+    def normalized_score(self, team, project):
+        """The team's 1-100 score as it appears in the results"""
+        return int(round(normalize_score(self.combined_score(team, project),
+                                         self.teammate_weight, self.project_weight)))
+
+    def evaluate_swap(self, team_a, team_b, a, b, projects=None):
+        """
+        Swap person a of team_a with person b of team_b
+
+        Scores are team scores, or combined scores when the teams' projects are
+        given as (project of team_a, project of team_b). The teams themselves
+        are not changed
+        """
+        if a not in team_a or b not in team_b:
+            raise ValueError("Each person must be in their own team")
+        key_a, key_b = frozenset(team_a), frozenset(team_b)
+        sum_a, sum_b = self._pair_sum(key_a), self._pair_sum(key_b)
+        pair = self._affinity(a, (b,))
+        new_a = sum_a - self._affinity(a, team_a) + self._affinity(b, team_a) - pair
+        new_b = sum_b - self._affinity(b, team_b) + self._affinity(a, team_b) - pair
+
+        after_a, after_b = (key_a - {a}) | {b}, (key_b - {b}) | {a}
+        self.cache.put(after_a, new_a)
+        self.cache.put(after_b, new_b)
+        before = (_score(sum_a, len(key_a)), _score(sum_b, len(key_b)))
+        after = (_score(new_a, len(after_a)), _score(new_b, len(after_b)))
+        if projects is not None:
+            before = self._combine(before, (key_a, key_b), projects)
+            after = self._combine(after, (after_a, after_b), projects)
+        return Evaluation(before, after, sum(after) - sum(before))
+
+    def evaluate_move(self, person, source, target, projects=None):
+        """
+        Move person from team source to team target, see evaluate_swap
+
+        Team sizes are not checked, a team left with one person scores the
+        neutral DEFAULT_TEAMMATE_PREF
+        """
+        if person not in source or person in target:
+            raise ValueError("The person must be in source and not in target")
+        key_a, key_b = frozenset(source), frozenset(target)
+        sum_a, sum_b = self._pair_sum(key_a), self._pair_sum(key_b)
+        new_a = sum_a - self._affinity(person, source)
+        new_b = sum_b + self._affinity(person, target)
+
+        after_a, after_b = key_a - {person}, key_b | {person}
+        if after_a:
+            self.cache.put(after_a, new_a)
+        self.cache.put(after_b, new_b)
+        before = (_score(sum_a, len(key_a)), _score(sum_b, len(key_b)))
+        after = (_score(new_a, len(after_a)), _score(new_b, len(after_b)))
+        if projects is not None:
+            before = self._combine(before, (key_a, key_b), projects)
+            after = self._combine(after, (after_a, after_b), projects)
+        return Evaluation(before, after, sum(after) - sum(before))
+
+    def stats(self):
+        return self.cache.stats()
+
+    def _pair_sum(self, key):
+        """Sum of pair scores over every pair of the team, cached"""
+        value = self.cache.get(key)
+        if value is None:
+            members = list(key)
+            # The block holds both directions of every pair
+            value = self.matrix.block_sum(members, members) / 2
+            self.cache.put(key, value)
+        return value
+
+    def _project_sum(self, key, project):
+        """Sum of the team's preferences for a project, cached"""
+        value = self.cache.get((key, project))
+        if value is None:
+            value = float(self.matrix.project[list(key), project].sum())
+            self.cache.put((key, project), value)
+        return value
+
+    def _affinity(self, person, team):
+        """Sum of pair scores between one person and the other members of a team"""
+        prefs = getattr(self.matrix, 'prefs', None)
+        if prefs is None:
+            pair_score = self.matrix.pair_score
+            return sum(pair_score(person, m) for m in team if m != person)
+        # Teams are small, scalar lookups beat fancy indexing here
+        total = 0.0
+        for m in team:
+            if m != person:
+                total += prefs[person, m] + prefs[m, person]
+        return float(total) / 2
+
+    def _combine(self, scores, keys, projects):
+        """Combined scores from team scores, a team with nobody in it scores 0"""
+        combined = []
+        for score, key, project in zip(scores, keys, projects):
+            if not key:
+                combined.append(0.0)
+                continue
+            project_score = self._project_sum(key, project) / len(key)
+            combined.append(self.teammate_weight * score + self.project_weight * project_score)
+        return tuple(combined)
+
+
+def _score(pair_sum, size):
+    """
+    Helper function
+    Team compatibility score from a pair sum
+    """
+    if size < 2:
+        return float(DEFAULT_TEAMMATE_PREF)
+    return pair_sum / (size * (size - 1) // 2)
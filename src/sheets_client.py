@@ -0,0 +1,355 @@
+"""
+Shared Google Sheets client with retries and batched writes.
+
+get_service builds the Sheets client once per thread. credentials.json is
+read once per process, and each thread's requests go through its own
+keep-alive httplib2 connection (httplib2 connections cannot be shared between
+threads). reset_service drops the cached clients, e.g. after rotating
+credentials.
+
+execute_with_retry runs a request and retries rate limits (429) and server
+errors (5xx) with exponential backoff and full jitter. set_rate_limit caps
+how many requests per second execute_with_retry sends, across all threads.
+
+BatchWriter collects many range updates and sends them as a single
+values.batchUpdate request. write_changed_cells reads a block of cells once
+and rewrites only the cells that differ from the new values, clearing the
+ones the new values no longer reach, all through one BatchWriter.
+
+Everything here only talks to the object returned by get_service (or the one
+passed in), so tests can run offline against a local fake of the Sheets API.
+"""
+import importlib
+import json
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+
+from googleapiclient.errors import HttpError
+
+import instrumentation
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+CREDENTIALS_FILE = 'credentials.json'
+
+# Seconds before an HTTP request gives up
+HTTP_TIMEOUT = 60
+
+# Backoff settings for execute_with_retry
+MAX_RETRIES = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 32.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Ranges per values.batchUpdate request
+MAX_RANGES_PER_BATCH = 500
+
+# Cells rewritten and cleared by write_changed_cells, the rectangles they were
+# sent as and the requests made, the read included
+DiffStats = namedtuple('DiffStats', ['cells_written', 'cells_cleared', 'ranges', 'requests'])
+
+_ANCHOR = re.compile(r'^([A-Za-z]*)(\d*)$')
+
+_credentials = None
+_generation = 0
+_service_lock = threading.Lock()
+_local = threading.local()
+
+_rate_limiter = None
+
+# Discovery and the auth libraries take most of a short run's start-up, so
+# they are only imported (by __getattr__) when get_service first needs them
+_LAZY_IMPORTS = {
+    'httplib2': ('httplib2', None),
+    'service_account': ('google.oauth2.service_account', None),
+    'AuthorizedHttp': ('google_auth_httplib2', 'AuthorizedHttp'),
+    'build': ('googleapiclient.discovery', 'build'),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_IMPORTS[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def get_service(credentials_file=CREDENTIALS_FILE):
+    """
+    This thread's Sheets client, built on first use
+
+    Raises whatever loading the credentials raises, nothing is cached on failure
+    """
+    global _credentials
+    cached = getattr(_local, 'service', None)
+    if cached is not None and cached[0] == _generation:
+        return cached[1]
+    with _service_lock:
+        if _credentials is None:
+            with open(credentials_file, 'r') as f:
+                service_account_info = json.load(f)
+            _credentials = _lazy('service_account').Credentials.from_service_account_info(
+                service_account_info, scopes=SCOPES)
+        credentials, generation = _credentials, _generation
+    # One keep-alive connection pool for every request this thread makes
+    http = _lazy('AuthorizedHttp')(credentials, http=_lazy('httplib2').Http(timeout=HTTP_TIMEOUT))
+    service = _lazy('build')('sheets', 'v4', http=http, cache_discovery=False)
+    _local.service = (generation, service)
+    return service
+
+
+def reset_service():
+    """Forget the cached clients, the next get_service call in every thread builds a new one"""
+    global _credentials, _generation
+    with _service_lock:
+        _credentials = None
+        _generation += 1
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread: `rate` requests per second on
+    average, with bursts of up to `burst` requests
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for a token, returns the seconds waited"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Take the token now, so callers queue up in order, and wait out the deficit
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+def set_rate_limit(rate, burst=1):
+    """
+    Limit execute_with_retry to `rate` requests per second across all threads,
+    None removes the limit. Returns the previous RateLimiter (or None)
+    """
+    global _rate_limiter
+    previous = _rate_limiter
+    _rate_limiter = RateLimiter(rate, burst) if rate else None
+    return previous
+
+
+def execute_with_retry(request, max_retries=MAX_RETRIES, base_delay=BASE_DELAY,
+                       max_delay=MAX_DELAY, sleep=time.sleep, rng=random):
+    """
+    request.execute(), retrying 429/5xx responses and dropped connections
+
+    Waits a random time between 0 and base_delay * 2^attempt (capped at
+    max_delay) before each retry, so parallel callers do not retry in lockstep.
+    The last error is raised once max_retries retries have failed.
+    """
+    attempt = 0
+    while True:
+        if _rate_limiter is not None:
+            _rate_limiter.acquire()
+        instrumentation.count('sheets.requests')
+        try:
+            return request.execute()
+        except HttpError as error:
+            if not _is_retryable(error) or attempt >= max_retries:
+                raise
+        except (ConnectionError, TimeoutError):
+            if attempt >= max_retries:
+                raise
+        instrumentation.count('sheets.retries')
+        sleep(rng.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+        attempt += 1
+
+
+def _is_retryable(error):
+    """
+    Helper function
+    True for rate limit and server error responses
+    """
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status) in RETRY_STATUSES
+    except (TypeError, ValueError):
+        return False
+
+
+class BatchWriter:
+    """
+    Collects range updates and writes them with values.batchUpdate
+
+    Use as a context manager to flush on exit:
+
+        with BatchWriter(spreadsheet_id) as writer:
+            writer.add("'Team Results'!A1", rows)
+            writer.add("'Summary'!A1", summary)
+    """
+
+    def __init__(self, spreadsheet_id, service=None, value_input_option='RAW',
+                 max_ranges=MAX_RANGES_PER_BATCH):
+        self.spreadsheet_id = spreadsheet_id
+        self.service = service
+        self.value_input_option = value_input_option
+        self.max_ranges = max_ranges
+        self.pending = []
+        self.requests_sent = 0
+
+    def add(self, range_name, values):
+        """Queue one range update"""
+        self.pending.append({'range': range_name, 'values': values})
+
+    def flush(self):
+        """Send everything queued, returns the number of cells the API reports as updated"""
+        service = self.service or get_service()
+        updated = 0
+        while self.pending:
+            data = self.pending[:self.max_ranges]
+            result = execute_with_retry(service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'valueInputOption': self.value_input_option, 'data': data}))
+            self.requests_sent += 1
+            updated += result.get('totalUpdatedCells', 0)
+            # Only drop what was sent, so a failed flush can be retried
+            del self.pending[:len(data)]
+        return updated
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+
+def write_changed_cells(spreadsheet_id, range_name, values, service=None):
+    """
+    Write values at range_name (a tab, or a tab and its top-left cell) by
+    sending only the cells that changed
+
+    The tab is read once, unformatted, and compared cell by cell with values.
+    Changed cells go out as rectangles, and cells the new values no longer
+    cover are sent as '' so they are cleared in the same batchUpdate.
+    Returns DiffStats, an unchanged block costs the read and nothing else
+    """
+    service = service or get_service()
+    tab, first_row, first_col = _split_range(range_name)
+    quoted = "'" + tab.replace("'", "''") + "'"
+    result = execute_with_retry(service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=quoted, valueRenderOption='UNFORMATTED_VALUE'))
+    old = [row[first_col - 1:] for row in result.get('values', [])[first_row - 1:]]
+
+    writer = BatchWriter(spreadsheet_id, service=service)
+    written = cleared = 0
+    for top, left, block in cell_diff(old, values):
+        bottom, right = first_row + top + len(block) - 1, first_col + left + len(block[0]) - 1
+        writer.add(f'{quoted}!{column_letter(first_col + left)}{first_row + top}:'
+                   f'{column_letter(right)}{bottom}', block)
+        # A changed cell that becomes '' had a value before, it is a clear
+        blanks = sum(value == '' for row in block for value in row)
+        cleared += blanks
+        written += len(block) * len(block[0]) - blanks
+    ranges = len(writer.pending)
+    writer.flush()
+    instrumentation.count('sheets.cells_written', written)
+    instrumentation.count('sheets.cells_cleared', cleared)
+    return DiffStats(written, cleared, ranges, 1 + writer.requests_sent)
+
+
+def cell_diff(old, new):
+    """
+    Rectangles (top, left, rows) turning the grid old into new, 0-based
+
+    Grids are lists of rows and may be ragged, None and a missing cell are
+    both ''. Cells only old has come back as ''. Runs of changed cells on one
+    row are joined with the same runs on the rows below into one rectangle
+    """
+    blank = ('', None)
+    rectangles = []
+    # Rectangles still growing, by (first column, last column + 1)
+    growing = {}
+    for r in range(max(len(old), len(new))):
+        old_row = old[r] if r < len(old) else []
+        new_row = new[r] if r < len(new) else []
+        runs = {}
+        start = None
+        for c in range(max(len(old_row), len(new_row)) + 1):
+            before = old_row[c] if c < len(old_row) else ''
+            after = new_row[c] if c < len(new_row) else ''
+            changed = c < max(len(old_row), len(new_row)) and not (
+                before == after or (before in blank and after in blank))
+            if changed and start is None:
+                start = c
+            elif not changed and start is not None:
+                runs[(start, c)] = [v if v is not None else '' for v in
+                                    (new_row[j] if j < len(new_row) else '' for j in range(start, c))]
+                start = None
+
+        for span in list(growing):
+            if span not in runs:
+                rectangles.append(growing.pop(span))
+        for span, cells in runs.items():
+            if span in growing:
+                growing[span][2].append(cells)
+            else:
+                growing[span] = (r, span[0], [cells])
+    rectangles.extend(growing.values())
+    rectangles.sort(key=lambda rectangle: rectangle[:2])
+    return rectangles
+
+
+def column_letter(number):
+    """1 -> A, 26 -> Z, 27 -> AA"""
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _split_range(range_name):
+    """
+    Helper function
+    "Tab!B3" or "'Tab'!B3" -> (tab, 3, 2), a tab alone starts at A1
+    """
+    tab, _, cell = range_name.rpartition('!')
+    if not tab:
+        tab, cell = cell, ''
+    if tab.startswith("'") and tab.endswith("'"):
+        tab = tab[1:-1].replace("''", "'")
+    match = _ANCHOR.match(cell.partition(':')[0])
+    if match is None:
+        raise ValueError(f"Cannot read the top-left cell of {range_name!r}")
+    letters, digits = match.groups()
+    number = 0
+    for ch in letters.upper():
+        number = number * 26 + ord(ch) - ord('A') + 1
+    return tab, int(digits or 1), number or 1
+
+
+def _lazy(name):
+    """
+    Helper function
+    A lazily imported name, or whatever replaced it on this module
+    """
+    value = globals().get(name)
+    return value if value is not None else __getattr__(name)
@@ -0,0 +1,168 @@
+"""
+Binary cohort snapshots, memory-mapped on load.
+
+A snapshot holds everything create_capstone_teams needs to match a cohort
+again without the form rows: the name and project tables, the preference
+matrices of a CompatibilityMatrix or SparseCompatibilityMatrix and free-form
+run metadata. One file, laid out as
+
+    magic (8 bytes) | header length (uint64, little-endian) | JSON header | arrays
+
+The JSON header records the format version, the matrix kind, the metadata
+and the dtype, shape and offset of every array, counted from the first 64-byte
+boundary after the header. Arrays are contiguous, little-endian and start on
+a 64-byte boundary. Names are interned as one
+UTF-8 blob per table plus an offsets array.
+
+load_snapshot maps the file with numpy.memmap and wraps the arrays as they
+are, so loading costs the header and the name tables, never a copy of the
+matrices. The mapping is read-only and backed by the OS page cache, so every
+process that loads the same snapshot (e.g. portfolio workers) shares one copy
+of the matrices in memory.
+
+    save_snapshot('cohort.snap', matrix, {'term': '2024 fall'})
+    results, total_score = replay_snapshot('cohort.snap', assignment='optimal')
+"""
+import json
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+
+MAGIC = b'CAPSNAP\0'
+SNAPSHOT_VERSION = 1
+ALIGNMENT = 64
+
+# A loaded snapshot: the matrix over the mapped arrays and the saved metadata
+Snapshot = namedtuple('Snapshot', ['matrix', 'metadata'])
+
+
+def save_snapshot(path, matrix, metadata=None):
+    """
+    Write a CompatibilityMatrix or SparseCompatibilityMatrix to path
+
+    metadata is any JSON-serializable dict (source, parameters, teams...), the
+    creation time is added. Names are stored as text. The file is replaced
+    atomically, so a process that has the old snapshot mapped keeps reading it
+    """
+    if isinstance(matrix, SparseCompatibilityMatrix):
+        kind = 'sparse'
+        arrays = {name.lstrip('_'): getattr(matrix, name) for name in SparseCompatibilityMatrix.CSR_ARRAYS}
+    else:
+        kind = 'dense'
+        arrays = {'prefs': matrix.prefs}
+    arrays['project'] = matrix.project
+    arrays['people_offsets'], arrays['people_text'] = _intern([str(p) for p in matrix.people])
+    arrays['projects_offsets'], arrays['projects_text'] = _intern([str(p) for p in matrix.projects])
+
+    # Little-endian, C-contiguous, with the integer arrays at a fixed width
+    arrays = {name: np.ascontiguousarray(array, dtype=_stored_dtype(array)) for name, array in arrays.items()}
+    # Offsets are counted from the start of the data, the first 64-byte boundary after the header
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'kind': kind,
+        'metadata': dict(metadata or {}, created=datetime.now(timezone.utc).isoformat(timespec='seconds')),
+        'arrays': layout,
+    }, ensure_ascii=False).encode('utf-8')
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b'\0' * (start + layout[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+        # An empty last array still lies inside the file
+        f.write(b'\0' * (start + offset - f.tell()))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """
+    Snapshot(matrix, metadata) of a file written by save_snapshot
+
+    The matrix arrays are read-only views of the mapped file. Raises
+    ValueError for a file that is not a snapshot or has another version
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a cohort snapshot")
+        length = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is a version {header.get('version')} snapshot, "
+                         f"version {SNAPSHOT_VERSION} is needed")
+
+    start = _align(len(MAGIC) + 8 + length)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {name: np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=mapped,
+                               offset=start + spec['offset'])
+              for name, spec in header['arrays'].items()}
+    people = _names(arrays.pop('people_offsets'), arrays.pop('people_text'))
+    projects = _names(arrays.pop('projects_offsets'), arrays.pop('projects_text'))
+
+    if header['kind'] == 'sparse':
+        csr = {name: arrays[name.lstrip('_')] for name in SparseCompatibilityMatrix.CSR_ARRAYS}
+        matrix = SparseCompatibilityMatrix.from_arrays(csr, arrays['project'], people, projects)
+    else:
+        matrix = CompatibilityMatrix.from_arrays(arrays['prefs'], arrays['project'], people, projects)
+    # Worker processes can map the same file instead of receiving a copy of the matrix
+    matrix.snapshot_path = os.path.abspath(path)
+    return Snapshot(matrix, header['metadata'])
+
+
+def replay_snapshot(path, **options):
+    """create_capstone_teams on a saved cohort, options are its keyword arguments"""
+    from matching_algorithm import create_capstone_teams
+
+    matrix = load_snapshot(path).matrix
+    return create_capstone_teams(matrix.people, None, matrix.projects, None, matrix=matrix, **options)
+
+
+def _intern(names):
+    """
+    Helper function
+    (offsets, UTF-8 blob) of a list of names, name i is blob[offsets[i]:offsets[i + 1]]
+    """
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _names(offsets, text):
+    """
+    Helper function
+    The names of an interned table
+    """
+    blob = text.tobytes()
+    bounds = offsets.tolist()
+    return [blob[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+
+def _stored_dtype(array):
+    """
+    Helper function
+    On-disk dtype: little-endian, 64-bit for integers so files do not depend on the platform
+    """
+    if array.dtype.kind in 'iu' and array.dtype.itemsize > 1:
+        return np.dtype('<i8')
+    return array.dtype.newbyteorder('<')
+
+
+def _align(offset):
+    """
+    Helper function
+    The next multiple of ALIGNMENT
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
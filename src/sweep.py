@@ -0,0 +1,227 @@
+"""
+Weight-sensitivity sweeps: many teammate/project weightings from one matrix.
+
+The weights only enter after the teams are formed: greedy_teams never looks
+at them, the 'optimal' assignment and the scores do. sweep_weights therefore
+builds the compatibility matrix once, forms the teams once per sample and
+scores every weighting of a sample together:
+
+    1. samples: the plain greedy pass, plus samples - 1 greedy runs with
+       preference noise (greedy_teams' noise, see portfolio.py), formed in
+       parallel across worker processes
+    2. per sample: the team scores and the team x project table once, then
+       the combined team x project tables of every weighting as one
+       (weightings x teams x projects) array
+    3. the team-to-project assignment of every (weighting, sample): shared by
+       all weightings with 'alphabetical', one Hungarian solve each with
+       'optimal', spread over the same workers
+
+Weightings come from weight_grid (a grid of pairs) or sample_weights (a
+Monte-Carlo sample). The SweepTable holds the overall and per-team 1-100
+scores of every (weighting, sample) and how stable the outcome is: the share
+of people with the same teammates and project as in the reference run, the
+first weighting of the plain greedy sample.
+
+    table = sweep_weights(matrix, weight_grid(np.linspace(0, 1, 11)), samples=8)
+    table.to_rows()   # one row per weighting and sample, header first
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from assignment import assign_projects
+from compat_matrix import SparseCompatibilityMatrix
+from matching_algorithm import assign_team_projects
+from portfolio import DEFAULT_NOISE, greedy_runs
+from results import ResultTable
+from scoring import normalize_score
+
+
+def weight_grid(teammate_weights, project_weights=None):
+    """
+    (teammate weight, project weight) pairs: every combination of the two
+    lists, or each teammate weight w with 1 - w when project_weights is None.
+    Pairs that sum to zero are left out, they have no 1-100 scale
+    """
+    if project_weights is None:
+        pairs = [(float(w), round(1 - float(w), 12)) for w in teammate_weights]
+    else:
+        pairs = [(float(w), float(p)) for w, p in itertools.product(teammate_weights, project_weights)]
+    return [(w, p) for w, p in pairs if w + p != 0]
+
+
+def sample_weights(count, seed=0):
+    """count random (w, 1 - w) weightings, w uniform in [0, 1]"""
+    rng = np.random.default_rng(seed)
+    return weight_grid(rng.random(count))
+
+
+class SweepTable:
+    """
+    Outcome of a sweep_weights run
+
+    weights     : (W, 2) array of (teammate weight, project weight)
+    teams       : teams of row indices, one list per sample
+    assignments : assignments[w][s] is [(team index, project column)], best team first
+    overall     : (W, S) int array of overall 1-100 scores
+    team_scores : team_scores[w][s] is the 1-100 score of each assigned team, in assignment order
+    stability   : (W, S) array, share of people with the reference run's teammates and project
+    """
+
+    def __init__(self, weights, teams, assignments, overall, team_scores, stability, people, projects):
+        self.weights = weights
+        self.teams = teams
+        self.assignments = assignments
+        self.overall = overall
+        self.team_scores = team_scores
+        self.stability = stability
+        self.people = people
+        self.projects = projects
+
+    def results(self, w, s):
+        """ResultTable of one weighting and sample, as create_capstone_teams returns it"""
+        assigned = self.assignments[w][s]
+        with_project = {t for t, _ in assigned}
+        return ResultTable([self.teams[s][t] for t, _ in assigned], [k for _, k in assigned],
+                           list(self.team_scores[w][s]), self.people, self.projects,
+                           unassigned=[team for t, team in enumerate(self.teams[s]) if t not in with_project])
+
+    def to_rows(self):
+        """The sweep as a table for a ResultSink, one row per weighting and sample"""
+        rows = [['Teammate Weight', 'Project Weight', 'Sample', 'Overall Score', 'Stability', 'Team Scores']]
+        for w, (teammate_weight, project_weight) in enumerate(self.weights.tolist()):
+            for s in range(len(self.teams)):
+                rows.append([teammate_weight, project_weight, s, int(self.overall[w, s]),
+                             round(float(self.stability[w, s]), 4),
+                             ', '.join(str(score) for score in self.team_scores[w][s])])
+        return rows
+
+
+def sweep_weights(matrix, weights, samples=1, noise=DEFAULT_NOISE, seed=0, min_size=2, max_size=3,
+                  assignment='alphabetical', project_capacities=None, workers=None):
+    """
+    Score every weighting in weights (pairs, see weight_grid) on teams formed
+    from matrix, returns a SweepTable
+
+    samples : number of team formations, the first is the plain greedy pass
+              and the others add `noise` preference points (seeded from seed).
+              More than one needs the dense CompatibilityMatrix
+    workers : process count for the team formations and the 'optimal'
+              assignments, defaults to os.cpu_count()
+    assignment, project_capacities : as in create_capstone_teams
+    """
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, 2)
+    if not len(weights):
+        raise ValueError("At least one weighting is needed")
+    if (weights.sum(axis=1) == 0).any():
+        raise ValueError("A teammate and project weight that sum to zero have no 1-100 scale")
+    if samples > 1 and isinstance(matrix, SparseCompatibilityMatrix):
+        raise ValueError("Samples with preference noise need the dense CompatibilityMatrix")
+    if assignment not in ('alphabetical', 'optimal'):
+        raise ValueError(f"Unknown assignment mode: {assignment}")
+
+    outcomes = greedy_runs(matrix, samples, workers, seed, min_size, max_size, noise)
+    teams = [sample_teams for sample_teams, _ in outcomes]
+    capacities = [(project_capacities or {}).get(p, 1) for p in matrix.projects]
+
+    tables = []
+    assignments = [[None] * samples for _ in weights]
+    solves = []
+    for s, sample_teams in enumerate(teams):
+        team_scores = matrix.team_scores(sample_teams)
+        project_table = matrix.team_project_scores(sample_teams)
+        # Combined team x project table of every weighting at once
+        combined = (weights[:, 0, None, None] * team_scores[None, :, None]
+                    + weights[:, 1, None, None] * project_table[None, :, :])
+        tables.append((team_scores, combined))
+        if assignment == 'alphabetical':
+            # Formation order and project order do not depend on the weights
+            shared = assign_team_projects(matrix, sample_teams, team_scores, matrix.projects,
+                                          project_capacities=project_capacities)
+            for w in range(len(weights)):
+                assignments[w][s] = shared
+        else:
+            solves.extend((w, s) for w in range(len(weights)))
+
+    if solves:
+        tasks = [(tables[s][1][w], capacities) for w, s in solves]
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                solved = list(pool.map(_assign, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+        else:
+            solved = [_assign(task) for task in tasks]
+        for (w, s), project_of_team in zip(solves, solved):
+            # Best team first, as assign_team_projects orders them
+            order = np.argsort(-tables[s][0], kind='stable')
+            assignments[w][s] = [(int(t), int(project_of_team[t])) for t in order if project_of_team[t] >= 0]
+
+    overall = np.zeros((len(weights), samples), dtype=int)
+    scores = [[None] * samples for _ in weights]
+    for w, (teammate_weight, project_weight) in enumerate(weights.tolist()):
+        for s in range(samples):
+            assigned = assignments[w][s]
+            if not assigned:
+                scores[w][s] = []
+                continue
+            t, k = np.array(assigned, dtype=np.intp).T
+            raw = tables[s][1][w, t, k]
+            # Rounded through normalize_score so the scores match create_capstone_teams exactly
+            scores[w][s] = [int(round(normalize_score(value, teammate_weight, project_weight)))
+                            for value in raw.tolist()]
+            overall[w, s] = int(round(normalize_score(sum(raw.tolist()) / len(raw), teammate_weight, project_weight)))
+
+    stability = _stability(len(matrix), teams, assignments)
+    return SweepTable(weights, teams, assignments, overall, scores, stability, matrix.people, matrix.projects)
+
+
+def _stability(n, teams, assignments):
+    """
+    Helper function
+    (W, S) share of people whose teammates and project match the run of the
+    first weighting on the first sample
+    """
+    stability = np.ones((len(assignments), len(teams)))
+    if n == 0:
+        return stability
+    # Team index of every person per sample, and whether it has the reference teammates
+    team_index = []
+    same_team = []
+    reference = {}
+    for s, sample_teams in enumerate(teams):
+        index = np.full(n, -1, dtype=np.intp)
+        keys = [None] * n
+        for t, team in enumerate(sample_teams):
+            index[team] = t
+            key = tuple(sorted(team))
+            for person in team:
+                keys[person] = key
+        if s == 0:
+            reference = keys
+        team_index.append(index)
+        same_team.append(np.array([keys[i] == reference[i] for i in range(n)], dtype=bool))
+
+    def projects_of(s, assigned):
+        # Project column of every person, -1 without a project
+        project_of_team = np.full(len(teams[s]) + 1, -1, dtype=np.intp)
+        if assigned:
+            t, k = np.array(assigned, dtype=np.intp).T
+            project_of_team[t] = k
+        return project_of_team[team_index[s]]
+
+    reference_projects = projects_of(0, assignments[0][0])
+    for w, row in enumerate(assignments):
+        for s, assigned in enumerate(row):
+            stability[w, s] = np.count_nonzero(same_team[s] & (projects_of(s, assigned) == reference_projects)) / n
+    return stability
+
+
+def _assign(task):
+    """
+    Helper function
+    Worker: optimal assignment of one combined team x project table
+    """
+    table, capacities = task
+    return assign_projects(table, capacities)
@@ -0,0 +1,196 @@
+# tests/fake_sheets.py
+"""
+In-memory stand-in for the Google Sheets v4 client used by the tests.
+
+Supports the calls this project makes:
+    spreadsheets().get(spreadsheetId, fields)
+    spreadsheets().values().get / update / clear
+    spreadsheets().values().batchGet / batchUpdate / batchClear
+
+Tabs are lists of rows. Reads trim trailing empty cells and rows like the real
+API does. fail_next(n, status) makes the next n requests raise a real
+googleapiclient HttpError, to exercise retries. fail_request(n, status) makes
+the n-th request from now fail instead.
+"""
+import re
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+_CELL = re.compile(r'^([A-Z]*)(\d*)$')
+
+
+def column_number(letters):
+    number = 0
+    for ch in letters:
+        number = number * 26 + ord(ch) - ord('A') + 1
+    return number
+
+
+def parse_range(range_name):
+    """'Tab'!A1:C3 -> (tab, first row, first col, last row, last col), 1-based, None = open"""
+    tab, _, cells = range_name.rpartition('!')
+    if not tab:
+        tab, cells = cells, ''
+    if tab.startswith("'") and tab.endswith("'"):
+        tab = tab[1:-1].replace("''", "'")
+    if not cells:
+        return tab, 1, 1, None, None
+    start, _, end = cells.partition(':')
+    col1, row1 = _CELL.match(start).groups()
+    first_row, first_col = int(row1 or 1), column_number(col1 or 'A')
+    if not end:
+        return tab, first_row, first_col, None, None
+    col2, row2 = _CELL.match(end).groups()
+    last_row = int(row2) if row2 else None
+    last_col = column_number(col2) if col2 else None
+    return tab, first_row, first_col, last_row, last_col
+
+
+class _Request:
+    def __init__(self, service, action):
+        self.service = service
+        self.action = action
+
+    def execute(self):
+        self.service.requests += 1
+        scheduled = self.service.scheduled.pop(self.service.requests, None)
+        if scheduled is not None:
+            raise HttpError(httplib2.Response({'status': scheduled}), b'{"error": "injected"}')
+        if self.service.failures:
+            status = self.service.failures.pop(0)
+            raise HttpError(httplib2.Response({'status': status}), b'{"error": "injected"}')
+        return self.action()
+
+
+class FakeSheetsService:
+    """Fake client holding {tab name: rows}"""
+
+    def __init__(self, tabs=None, row_count=None, column_count=26):
+        self.tabs = {name: [list(r) for r in rows] for name, rows in (tabs or {}).items()}
+        self.row_count = row_count
+        self.column_count = column_count
+        self.failures = []
+        self.scheduled = {}
+        self.requests = 0
+        self.calls = []
+
+    def fail_next(self, n, status=429):
+        self.failures.extend([status] * n)
+
+    def fail_request(self, n, status=403):
+        self.scheduled[self.requests + n] = status
+
+    # Grid helpers
+
+    def _read(self, range_name):
+        tab, r1, c1, r2, c2 = parse_range(range_name)
+        rows = self.tabs.get(tab, [])
+        out = []
+        for row in rows[r1 - 1:r2]:
+            cells = row[c1 - 1:c2] if c2 else row[c1 - 1:]
+            while cells and cells[-1] in ('', None):
+                cells = cells[:-1]
+            out.append(list(cells))
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def _write(self, range_name, values):
+        tab, r1, c1, _, _ = parse_range(range_name)
+        rows = self.tabs.setdefault(tab, [])
+        cells = 0
+        for i, values_row in enumerate(values):
+            while len(rows) < r1 + i:
+                rows.append([])
+            row = rows[r1 - 1 + i]
+            while len(row) < c1 - 1 + len(values_row):
+                row.append('')
+            for j, value in enumerate(values_row):
+                row[c1 - 1 + j] = value
+                cells += 1
+        return cells
+
+    def _clear(self, range_name):
+        tab, r1, c1, r2, c2 = parse_range(range_name)
+        rows = self.tabs.get(tab, [])
+        for row in rows[r1 - 1:r2]:
+            end = min(len(row), c2) if c2 else len(row)
+            for j in range(c1 - 1, end):
+                row[j] = ''
+
+    # API surface
+
+    def spreadsheets(self):
+        return _Spreadsheets(self)
+
+
+class _Spreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId, fields=None):
+        service = self.service
+        service.calls.append(('get', spreadsheetId))
+
+        def action():
+            sheets = []
+            for name, rows in service.tabs.items():
+                grid = {'rowCount': service.row_count or max(len(rows), 1),
+                        'columnCount': service.column_count}
+                sheets.append({'properties': {'title': name, 'gridProperties': grid}})
+            return {'sheets': sheets}
+        return _Request(service, action)
+
+    def values(self):
+        return _Values(self.service)
+
+
+class _Values:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId, range, valueRenderOption=None):
+        # Cells hold Python values, every render option reads them back as they are
+        self.service.calls.append(('values.get', range))
+
+        def action():
+            values = self.service._read(range)
+            return {'range': range, 'values': values} if values else {'range': range}
+        return _Request(self.service, action)
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.service.calls.append(('values.batchGet', list(ranges)))
+
+        def action():
+            out = []
+            for r in ranges:
+                values = self.service._read(r)
+                out.append({'range': r, 'values': values} if values else {'range': r})
+            return {'valueRanges': out}
+        return _Request(self.service, action)
+
+    def update(self, spreadsheetId, range, valueInputOption, body):
+        self.service.calls.append(('values.update', range))
+        return _Request(self.service, lambda: {'updatedCells': self.service._write(range, body['values'])})
+
+    def batchUpdate(self, spreadsheetId, body):
+        self.service.calls.append(('values.batchUpdate', [d['range'] for d in body['data']]))
+
+        def action():
+            cells = sum(self.service._write(d['range'], d['values']) for d in body['data'])
+            return {'totalUpdatedCells': cells, 'totalUpdatedRanges': len(body['data'])}
+        return _Request(self.service, action)
+
+    def clear(self, spreadsheetId, range, body=None):
+        self.service.calls.append(('values.clear', range))
+        return _Request(self.service, lambda: self.service._clear(range) or {'clearedRange': range})
+
+    def batchClear(self, spreadsheetId, body):
+        self.service.calls.append(('values.batchClear', list(body['ranges'])))
+
+        def action():
+            for r in body['ranges']:
+                self.service._clear(r)
+            return {'clearedRanges': list(body['ranges'])}
+        return _Request(self.service, action)
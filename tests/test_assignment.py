@@ -0,0 +1,88 @@
+# tests/test_assignment.py
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from assignment import assign_projects
+from matching_algorithm import create_capstone_teams
+
+
+def brute_force_best(scores, capacities):
+    # Try every way of giving slots to teams and keep the best total
+    slots = [k for k, c in enumerate(capacities) for _ in range(c)]
+    n = scores.shape[0]
+    used = min(n, len(slots))
+    best = -np.inf
+    for teams in itertools.permutations(range(n), used):
+        for chosen in itertools.permutations(slots, used):
+            best = max(best, sum(scores[t, k] for t, k in zip(teams, chosen)))
+    return best
+
+
+def total(scores, assigned):
+    return sum(scores[t, k] for t, k in enumerate(assigned) if k >= 0)
+
+
+@pytest.mark.parametrize("shape", [(3, 3), (2, 5), (5, 2), (4, 4), (1, 3), (3, 1)])
+def test_matches_brute_force(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(5):
+        scores = rng.integers(1, 20, size=shape).astype(float)
+        assigned = assign_projects(scores)
+        chosen = assigned[assigned >= 0]
+        # Every project is used at most once and as many teams as possible get one
+        assert len(set(chosen.tolist())) == len(chosen) == min(shape)
+        assert total(scores, assigned) == brute_force_best(scores, [1] * shape[1])
+
+
+def test_capacities_let_a_project_take_several_teams():
+    scores = np.array([[9.0, 1.0], [8.0, 2.0], [7.0, 6.0], [1.0, 1.0]])
+    assigned = assign_projects(scores, capacities=[2, 1])
+    assert sorted(assigned.tolist()) == [-1, 0, 0, 1]
+    assert total(scores, assigned) == brute_force_best(scores, [2, 1])
+
+
+def test_empty_and_invalid_inputs():
+    assert assign_projects(np.zeros((0, 3))).tolist() == []
+    assert assign_projects(np.zeros((2, 0))).tolist() == [-1, -1]
+    with pytest.raises(ValueError):
+        assign_projects(np.zeros((2, 2)), capacities=[1])
+
+
+def test_hundreds_of_teams_and_projects_is_fast():
+    rng = np.random.default_rng(0)
+    scores = rng.random((300, 320))
+    start = time.perf_counter()
+    assigned = assign_projects(scores)
+    assert time.perf_counter() - start < 10
+    assert len(set(assigned.tolist())) == 300
+
+
+def test_optimal_mode_gives_teams_the_projects_they_prefer():
+    people = ["A", "B", "C", "D"]
+    teammate_prefs = {"A": {"B": 10}, "B": {"A": 10}}
+    projects = ["Alpha", "Zebra"]
+    # The strongest team wants Zebra, the alphabetical hand-out would give it Alpha
+    project_prefs = {"A": {"Zebra": 5, "Alpha": 1}, "B": {"Zebra": 5, "Alpha": 1},
+                     "C": {"Alpha": 5}, "D": {"Alpha": 5}}
+
+    plain, plain_total = create_capstone_teams(people, teammate_prefs, projects, project_prefs)
+    best, best_total = create_capstone_teams(people, teammate_prefs, projects, project_prefs,
+                                             assignment='optimal')
+
+    assert plain[0][1] == "Alpha"
+    assert [(sorted(team), project) for team, project, _ in best] == [
+        (["A", "B"], "Zebra"), (["C", "D"], "Alpha")]
+    assert best_total > plain_total
+
+
+def test_unknown_assignment_mode_is_rejected():
+    with pytest.raises(ValueError):
+        create_capstone_teams(["A", "B"], {}, ["P"], {}, assignment='random')
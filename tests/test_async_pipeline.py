@@ -0,0 +1,146 @@
+# tests/test_async_pipeline.py
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import main
+from async_pipeline import run_pipeline_async
+from benchmark import generate_form_rows
+from fake_sheets import FakeSheetsService
+from io_backends import ResponseSource, ResultSink
+from pipeline import RowTransform, run_pipeline, transform_rows_incremental
+from run_state import load_run_state
+
+
+class PagedSource(ResponseSource):
+    """Rows in pages of chunk_rows, waiting `delay` seconds per page like a slow link"""
+
+    def __init__(self, header, rows, chunk_rows=10, delay=0.0, fail_after=None):
+        self.header = header
+        self.rows = rows
+        self.chunk_rows = chunk_rows
+        self.delay = delay
+        self.fail_after = fail_after
+        self.fetched = 0
+        self.threads = set()
+
+    def iter_row_chunks(self):
+        for start in range(0, len(self.rows), self.chunk_rows):
+            if self.fail_after is not None and self.fetched >= self.fail_after:
+                raise ConnectionError("link dropped")
+            time.sleep(self.delay)
+            self.threads.add(threading.get_ident())
+            self.fetched += 1
+            yield self.header, self.rows[start:start + self.chunk_rows]
+
+
+class MemorySink(ResultSink):
+    def __init__(self):
+        self.values = None
+
+    def write(self, values):
+        self.values = values
+        return True
+
+
+def test_same_outcome_and_state_as_the_sequential_pipeline(tmp_path):
+    header, rows = generate_form_rows(80, seed=4)
+    sequential_sink, async_sink = MemorySink(), MemorySink()
+    sequential = run_pipeline(PagedSource(header, rows), sequential_sink, state_file=str(tmp_path / "a.json"))
+    overlapped = asyncio.run(run_pipeline_async(PagedSource(header, rows, chunk_rows=7), async_sink,
+                                                state_file=str(tmp_path / "b.json"), queue_size=2))
+
+    assert overlapped[:2] == sequential[:2] and overlapped[2] == sequential[2]
+    assert async_sink.values == sequential_sink.values
+    assert load_run_state(str(tmp_path / "b.json")) == load_run_state(str(tmp_path / "a.json"))
+
+    # A re-run with two edited rows only transforms those rows and starts warm
+    rows[3] = rows[3][:1] + rows[5][1:]
+    rows[40] = rows[40][:-1]
+    _, _, stats = asyncio.run(run_pipeline_async(PagedSource(header, rows, chunk_rows=7), async_sink,
+                                                 state_file=str(tmp_path / "b.json")))
+    assert stats["rows_transformed"] == 2 and stats["warm_start"]
+
+
+def test_row_transform_in_chunks_equals_one_transform():
+    header, rows = generate_form_rows(50, seed=2)
+    _, entries, _, _ = transform_rows_incremental(header, rows, None)
+    state = {"header": header, "rows": entries}
+    edited = [list(r) for r in rows[:45]]
+    edited[10] = edited[10][:2]
+
+    transform = RowTransform(header, state)
+    for start in range(0, len(edited), 6):
+        transform.add(edited[start:start + 6])
+    assert transform.finish() == transform_rows_incremental(header, edited, state)
+
+
+def test_transform_overlaps_the_fetch_and_the_queue_bounds_read_ahead(monkeypatch):
+    header, rows = generate_form_rows(60, seed=1)
+    source = PagedSource(header, rows, chunk_rows=5, delay=0.01)
+    seen = []
+    add = RowTransform.add
+
+    def slow_add(self, chunk):
+        # The fetch may be at most the queue plus the page in flight ahead of the transform
+        seen.append(source.fetched - len(self.entries) // 5)
+        time.sleep(0.02)
+        add(self, chunk)
+
+    monkeypatch.setattr(RowTransform, "add", slow_add)
+    outcome = asyncio.run(run_pipeline_async(source, MemorySink(), queue_size=2))
+
+    assert outcome[2]["rows"] == 60
+    assert seen[0] < 12
+    assert max(seen) <= 2 + 2
+    # Every page was read on the same I/O thread
+    assert len(source.threads) == 1 and threading.get_ident() not in source.threads
+
+
+def test_fetch_errors_are_raised_and_nothing_is_written(tmp_path):
+    header, rows = generate_form_rows(40)
+    sink = MemorySink()
+    state_file = str(tmp_path / "state.json")
+    with pytest.raises(ConnectionError):
+        asyncio.run(run_pipeline_async(PagedSource(header, rows, chunk_rows=5, fail_after=3), sink,
+                                       state_file=state_file))
+    assert sink.values is None and not os.path.exists(state_file)
+
+
+def test_sheets_page_errors_are_raised_and_nothing_is_written(tmp_path, monkeypatch):
+    from googleapiclient.errors import HttpError
+    import async_pipeline
+
+    header, rows = generate_form_rows(40, seed=5)
+    fake = FakeSheetsService({"Form Responses 1": [header] + rows}, column_count=len(header))
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+    writes, saves = [], []
+    monkeypatch.setattr(main.SheetsSink, "write", lambda self, values: writes.append(values) or True)
+    monkeypatch.setattr(async_pipeline, "save_run_state", lambda *args: saves.append(args))
+
+    # Request 1 is the tab metadata, the third page fails after two pages went through
+    fake.fail_request(4)
+    with pytest.raises(HttpError):
+        asyncio.run(run_pipeline_async(
+            main.SheetsSource("sheet_id", "Form Responses 1", chunk_rows=8, ranges_per_request=1),
+            main.SheetsSink("sheet_id", "Team Results!A1"), state_file=str(tmp_path / "state.json")))
+    assert fake.requests == 4
+    assert writes == [] and saves == []
+
+
+def test_empty_source_and_sheets_backends(tmp_path, monkeypatch):
+    assert asyncio.run(run_pipeline_async(PagedSource(None, []), MemorySink())) is None
+
+    header, rows = generate_form_rows(25, seed=3)
+    fake = FakeSheetsService({"Form Responses 1": [header] + rows}, column_count=len(header))
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+    outcome = asyncio.run(run_pipeline_async(main.SheetsSource("sheet_id", "Form Responses 1", chunk_rows=4),
+                                             main.SheetsSink("sheet_id", "Team Results!A1")))
+    assert fake.tabs["Team Results"] == main.format_results(*outcome[:2])
@@ -0,0 +1,142 @@
+# tests/test_batch.py
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import batch
+import main
+import sheets_client
+from benchmark import generate_form_rows
+from fake_sheets import FakeSheetsService
+
+
+def write_cohort_csv(path, n, seed):
+    header, rows = generate_form_rows(n, seed=seed)
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([header] + rows)
+    return header, rows
+
+
+def write_manifest(tmp_path, cohorts, **extra):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(dict(extra, cohorts=cohorts)))
+    return str(path)
+
+
+def test_load_manifest_resolves_paths_and_merges_options(tmp_path):
+    path = write_manifest(tmp_path, [
+        {"name": "A", "input": {"path": "a.csv"}, "output": {"path": "out/a.csv"},
+         "state_file": "a_state.json", "options": {"max_size": 4}},
+        {"input": {"spreadsheet_id": "sheet"}, "output": {"spreadsheet_id": "sheet"}},
+    ], defaults={"min_size": 2, "max_size": 3}, rate_limit=2.5)
+    cohorts, rate_limit = batch.load_manifest(path)
+    assert rate_limit == 2.5
+    assert cohorts[0]['input']['path'] == str(tmp_path / "a.csv")
+    assert cohorts[0]['state_file'] == str(tmp_path / "a_state.json")
+    assert cohorts[0]['options'] == {"min_size": 2, "max_size": 4}
+    assert cohorts[1]['name'] == "cohort 2" and cohorts[1]['state_file'] is None
+    assert isinstance(batch.make_source(cohorts[1]['input']), main.SheetsSource)
+
+
+def test_load_manifest_rejects_bad_entries(tmp_path):
+    with pytest.raises(ValueError):
+        batch.load_manifest(write_manifest(tmp_path, [{"name": "A", "input": {"path": "a.csv"}}]))
+    same = {"name": "A", "input": {"path": "a.csv"}, "output": {"path": "b.csv"}}
+    with pytest.raises(ValueError):
+        batch.load_manifest(write_manifest(tmp_path, [same, same]))
+
+
+def test_batch_isolates_failures_and_matches_single_runs(tmp_path, monkeypatch):
+    write_cohort_csv(tmp_path / "a.csv", 30, seed=1)
+    write_cohort_csv(tmp_path / "b.csv", 45, seed=2)
+    (tmp_path / "empty.csv").write_text("")
+    header, rows = generate_form_rows(20, seed=3)
+    fake = FakeSheetsService({"Form Responses 1": [header] + rows}, column_count=len(header))
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+
+    path = write_manifest(tmp_path, [
+        {"name": "a", "input": {"path": "a.csv"}, "output": {"path": "a_out.json"}, "state_file": "a.json"},
+        {"name": "missing", "input": {"path": "nope.csv"}, "output": {"path": "x.json"}},
+        {"name": "b", "input": {"path": "b.csv"}, "output": {"path": "b_out.json"},
+         "options": {"min_size": 3, "max_size": 4}},
+        {"name": "bad-option", "input": {"path": "a.csv"}, "output": {"path": "c.json"},
+         "options": {"assignment": "random"}},
+        {"name": "empty", "input": {"path": "empty.csv"}, "output": {"path": "e.json"}},
+        {"name": "sheet", "input": {"spreadsheet_id": "id"}, "output": {"spreadsheet_id": "id"}},
+    ])
+    cohorts, _ = batch.load_manifest(path)
+    events = []
+    outcomes = batch.run_batch(cohorts, io_workers=3, match_workers=0, rate_limit=None,
+                               progress=lambda done, total, outcome: events.append((done, total, outcome['name'])))
+
+    assert [o['name'] for o in outcomes] == ["a", "missing", "b", "bad-option", "empty", "sheet"]
+    assert [o['status'] for o in outcomes] == ["ok", "failed", "ok", "failed", "empty", "ok"]
+    assert outcomes[1]['stage'] == 'read' and 'FileNotFoundError' in outcomes[1]['error']
+    assert outcomes[3]['stage'] == 'match'
+    assert sorted(done for done, _, _ in events) == list(range(1, 7))
+
+    # Same teams as running the cohort on its own
+    with open(tmp_path / "b_out.json") as f:
+        written = json.load(f)
+    results, total, _ = main.run_pipeline(batch.make_source(cohorts[2]['input']),
+                                          batch.make_sink({"path": str(tmp_path / "single.json")}),
+                                          min_size=3, max_size=4)
+    assert written == main.format_results(results, total)
+    assert outcomes[2]['teams'] == len(results)
+    assert os.path.exists(tmp_path / "a.json")
+    assert fake.tabs["Team Results"][0] == ["Team Members", "Project", "Score"]
+
+
+def test_batch_reports_a_sheets_read_error_as_a_failed_read(tmp_path, monkeypatch):
+    write_cohort_csv(tmp_path / "a.csv", 20, seed=1)
+    header, rows = generate_form_rows(20, seed=3)
+    fake = FakeSheetsService({"Form Responses 1": [header] + rows}, column_count=len(header))
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+    # Request 1 is the tab metadata, 2 the first batchGet
+    fake.fail_request(2)
+
+    path = write_manifest(tmp_path, [
+        {"name": "sheet", "input": {"spreadsheet_id": "id"}, "output": {"spreadsheet_id": "id"},
+         "state_file": "sheet.json"},
+        {"name": "a", "input": {"path": "a.csv"}, "output": {"path": "a_out.json"}},
+    ])
+    cohorts, _ = batch.load_manifest(path)
+    outcomes = batch.run_batch(cohorts, io_workers=1, match_workers=0, rate_limit=None, progress=lambda *a: None)
+
+    assert [o['status'] for o in outcomes] == ["failed", "ok"]
+    assert outcomes[0]['stage'] == 'read' and 'HttpError' in outcomes[0]['error']
+    assert "Team Results" not in fake.tabs
+    assert not os.path.exists(tmp_path / "sheet.json")
+
+
+def test_batch_uses_process_pool_and_restores_rate_limit(tmp_path):
+    for name in "abc":
+        write_cohort_csv(tmp_path / f"{name}.csv", 25, seed=ord(name))
+    path = write_manifest(tmp_path, [{"name": name, "input": {"path": f"{name}.csv"},
+                                      "output": {"path": f"{name}_out.csv"}} for name in "abc"])
+    cohorts, _ = batch.load_manifest(path)
+    assert sheets_client.set_rate_limit(None) is None
+
+    outcomes = batch.run_batch(cohorts, io_workers=2, match_workers=2, rate_limit=5, progress=lambda *a: None)
+    assert [o['status'] for o in outcomes] == ["ok"] * 3
+    # Workers are not forked from the process whose I/O threads are running
+    assert batch._worker_context().get_start_method() != "fork"
+    assert sheets_client._rate_limiter is None
+
+
+def test_main_exit_status_and_report(tmp_path):
+    write_cohort_csv(tmp_path / "a.csv", 12, seed=0)
+    path = write_manifest(tmp_path, [
+        {"name": "a", "input": {"path": "a.csv"}, "output": {"path": "a_out.csv"}},
+        {"name": "gone", "input": {"path": "gone.csv"}, "output": {"path": "g.csv"}},
+    ])
+    report = str(tmp_path / "report.json")
+    assert batch.main([path, "--match-workers", "0", "--rate-limit", "0", "--report", report]) == 1
+    with open(report) as f:
+        assert [o['status'] for o in json.load(f)] == ["ok", "failed"]
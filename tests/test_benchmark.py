@@ -0,0 +1,81 @@
+# tests/test_benchmark.py
+import os
+import sys
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import benchmark
+from main import _rows_to_frame, transform_data_for_algorithm
+
+
+def test_generated_rows_are_seeded_and_parse_as_form_data():
+    header, rows = benchmark.generate_form_rows(60, seed=3)
+    assert (header, rows) == benchmark.generate_form_rows(60, seed=3)
+    assert (header, rows) != benchmark.generate_form_rows(60, seed=4)
+
+    people, teammate_prefs, projects, project_prefs = transform_data_for_algorithm(_rows_to_frame(header, rows))
+    assert len(people) == len(set(people)) == 60
+    assert len(projects) == benchmark.N_PROJECTS
+    for person in people:
+        assert sorted(project_prefs[person].values()) == list(range(1, benchmark.N_PROJECTS + 1))
+        assert person not in teammate_prefs[person]
+        ranked = [s for s in teammate_prefs[person].values() if s > 1]
+        assert 3 <= len(teammate_prefs[person]) <= benchmark.N_RANKED + benchmark.N_AVOIDED
+        assert all(2 <= s <= 10 for s in ranked)
+
+
+def test_tiny_cohorts_still_generate():
+    for n in (1, 2, 4):
+        header, rows = benchmark.generate_form_rows(n)
+        assert len(rows) == n
+
+
+def test_run_benchmarks_reports_every_phase():
+    report = benchmark.run_benchmarks(sizes=[10, 40], repeat=1, max_assignment_teams=5)
+    assert report['version'] == benchmark.REPORT_VERSION
+    entries = {(r['n'], r['phase']): r for r in report['results']}
+    assert set(entries) == {(n, p) for n in (10, 40) for p in benchmark.PHASES}
+    assert entries[(10, 'greedy')]['seconds'] >= 0
+    assert 'peak_bytes' in entries[(10, 'matrix')]
+    # 40 people make more than 5 teams, so the Hungarian step is skipped
+    assert entries[(40, 'assignment')].get('skipped')
+    assert not entries[(10, 'assignment')].get('skipped')
+
+
+def test_run_benchmarks_replays_a_snapshot(tmp_path):
+    from compat_matrix import CompatibilityMatrix
+    from form_parser import parse_rows
+    from snapshot import save_snapshot
+
+    path = str(tmp_path / "cohort.snap")
+    save_snapshot(path, CompatibilityMatrix(*parse_rows(*benchmark.generate_form_rows(25))))
+    report = benchmark.run_benchmarks(repeat=1, snapshot=path)
+    assert [(r['n'], r['phase']) for r in report['results']] == [(25, p) for p in benchmark.SNAPSHOT_PHASES]
+    assert report['snapshot'] == path
+
+
+def test_check_regressions_flags_slow_phases_only():
+    baseline = {'results': [{'n': 100, 'phase': 'greedy', 'seconds': 0.1, 'peak_bytes': 1000},
+                            {'n': 100, 'phase': 'transform', 'seconds': 0.001}]}
+    report = {'results': [{'n': 100, 'phase': 'greedy', 'seconds': 0.2, 'peak_bytes': 1000},
+                          {'n': 100, 'phase': 'transform', 'seconds': 0.003},
+                          {'n': 1000, 'phase': 'greedy', 'seconds': 5.0}]}
+    problems = benchmark.check_regressions(report, baseline, tolerance=1.5)
+    # transform is below the noise floor and n=1000 has no baseline
+    assert len(problems) == 1 and problems[0].startswith('greedy at n=100')
+    assert benchmark.check_regressions(report, baseline, tolerance=3.0) == []
+
+
+def test_main_writes_report_and_compares_against_baseline(tmp_path):
+    output = str(tmp_path / "bench.json")
+    assert benchmark.main(['--sizes', '10', '--repeat', '1', '--no-memory', '--output', output]) == 0
+    report = benchmark.load_report(output)
+    assert [r['phase'] for r in report['results']] == list(benchmark.PHASES)
+
+    # Against itself nothing regresses, against a much faster baseline everything does
+    assert benchmark.main(['--sizes', '10', '--repeat', '1', '--no-memory', '--output', output,
+                           '--baseline', output, '--tolerance', '1000']) == 0
+    fast = dict(report, results=[dict(r, seconds=1e-9) for r in report['results']])
+    slow = dict(report, results=[dict(r, seconds=1.0) for r in report['results']])
+    assert len(benchmark.check_regressions(slow, fast)) == len(benchmark.PHASES)
@@ -0,0 +1,182 @@
+# tests/test_cli.py
+import csv
+import os
+import subprocess
+import sys
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import cli
+from benchmark import generate_form_rows
+from io_backends import FileSource
+from matching_algorithm import create_capstone_teams
+from form_parser import parse_rows
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def write_responses(path, n=30, seed=1):
+    header, rows = generate_form_rows(n, seed=seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return header, rows
+
+
+def test_match_writes_same_teams_as_library(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    output = str(tmp_path / "results.csv")
+    write_responses(responses)
+
+    assert cli.main(["match", "--input", responses, "--output", output, "--quiet"]) == 0
+    assert "30 responses" in capsys.readouterr().out
+
+    header, rows = FileSource(responses).read_rows()
+    results, total = create_capstone_teams(*parse_rows(header, rows))
+    _, written = FileSource(output).read_rows()
+    assert [row[0] for row in written[:-1]] == [", ".join(team) for team, _, _ in results]
+    assert written[-1][1:] == ["Overall Score", str(total)]
+
+
+def test_match_exact_prints_the_search_size(tmp_path, capsys):
+    import instrumentation
+
+    responses = str(tmp_path / "responses.csv")
+    write_responses(responses, n=10)
+
+    assert cli.main(["match", "--input", responses, "--output", str(tmp_path / "out.csv"), "--quiet",
+                     "--exact"]) == 0
+    out = capsys.readouterr().out
+    assert "10 responses" in out
+    nodes, rounds = out.split("Exact search: ")[1].split(" nodes, ")
+    assert int(nodes) > 0 and int(rounds.split(" rounds")[0]) >= 1
+    assert instrumentation.active() is None
+
+
+def test_match_needs_an_output_for_file_input(tmp_path):
+    responses = str(tmp_path / "responses.csv")
+    write_responses(responses)
+    assert cli.main(["match", "--input", responses]) == 2
+
+
+def test_score_reproduces_match_scores(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    output = str(tmp_path / "results.csv")
+    write_responses(responses)
+    cli.main(["match", "--input", responses, "--output", output, "--quiet", "--assignment", "optimal"])
+    _, written = FileSource(output).read_rows()
+    capsys.readouterr()
+
+    assert cli.main(["score", "--input", responses, "--results", output]) == 0
+    out = capsys.readouterr().out
+    assert f"Overall Score: {written[-1][2]}/100" in out
+
+
+def test_score_rejects_unknown_people(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    results = str(tmp_path / "results.csv")
+    write_responses(responses)
+    with open(results, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([["Team Members", "Project", "Score"], ["Nobody, Student 01", "Project A", "50"]])
+
+    assert cli.main(["score", "--input", responses, "--results", results]) == 1
+    assert "'Nobody' is not in the responses" in capsys.readouterr().err
+
+
+def test_validate_exit_status(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    header, rows = write_responses(responses)
+    assert cli.main(["validate", "--input", responses]) == 0
+    assert "0 errors" in capsys.readouterr().out
+
+    with open(responses, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(rows[0])
+    assert cli.main(["validate", "--input", responses]) == 1
+    assert "already answered in row 2" in capsys.readouterr().out
+
+
+def test_bench_passes_its_options_through(tmp_path):
+    output = str(tmp_path / "bench.json")
+    assert cli.main(["bench", "--sizes", "10", "--repeat", "1", "--no-memory", "--output", output]) == 0
+    assert os.path.exists(output)
+
+
+def test_validate_does_not_import_heavy_dependencies(tmp_path):
+    responses = str(tmp_path / "responses.csv")
+    write_responses(responses)
+    script = (
+        "import sys\n"
+        "import cli\n"
+        f"status = cli.main(['validate', '--input', {responses!r}])\n"
+        "heavy = [m for m in ('numpy', 'pandas', 'googleapiclient.discovery') if m in sys.modules]\n"
+        "print('HEAVY', heavy)\n"
+        "sys.exit(status)\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", script], cwd=SRC, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert "HEAVY []" in completed.stdout
+
+
+def test_whatif_reports_the_change_of_a_swap(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    output = str(tmp_path / "results.csv")
+    write_responses(responses)
+    cli.main(["match", "--input", responses, "--output", output, "--quiet"])
+    _, written = FileSource(output).read_rows()
+    first, second = written[0][0].split(", ")[0], written[1][0].split(", ")[0]
+    capsys.readouterr()
+
+    assert cli.main(["whatif", "--input", responses, "--results", output, "--swap", first, second]) == 0
+    out = capsys.readouterr().out
+    assert f"Team of {first} ({written[0][1]}): {written[0][2]} →" in out
+    assert "Change in the two teams' combined score" in out
+
+    # Two people from the same team cannot swap
+    teammate = written[0][0].split(", ")[1]
+    assert cli.main(["whatif", "--input", responses, "--results", output, "--swap", first, teammate]) == 1
+
+
+def test_match_applies_pinned_and_forbidden_pairs(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    output = str(tmp_path / "results.csv")
+    write_responses(responses, n=12)
+    args = ["match", "--input", responses, "--output", output, "--quiet", "--assignment", "optimal",
+            "--pin", "Student 01", "Student 09", "--forbid", "Student 02", "Student 03"]
+    assert cli.main(args) == 0
+    _, written = FileSource(output).read_rows()
+    teams = [row[0].split(", ") for row in written[:-1]]
+    assert any({"Student 01", "Student 09"} <= set(team) for team in teams)
+    assert not any({"Student 02", "Student 03"} <= set(team) for team in teams)
+
+    assert cli.main(["match", "--input", responses, "--output", output, "--pin", "Nobody", "Student 01"]) == 1
+    assert "'Nobody' is not in the cohort" in capsys.readouterr().err
+
+
+def test_snapshot_saves_the_cohort_for_replays(tmp_path, capsys):
+    from snapshot import replay_snapshot
+
+    responses = str(tmp_path / "responses.csv")
+    path = str(tmp_path / "cohort.snap")
+    write_responses(responses)
+
+    assert cli.main(["snapshot", "--input", responses, "--output", path]) == 0
+    assert "30 people and 5 projects" in capsys.readouterr().out
+    results, total = replay_snapshot(path)
+    expected, expected_total = create_capstone_teams(*parse_rows(*FileSource(responses).read_rows()))
+    assert results.to_rows() == expected.to_rows() and total == expected_total
+
+
+def test_sweep_writes_a_row_per_weighting(tmp_path, capsys):
+    responses = str(tmp_path / "responses.csv")
+    output = str(tmp_path / "sweep.csv")
+    write_responses(responses)
+
+    assert cli.main(["sweep", "--input", responses, "--steps", "3", "--samples", "2", "--workers", "1",
+                     "--output", output]) == 0
+    out = capsys.readouterr().out
+    assert "teammate 0.50 / project 0.50" in out
+    _, written = FileSource(output).read_rows()
+    assert [row[:3] for row in written] == [[w, p, s] for w, p in (("0.0", "1.0"), ("0.5", "0.5"), ("1.0", "0.0"))
+                                          for s in ("0", "1")]
@@ -0,0 +1,192 @@
+# tests/test_compat_matrix.py
+import itertools
+import os
+import random
+import sys
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+from matching_algorithm import create_capstone_teams, greedy_teams
+
+
+def dict_reference(people, teammate_prefs, projects, project_prefs,
+                   min_size=2, max_size=3, teammate_weight=0.7, project_weight=0.3):
+    # The original dict-based algorithm, iterating `remaining` in sorted order
+    # so ties resolve the same way on every run
+    def pair(p1, p2):
+        return (teammate_prefs.get(p1, {}).get(p2, 5) + teammate_prefs.get(p2, {}).get(p1, 5)) / 2
+
+    def team_score(team):
+        if len(team) < 2:
+            return 5
+        pairs = list(itertools.combinations(team, 2))
+        return sum(pair(a, b) for a, b in pairs) / len(pairs)
+
+    def project_score(team, project):
+        return sum(project_prefs.get(p, {}).get(project, 3) for p in team) / len(team)
+
+    remaining = set(people)
+    teams = []
+    while remaining:
+        current = max(
+            sorted(remaining),
+            key=lambda p: sum(teammate_prefs.get(p, {}).get(o, 5) for o in remaining if o != p)
+        )
+        remaining.remove(current)
+        candidates = sorted(
+            sorted(remaining),
+            key=lambda x: teammate_prefs.get(current, {}).get(x, 5) + teammate_prefs.get(x, {}).get(current, 5),
+            reverse=True
+        )
+        if not remaining:
+            team = [current]
+        else:
+            remainder = (len(remaining) - (max_size - 1)) % max_size
+            if remainder < min_size and len(remaining) >= min_size:
+                size = min(min_size - 1, len(candidates))
+            else:
+                size = min(max_size - 1, len(candidates))
+            team = [current] + candidates[:size]
+            remaining.difference_update(candidates[:size])
+        teams.append(team)
+
+    teams_sorted = sorted(teams, key=team_score, reverse=True)
+    lo = teammate_weight + project_weight
+    hi = teammate_weight * 10 + project_weight * 5
+
+    def normalize(v):
+        return round(max(1, min(100, ((v - lo) / (hi - lo)) * 99 + 1)), 2)
+
+    results, raw = [], []
+    for team, project in zip(teams_sorted, sorted(projects)):
+        combined = teammate_weight * team_score(team) + project_weight * project_score(team, project)
+        raw.append(combined)
+        results.append((team, project, int(round(normalize(combined)))))
+    total = normalize(sum(raw) / len(raw)) if raw else 0
+    return results, int(round(total))
+
+
+def random_cohort(n, n_projects, seed):
+    rng = random.Random(seed)
+    people = [f"P{i:03d}" for i in range(n)]
+    rng.shuffle(people)
+    projects = [f"Proj {k}" for k in range(n_projects)]
+    teammate_prefs = {}
+    project_prefs = {}
+    for p in people:
+        others = [o for o in people if o != p]
+        ranked = rng.sample(others, min(len(others), rng.randint(0, 5)))
+        teammate_prefs[p] = {o: max(1, 11 - r) for r, o in enumerate(ranked, start=1)}
+        for o in rng.sample(others, min(len(others), rng.randint(0, 2))):
+            teammate_prefs[p][o] = 1
+        project_prefs[p] = {pr: rng.randint(1, 5) for pr in rng.sample(projects, rng.randint(0, n_projects))}
+    return people, teammate_prefs, projects, project_prefs
+
+
+def test_matrix_fills_neutral_defaults():
+    m = CompatibilityMatrix(["B", "A"], {"A": {"B": 9}}, ["X", "Y"], {"B": {"Y": 1}})
+    assert m.people == ["A", "B"]
+    assert m.prefs[0, 1] == 9 and m.prefs[1, 0] == 5
+    assert m.prefs[0, 0] == 0 and m.prefs[1, 1] == 0
+    assert m.pair_score(0, 1) == m.pair_score(1, 0) == 7
+    assert m.project.tolist() == [[3, 3], [3, 1]]
+
+
+def test_matrix_ignores_unknown_names_and_projects():
+    m = CompatibilityMatrix(["A", "B"], {"A": {"Zed": 1}, "Zed": {"A": 1}}, ["X"], {"A": {"Nope": 5}})
+    assert m.prefs[0, 1] == 5
+    assert m.project.tolist() == [[3], [3]]
+
+
+def test_team_scores_match_single_team_helpers():
+    people, t, projects, pp = random_cohort(12, 4, seed=3)
+    m = CompatibilityMatrix(people, t, projects, pp)
+    teams = [[0, 1, 2], [3, 4], [5], [6, 7, 8], [9, 10, 11]]
+    batch = m.team_scores(teams)
+    table = m.team_project_scores(teams)
+    for i, team in enumerate(teams):
+        assert batch[i] == m.team_score(team)
+        for k in range(len(projects)):
+            assert table[i, k] == m.project_score(team, k)
+
+
+def test_matches_dict_reference_on_random_cohorts():
+    for seed in range(20):
+        n = 3 + seed * 2
+        args = random_cohort(n, 1 + seed % 7, seed)
+        assert create_capstone_teams(*args) == dict_reference(*args)
+
+
+def test_matches_dict_reference_with_other_sizes_and_weights():
+    args = random_cohort(31, 12, seed=99)
+    kwargs = dict(min_size=3, max_size=5, teammate_weight=0.5, project_weight=0.5)
+    assert create_capstone_teams(*args, **kwargs) == dict_reference(*args, **kwargs)
+
+
+def test_duplicate_submissions_match_dict_reference():
+    people = ["A", "B", "C", "D", "B"]
+    teammate_prefs = {"A": {"B": 9}, "B": {"A": 8}, "C": {"D": 7}, "D": {"C": 6}}
+    projects = ["X", "Y"]
+    project_prefs = {"A": {"X": 5}, "B": {"X": 4}, "C": {"Y": 5}}
+    args = (people, teammate_prefs, projects, project_prefs)
+    assert create_capstone_teams(*args) == dict_reference(*args)
+    assert create_capstone_teams(*args, sparse=True) == dict_reference(*args)
+    assert SparseCompatibilityMatrix(*args).people == CompatibilityMatrix(*args).people == ["A", "B", "C", "D"]
+
+    args = random_cohort(20, 4, seed=7)
+    args = (args[0] + args[0][:3],) + args[1:]
+    assert create_capstone_teams(*args) == dict_reference(*args)
+
+
+def test_sparse_matrix_stores_only_explicit_ratings():
+    m = SparseCompatibilityMatrix(["B", "A", "C"], {"A": {"B": 9, "C": 5, "A": 2}, "C": {"A": 1}},
+                                  ["X"], {"B": {"X": 1}})
+    assert m.people == ["A", "B", "C"]
+    assert m.nnz == 2
+    assert m.given(0)[0].tolist() == [1] and m.received(0)[0].tolist() == [2]
+    dense = CompatibilityMatrix(["B", "A", "C"], {"A": {"B": 9, "C": 5}, "C": {"A": 1}}, ["X"], {"B": {"X": 1}})
+    rows, cols = np.indices((3, 3))
+    assert np.array_equal(m.lookup(rows, cols), dense.prefs)
+    assert m.project.tolist() == dense.project.tolist()
+
+
+def test_sparse_matrix_later_entries_win():
+    m = SparseCompatibilityMatrix.from_entries(3, [0, 0, 1, 1], [1, 1, 2, 2], [9, 5, 2, 7])
+    assert m.lookup([0, 1], [1, 2]).tolist() == [5, 7]
+    assert m.nnz == 1
+
+
+def test_sparse_matrix_scores_match_dense():
+    for seed in range(5):
+        args = random_cohort(40, 5, seed)
+        dense = CompatibilityMatrix(*args)
+        sparse = SparseCompatibilityMatrix(*args)
+        teams = greedy_teams(dense) + [[0]]
+        assert np.allclose(sparse.team_scores(teams), dense.team_scores(teams))
+        assert np.allclose(sparse.team_project_scores(teams), dense.team_project_scores(teams))
+        assert sparse.team_score(teams[0]) == dense.team_score(teams[0])
+        assert np.allclose(sparse.pair_scores(3, [0, 1, 2, 3]), dense.pair_scores(3, [0, 1, 2, 3]))
+        assert sparse.block_sum([0, 5, 9], [1, 2]) == dense.block_sum([0, 5, 9], [1, 2])
+        sub = [2, 7, 11, 30]
+        rows, cols = np.indices((4, 4))
+        assert np.array_equal(sparse.submatrix(sub).lookup(rows, cols), dense.submatrix(sub).prefs)
+
+
+def test_sparse_greedy_forms_the_same_teams_as_dense():
+    for seed in range(30):
+        args = random_cohort([1, 2, 4, 7, 10, 33, 80][seed % 7], 3, seed)
+        dense = CompatibilityMatrix(*args)
+        sparse = SparseCompatibilityMatrix(*args)
+        for min_size, max_size in [(2, 3), (1, 2), (3, 5)]:
+            assert greedy_teams(sparse, min_size, max_size) == greedy_teams(dense, min_size, max_size)
+
+
+def test_sparse_results_match_dict_reference():
+    args = random_cohort(120, 6, seed=5)
+    assert create_capstone_teams(*args, sparse=True) == dict_reference(*args)
+    kwargs = dict(min_size=3, max_size=4, assignment='optimal', project_capacities={p: 10 for p in args[2]})
+    assert create_capstone_teams(*args, sparse=True, **kwargs) == create_capstone_teams(*args, sparse=False, **kwargs)
@@ -0,0 +1,137 @@
+# tests/test_constraints.py
+import os
+import random
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from compat_matrix import CompatibilityMatrix
+from constraints import TeamConstraints
+from matching_algorithm import create_capstone_teams, greedy_teams
+from test_compat_matrix import random_cohort
+
+
+def team_of(teams):
+    return {person: t for t, team in enumerate(teams) for person in team}
+
+
+def test_pinned_pairs_chain_into_groups_and_forbidden_bits_are_symmetric():
+    c = TeamConstraints(20, pinned_pairs=[(0, 1), (1, 2)], forbidden_pairs=[(3, 17), (0, 9)])
+    assert sorted(c.group(2)) == [0, 1, 2]
+    assert c.group(5) == [5]
+    assert c.largest_group() == 3
+    assert c.forbids(17, 3) and c.forbids(3, 17) and not c.forbids(3, 4)
+    assert list(c.blocked([0, 3]).nonzero()[0]) == [9, 17]
+    assert c.allows([0, 1, 2]) and not c.allows([0, 1]) and not c.allows([3, 17])
+
+
+def test_contradicting_constraints_are_rejected():
+    with pytest.raises(ValueError):
+        TeamConstraints(4, pinned_pairs=[(0, 1), (1, 2)], forbidden_pairs=[(0, 2)])
+    with pytest.raises(ValueError):
+        TeamConstraints(4, locked_teams=[[0, 1], [1, 2]])
+    with pytest.raises(ValueError):
+        TeamConstraints(4, pinned_pairs=[(0, 3)], locked_teams=[[0, 1]])
+
+
+def test_restricted_renumbers_the_pairs_inside():
+    c = TeamConstraints(6, pinned_pairs=[(1, 4)], forbidden_pairs=[(4, 5), (0, 2)])
+    sub = c.restricted([1, 4, 5])
+    assert sorted(sub.group(0)) == [0, 1]
+    assert sub.forbids(1, 2) and sub.forbidden_pairs == [(1, 2)]
+
+
+def test_greedy_keeps_every_constraint():
+    m = CompatibilityMatrix(*random_cohort(90, 5, seed=6))
+    rng = random.Random(2)
+    pinned = [tuple(rng.sample(range(90), 2)) for _ in range(8)]
+    forbidden = [(a, b) for a, b in (tuple(rng.sample(range(90), 2)) for _ in range(60))
+                 if not any({a, b} <= {x, y} for x, y in pinned)]
+    # Forbid each person's favourite so the plain greedy teams cannot all survive
+    forbidden += [(i, int(m.prefs[i].argmax())) for i in range(0, 90, 3)]
+    c = TeamConstraints(90, pinned, forbidden)
+
+    teams = greedy_teams(m, 2, 3, constraints=c)
+    where = team_of(teams)
+    assert sorted(where) == list(range(90))
+    assert all(where[a] == where[b] for a, b in pinned)
+    assert all(where[a] != where[b] for a, b in forbidden)
+    assert all(2 <= len(team) <= 3 for team in teams)
+
+
+def has_valid_split(n, c, min_size, max_size, teams=()):
+    # Brute force: place each person in an open team or a new one
+    placed = {i for team in teams for i in team}
+    if len(placed) == n:
+        return all(min_size <= len(team) <= max_size and c.allows(team) for team in teams)
+    person = min(i for i in range(n) if i not in placed)
+    options = [team + [person] for team in teams if len(team) < max_size]
+    return any(has_valid_split(n, c, min_size, max_size,
+                               [t for t in teams if t != option[:-1]] + [option])
+               for option in options + [[person]])
+
+
+def test_no_team_below_min_size_when_a_valid_split_exists():
+    for seed in range(150):
+        rng = random.Random(seed)
+        n = rng.randint(4, 10)
+        min_size = rng.choice([2, 2, 3])
+        max_size = min_size + rng.choice([0, 1, 1, 2])
+        m = CompatibilityMatrix(*random_cohort(n, 3, seed))
+        pinned = [tuple(rng.sample(range(n), 2)) for _ in range(rng.randint(0, 3))]
+        forbidden = [tuple(rng.sample(range(n), 2)) for _ in range(rng.randint(0, 2 * n))]
+        try:
+            c = TeamConstraints(n, pinned, forbidden)
+        except ValueError:
+            continue
+        if not c or c.largest_group() > max_size:
+            continue
+
+        if not has_valid_split(n, c, min_size, max_size):
+            with pytest.raises(ValueError):
+                greedy_teams(m, min_size, max_size, constraints=c)
+            continue
+        teams = greedy_teams(m, min_size, max_size, constraints=c)
+        assert sorted(i for team in teams for i in team) == list(range(n))
+        assert all(min_size <= len(team) <= max_size and c.allows(team) for team in teams), seed
+
+
+def test_create_teams_by_name_with_locked_team():
+    people, t, projects, pp = random_cohort(30, 3, seed=1)
+    capacities = {p: 10 for p in projects}
+    results, _ = create_capstone_teams(people, t, projects, pp, project_capacities=capacities,
+                                       pinned_pairs=[(people[0], people[1])],
+                                       forbidden_pairs=[(people[2], people[3])],
+                                       locked_teams=[[people[4], people[5], people[6]]])
+    teams = [list(team) for team, _, _ in results]
+    where = team_of(teams)
+    assert len(where) == 30
+    assert where[people[0]] == where[people[1]]
+    assert where[people[2]] != where[people[3]]
+    assert [people[4], people[5], people[6]] in teams
+
+    with pytest.raises(ValueError):
+        create_capstone_teams(people, t, projects, pp, pinned_pairs=[("Nobody", people[0])])
+    with pytest.raises(ValueError):
+        create_capstone_teams(people, t, projects, pp, pinned_pairs=[(people[0], people[1])], exact=True)
+
+
+def test_warm_resolve_only_reforms_teams_that_break_a_new_constraint():
+    people, t, projects, pp = random_cohort(60, 3, seed=9)
+    capacities = {p: 20 for p in projects}
+    first, _ = create_capstone_teams(people, t, projects, pp, project_capacities=capacities)
+    previous = [list(team) for team, _, _ in first]
+    a, b = previous[0][0], previous[0][1]
+
+    second, _ = create_capstone_teams(people, t, projects, pp, project_capacities=capacities,
+                                      previous_teams=previous, forbidden_pairs=[(a, b)])
+    teams = [sorted(team) for team, _, _ in second]
+    assert team_of(teams)[a] != team_of(teams)[b]
+    untouched = [sorted(team) for team in previous[1:]]
+    # a and b were a pair, neither can be left alone, so each joins a kept team with room
+    assert all(2 <= len(team) <= 3 for team in teams)
+    assert all(team in untouched for team in teams if a not in team and b not in team)
+    assert sum(team in teams for team in untouched) == len(untouched) - 2
@@ -0,0 +1,85 @@
+# tests/test_decomposition.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from benchmark import generate_form_rows
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+from decomposition import connected_components, decompose_teams, partition, preference_graph
+from form_parser import parse_rows
+from matching_algorithm import create_capstone_teams, greedy_teams
+
+
+def clustered_cohort(n_clusters, cluster_size, seed=0):
+    """People only rate others in their own cluster"""
+    rng = np.random.default_rng(seed)
+    people = [f"P{c:02d}-{k:02d}" for c in range(n_clusters) for k in range(cluster_size)]
+    teammate_prefs = {}
+    for c in range(n_clusters):
+        members = people[c * cluster_size:(c + 1) * cluster_size]
+        for person in members:
+            others = [p for p in members if p != person]
+            picks = rng.choice(len(others), size=4, replace=False)
+            teammate_prefs[person] = {others[i]: int(rng.integers(6, 11)) for i in picks}
+    return people, teammate_prefs, ["X", "Y"], {}
+
+
+def test_graph_keeps_only_pairs_above_default_in_both_directions():
+    people = ["A", "B", "C", "D"]
+    # A-B above default, C-D pulled below it by an avoid
+    t = {"A": {"B": 9}, "C": {"D": 8}, "D": {"C": 1}}
+    for matrix_class in (CompatibilityMatrix, SparseCompatibilityMatrix):
+        indptr, indices, weights = preference_graph(matrix_class(people, t, [], {}))
+        assert indptr.tolist() == [0, 1, 2, 2, 2]
+        assert indices.tolist() == [1, 0]
+        assert weights.tolist() == [2.0, 2.0]
+
+
+def test_components_and_partition_of_clusters():
+    m = SparseCompatibilityMatrix(*clustered_cohort(6, 30, seed=1))
+    graph = preference_graph(m)
+    labels = connected_components(graph, len(m))
+    # Clusters never connect, rows are sorted by name so each cluster is a run of 30
+    assert len(set(labels.tolist())) >= 6
+    assert all(len(set((labels[c * 30:(c + 1) * 30]).tolist()) & set(labels[:c * 30].tolist())) == 0
+               for c in range(1, 6))
+
+    blocks = partition(graph, len(m), block_size=70)
+    assert sorted(np.concatenate(blocks).tolist()) == list(range(180))
+    assert all(2 <= len(block) <= 70 for block in blocks)
+
+
+def test_large_component_is_split_into_bounded_blocks():
+    header, rows = generate_form_rows(1200, seed=2)
+    m = SparseCompatibilityMatrix(*parse_rows(header, rows))
+    blocks = partition(preference_graph(m), len(m), block_size=300)
+    assert len(blocks) >= 4
+    assert sorted(np.concatenate(blocks).tolist()) == list(range(1200))
+    assert max(len(block) for block in blocks) <= 300 * 1.05 + 1
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_decomposed_teams_cover_everyone_and_match_greedy_quality(workers):
+    header, rows = generate_form_rows(1500, seed=3)
+    m = SparseCompatibilityMatrix(*parse_rows(header, rows))
+    teams = decompose_teams(m, 2, 3, block_size=400, workers=workers)
+    assert sorted(i for team in teams for i in team) == list(range(1500))
+    assert all(2 <= len(team) <= 3 for team in teams)
+    # Friends sit close together, so splitting the cohort costs next to nothing
+    assert np.mean(m.team_scores(teams)) >= np.mean(m.team_scores(greedy_teams(m, 2, 3))) - 0.05
+
+
+def test_create_teams_with_decompose():
+    people, t, projects, pp = clustered_cohort(8, 25, seed=4)
+    capacities = {p: 100 for p in projects}
+    results, _ = create_capstone_teams(people, t, projects, pp, project_capacities=capacities,
+                                       decompose=True, workers=1)
+    assert sorted(p for team, _, _ in results for p in team) == sorted(people)
+
+    with pytest.raises(ValueError):
+        create_capstone_teams(people, t, projects, pp, decompose=True, exact=True)
@@ -0,0 +1,98 @@
+# tests/test_exact_solver.py
+import os
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from compat_matrix import CompatibilityMatrix
+from exact_solver import solve_exact, MAX_EXACT_PEOPLE
+from local_search import improve_teams
+from matching_algorithm import create_capstone_teams, greedy_teams
+from test_compat_matrix import random_cohort
+
+
+def all_partitions(people, min_size, max_size):
+    # Every way to split people into teams within the size bounds
+    if not people:
+        yield []
+        return
+    first, rest = people[0], people[1:]
+
+    def pick(chosen, pool, start):
+        if min_size <= len(chosen) + 1 <= max_size:
+            left = [p for p in pool if p not in chosen]
+            for partition in all_partitions(left, min_size, max_size):
+                yield [[first] + chosen] + partition
+        if len(chosen) + 1 < max_size:
+            for i in range(start, len(pool)):
+                yield from pick(chosen + [pool[i]], pool, i + 1)
+
+    yield from pick([], rest, 0)
+
+
+def average(matrix, teams):
+    return sum(matrix.team_score(t) for t in teams) / len(teams)
+
+
+@pytest.mark.parametrize("n,min_size,max_size", [(6, 2, 3), (7, 2, 3), (8, 2, 4), (9, 3, 3)])
+def test_matches_brute_force(n, min_size, max_size):
+    for seed in range(3):
+        people, t, projects, pp = random_cohort(n, 2, seed=seed + n)
+        m = CompatibilityMatrix(people, t, projects, pp)
+        best = max(average(m, p) for p in all_partitions(list(range(n)), min_size, max_size))
+
+        teams, stats = solve_exact(m, min_size, max_size)
+
+        assert abs(stats['objective'] - best) < 1e-9
+        assert abs(average(m, teams) - best) < 1e-9
+        assert sorted(i for team in teams for i in team) == list(range(n))
+        assert all(min_size <= len(team) <= max_size for team in teams)
+        assert stats['nodes'] > 0 and stats['rounds'] >= 1
+
+
+def test_exact_is_at_least_as_good_as_heuristics():
+    people, t, projects, pp = random_cohort(16, 4, seed=5)
+    m = CompatibilityMatrix(people, t, projects, pp)
+    greedy = greedy_teams(m)
+    improved, _ = improve_teams(m, greedy, max_iterations=2000)
+
+    teams, stats = solve_exact(m, initial_teams=greedy)
+
+    assert stats['objective'] >= average(m, improved) - 1e-9 >= average(m, greedy) - 2e-9
+
+
+def test_infeasible_and_oversized_inputs_raise():
+    m = CompatibilityMatrix(["A", "B", "C", "D", "E"], {}, [], {})
+    with pytest.raises(ValueError):
+        solve_exact(m, 3, 3)
+    big = CompatibilityMatrix([f"P{i}" for i in range(MAX_EXACT_PEOPLE + 1)], {}, [], {})
+    with pytest.raises(ValueError):
+        solve_exact(big)
+
+
+def test_create_capstone_teams_exact_mode():
+    people = ["A", "B", "C", "D"]
+    # Greedy seeds with A (highest total) and pairs them with B, leaving C+D apart
+    # from their favourites. The optimum is A+C and B+D.
+    t = {"A": {"C": 10, "B": 9, "D": 9}, "C": {"A": 10}, "B": {"D": 10}, "D": {"B": 10}}
+    results, _ = create_capstone_teams(people, t, ["P1", "P2"], {}, min_size=2, max_size=2, exact=True)
+    assert sorted(sorted(team) for team, _, _ in results) == [["A", "C"], ["B", "D"]]
+    assert create_capstone_teams([], {}, [], {}, exact=True) == ([], 0)
+
+
+def test_exact_mode_reports_its_search_through_instrumentation():
+    import instrumentation
+
+    people = ["A", "B", "C", "D"]
+    t = {"A": {"C": 10, "B": 9, "D": 9}, "C": {"A": 10}, "B": {"D": 10}, "D": {"B": 10}}
+    m = CompatibilityMatrix(people, t, ["P1", "P2"], {})
+    _, stats = solve_exact(m, 2, 2, initial_teams=greedy_teams(m, 2, 2))
+
+    with instrumentation.recording() as recorder:
+        create_capstone_teams(people, t, ["P1", "P2"], {}, min_size=2, max_size=2, exact=True)
+    assert recorder.counters['exact.nodes'] == stats['nodes'] > 0
+    assert recorder.counters['exact.rounds'] == stats['rounds']
+    assert recorder.phases['exact']['calls'] == 1
@@ -0,0 +1,82 @@
+# tests/test_form_parser.py
+import os
+import random
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import main
+from benchmark import generate_form_rows
+from form_parser import check_rows, parse_header, parse_rows
+
+HEADER = ["Please Enter Your Name.", "Rank the projects [Alpha]", "Rank the projects [Beta]",
+          "Rank the people you'd like to work with [Person 1]",
+          "Rank the people you'd like to work with [Person 2]",
+          "Choose three people you don't want [1]"]
+
+
+def test_parse_rows_matches_dataframe_transform_on_generated_cohort():
+    header, rows = generate_form_rows(200, seed=3)
+    expected = main.transform_data_for_algorithm(main._rows_to_frame(header, rows))
+    assert parse_rows(header, rows) == expected
+
+
+def test_parse_rows_matches_dataframe_transform_on_messy_rows():
+    rng = random.Random(11)
+    names = [f"Student {i}" for i in range(30)]
+    header = (["Please Enter Your Name."] + [f"Rank the projects [{p}]" for p in ["Alpha", "Beta", "Gamma"]]
+              + [f"Rank the people you'd like to work with [Person {k}]" for k in range(1, 12)]
+              + [f"Choose three people you don't want [{k}]" for k in range(1, 4)])
+    rows = []
+    # A duplicated respondent, unknown names, blanks, repeated picks and short rows
+    for name in names + ["Student 3"]:
+        row = [name] + [rng.choice(["1", "2", "3", "4", "5", None]) for _ in range(3)]
+        row += [rng.choice(names + ["Ghost", None]) for _ in range(11)]
+        row += [rng.choice(names + [None, None]) for _ in range(3)]
+        rows.append(row[:rng.randint(4, len(row))])
+
+    expected = main.transform_data_for_algorithm(main._rows_to_frame(header, rows))
+    assert parse_rows(header, rows) == expected
+
+
+def test_parse_header_requires_name_column():
+    with pytest.raises(KeyError):
+        parse_header(HEADER[1:])
+
+
+def test_avoided_person_overrides_ranking():
+    rows = [["A", "1", "2", "B", None, "B"], ["B", "2", "1", "A"]]
+    people, teammate_prefs, projects, project_prefs = parse_rows(HEADER, rows)
+    assert people == ["A", "B"]
+    assert projects == ["Alpha", "Beta"]
+    assert teammate_prefs == {"A": {"B": 1}, "B": {"A": 10}}
+    assert project_prefs == {"A": {"Alpha": 5, "Beta": 4}, "B": {"Alpha": 4, "Beta": 5}}
+
+
+def test_check_rows_reports_errors_and_warnings():
+    rows = [
+        ["A", "1", "2", "B", "Ghost"],
+        ["B", "7", "x", "B"],
+        ["A", "2", "1"],
+        ["", "1", "2"],
+    ]
+    errors, warnings = check_rows(HEADER, rows)
+    assert errors == [
+        "Row 3: rank '7' for project 'Alpha' is not between 1 and 2",
+        "Row 3: rank 'x' for project 'Beta' is not between 1 and 2",
+        "Row 4: 'A' already answered in row 2",
+        "Row 5: no name",
+    ]
+    assert warnings == [
+        "Row 2: 'Ghost' did not respond and is ignored",
+        "Row 3: 'B' named themselves",
+    ]
+
+
+def test_check_rows_reports_bad_header():
+    errors, warnings = check_rows(HEADER[1:], [])
+    assert errors == ["The header has no 'Please Enter Your Name.' column"]
+    assert warnings == []
@@ -0,0 +1,120 @@
+# tests/test_instrumentation.py
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import instrumentation
+import main
+from benchmark import generate_form_rows
+from io_backends import FileSink, FileSource
+
+
+@pytest.fixture(autouse=True)
+def no_leftover_recorder():
+    yield
+    instrumentation.disable()
+
+
+def test_disabled_helpers_record_nothing():
+    assert instrumentation.active() is None
+    first = instrumentation.phase('a')
+    # The same shared no-op context every time
+    assert instrumentation.phase('b') is first
+    with first:
+        instrumentation.count('x')
+    assert instrumentation.disable() is None
+
+
+def test_phases_and_counters_are_recorded():
+    with instrumentation.recording() as recorder:
+        for _ in range(3):
+            with instrumentation.phase('outer'):
+                with instrumentation.phase('inner'):
+                    instrumentation.count('things', 2)
+        instrumentation.count('other')
+    assert instrumentation.active() is None
+
+    report = recorder.report()
+    assert report['phases']['outer']['calls'] == 3
+    assert report['phases']['inner']['calls'] == 3
+    assert report['phases']['outer']['seconds'] >= report['phases']['inner']['seconds']
+    assert report['counters'] == {'things': 6, 'other': 1}
+    assert report['seconds'] >= report['phases']['outer']['seconds']
+    json.dumps(report)
+
+
+def test_trace_memory_attributes_inner_peak_to_outer_phase():
+    with instrumentation.recording(trace_memory=True) as recorder:
+        with instrumentation.phase('outer'):
+            with instrumentation.phase('inner'):
+                block = bytearray(5_000_000)
+                del block
+            small = bytearray(1000)
+            del small
+    phases = recorder.report()['phases']
+    assert phases['inner']['peak_bytes'] >= 5_000_000
+    assert phases['outer']['peak_bytes'] >= phases['inner']['peak_bytes']
+
+
+def test_trace_memory_keeps_overlapping_phases_apart():
+    # Like the async pipeline's fetch and transform: b opens inside a but outlives it
+    with instrumentation.recording(trace_memory=True) as recorder:
+        a = instrumentation.phase('a')
+        b = instrumentation.phase('b')
+        a.__enter__()
+        block = bytearray(5_000_000)
+        del block
+        b.__enter__()
+        a.__exit__(None, None, None)
+        small = bytearray(100_000)
+        del small
+        b.__exit__(None, None, None)
+    phases = recorder.report()['phases']
+    assert phases['a']['peak_bytes'] >= 5_000_000
+    assert 100_000 <= phases['b']['peak_bytes'] < 5_000_000
+
+
+def test_cprofile_hook_writes_profile(tmp_path):
+    path = str(tmp_path / "report.json")
+    with instrumentation.recording(profiler='cprofile') as recorder:
+        sorted(range(1000), key=lambda x: -x)
+    report = recorder.write_report(path)
+    assert os.path.exists(report['profile_file'])
+    with open(path) as f:
+        saved = json.load(f)
+    assert saved['profile'] and {'function', 'calls', 'cumulative_seconds'} <= set(saved['profile'][0])
+
+
+def test_unknown_profiler_is_rejected():
+    with pytest.raises(ValueError):
+        instrumentation.enable(profiler='perf')
+    assert instrumentation.active() is None
+
+
+def test_settings_from_env():
+    assert instrumentation.settings_from_env({}) == (None, None, False)
+    assert instrumentation.settings_from_env({'CAPSTONE_PROFILE': '1'}) == \
+        (instrumentation.DEFAULT_REPORT_FILE, None, False)
+    assert instrumentation.settings_from_env({'CAPSTONE_PROFILE': 'r.json', 'CAPSTONE_PROFILER': 'cprofile',
+                                              'CAPSTONE_TRACE_MEMORY': '1'}) == ('r.json', 'cprofile', True)
+
+
+def test_pipeline_reports_every_phase(tmp_path):
+    header, rows = generate_form_rows(60)
+    path = str(tmp_path / "responses.csv")
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([header] + rows)
+
+    with instrumentation.recording() as recorder:
+        main.run_pipeline(FileSource(path), FileSink(str(tmp_path / "results.csv")))
+    report = recorder.report()
+    assert {'fetch', 'parse', 'transform', 'match', 'matrix', 'teams', 'assignment', 'normalize',
+            'write'} <= set(report['phases'])
+    assert report['counters']['rows.read'] == 60
+    assert report['counters']['greedy.iterations'] == report['counters']['greedy.candidate_selections'] >= 20
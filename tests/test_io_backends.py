@@ -0,0 +1,156 @@
+# tests/test_io_backends.py
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import main
+from fake_sheets import FakeSheetsService
+from io_backends import FileSink, FileSource
+
+HEADER = ["Please Enter Your Name.", "Rank the projects [A]", "Rank the projects [B]",
+          "Rank the people you'd like to work with [Person 1]",
+          "Choose three people you don't want [1]"]
+
+
+def cohort_rows(n):
+    rows = []
+    for i in range(n):
+        row = [f"S{i}", str(1 + i % 2), str(2 - i % 2), f"S{(i + 1) % n}"]
+        if i % 3 == 0:
+            row.append(f"S{(i + 2) % n}")
+        rows.append(row)
+    return rows
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def test_csv_source_streams_chunks_and_trims_like_sheets(tmp_path):
+    path = str(tmp_path / "responses.csv")
+    # csv pads every row to the header width, the source trims it back
+    write_csv(path, HEADER, [row + [""] * (len(HEADER) - len(row)) for row in cohort_rows(25)])
+
+    chunks = list(FileSource(path, chunk_rows=10).iter_row_chunks())
+
+    assert [len(rows) for _, rows in chunks] == [10, 10, 5]
+    assert all(header == HEADER for header, _ in chunks)
+    assert [r for _, rows in chunks for r in rows] == cohort_rows(25)
+
+
+def test_json_source_accepts_rows_or_records(tmp_path):
+    rows_path = str(tmp_path / "rows.json")
+    records_path = str(tmp_path / "records.json")
+    rows = cohort_rows(4)
+    with open(rows_path, "w") as f:
+        json.dump([HEADER] + rows, f)
+    with open(records_path, "w") as f:
+        json.dump([dict(zip(HEADER, row + [None] * (len(HEADER) - len(row)))) for row in rows], f)
+
+    assert FileSource(rows_path).read_rows() == (HEADER, rows)
+    assert FileSource(records_path).read_rows() == (HEADER, rows)
+
+
+def test_empty_file_and_unknown_extension(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("")
+    assert FileSource(str(path)).read_rows() == (None, [])
+    with pytest.raises(ValueError):
+        FileSource(str(tmp_path / "responses.xlsx"))
+
+
+def test_file_sink_writes_csv_and_json(tmp_path):
+    values = [['Team Members', 'Project', 'Score'], ['A, B', 'X', 90], ['', 'Overall Score', 90]]
+
+    FileSink(str(tmp_path / "out" / "results.json")).write(values)
+    with open(tmp_path / "out" / "results.json") as f:
+        assert json.load(f) == values
+
+    FileSink(str(tmp_path / "results.csv")).write(values)
+    with open(tmp_path / "results.csv", newline="") as f:
+        assert list(csv.reader(f)) == [[str(cell) for cell in row] for row in values]
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "responses.parquet")
+    rows = cohort_rows(12)
+    FileSink(path).write([HEADER] + [row + [""] * (len(HEADER) - len(row)) for row in rows])
+    assert FileSource(path, chunk_rows=5).read_rows() == (HEADER, rows)
+
+
+def test_parquet_without_pyarrow_fails_with_a_clear_message(tmp_path, monkeypatch):
+    # A None entry makes the import fail as if pyarrow were not installed
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    path = str(tmp_path / "responses.parquet")
+    with pytest.raises(ImportError, match="need pyarrow"):
+        FileSource(path).read_rows()
+    with pytest.raises(ImportError, match="need pyarrow"):
+        FileSink(path).write([["Team Members", "Project", "Score"]])
+
+
+def test_csv_with_blank_cells_between_filled_ones(tmp_path):
+    from form_parser import check_rows, parse_rows
+
+    path = str(tmp_path / "responses.csv")
+    rows = cohort_rows(12)
+    # S0 skipped project A and the teammate ranking, but filled the last column
+    rows[0] = ["S0", "", "1", " ", "S2"]
+    write_csv(path, HEADER, rows)
+
+    header, read = FileSource(path).read_rows()
+    assert read[0] == ["S0", "", "1", " ", "S2"]
+    people, teammate_prefs, _, project_prefs = parse_rows(header, read)
+    assert project_prefs["S0"] == {"B": 5}
+    assert teammate_prefs["S0"] == {"S2": 1}
+    assert check_rows(header, read) == ([], [])
+
+    import pandas as pd
+    frame = pd.DataFrame([row + [None] * (len(header) - len(row)) for row in read], columns=header)
+    assert main.transform_data_for_algorithm(frame) == (people, teammate_prefs, ["A", "B"], project_prefs)
+    assert main.run_pipeline(FileSource(path), FileSink(str(tmp_path / "out.json")))
+
+
+def test_pipeline_gives_same_teams_from_file_or_sheets(tmp_path, monkeypatch):
+    rows = cohort_rows(30)
+    path = str(tmp_path / "responses.csv")
+    write_csv(path, HEADER, rows)
+    fake = FakeSheetsService({"Form Responses 1": [HEADER] + rows}, column_count=5)
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+
+    file_out = str(tmp_path / "results.json")
+    from_file = main.run_pipeline(FileSource(path, chunk_rows=7), FileSink(file_out))
+    from_sheets = main.run_pipeline(main.SheetsSource("sheet_id", "Form Responses 1", chunk_rows=7),
+                                    main.SheetsSink("sheet_id", "Team Results!A1"))
+
+    assert from_file[:2] == from_sheets[:2]
+    with open(file_out) as f:
+        written = json.load(f)
+    assert written == main.format_results(*from_file[:2])
+    assert fake.tabs["Team Results"] == written
+
+
+def test_pipeline_saves_state_only_with_a_state_file(tmp_path):
+    path = str(tmp_path / "responses.csv")
+    write_csv(path, HEADER, cohort_rows(10))
+    state_file = str(tmp_path / "state.json")
+
+    empty = tmp_path / "empty.csv"
+    write_csv(str(empty), HEADER, [])
+    assert main.run_pipeline(FileSource(str(empty)), FileSink(str(tmp_path / "a.csv")), state_file=state_file) is None
+    assert not os.path.exists(state_file)
+
+    _, _, stats = main.run_pipeline(FileSource(path), FileSink(str(tmp_path / "a.csv")), state_file=state_file)
+    assert stats['rows_transformed'] == 10
+    _, _, stats = main.run_pipeline(FileSource(path), FileSink(str(tmp_path / "b.csv")), state_file=state_file)
+    assert stats['rows_transformed'] == 0 and stats['warm_start']
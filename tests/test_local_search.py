@@ -0,0 +1,64 @@
+# tests/test_local_search.py
+import os
+import sys
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from compat_matrix import CompatibilityMatrix
+from local_search import improve_teams
+from matching_algorithm import create_capstone_teams, greedy_teams
+from test_compat_matrix import random_cohort
+
+
+def average_team_score(matrix, teams):
+    return sum(matrix.team_score(t) for t in teams) / len(teams)
+
+
+def test_improvement_never_lowers_score_and_keeps_bounds():
+    people, t, projects, pp = random_cohort(90, 10, seed=4)
+    m = CompatibilityMatrix(people, t, projects, pp)
+    start = greedy_teams(m, 2, 3)
+
+    teams, trace = improve_teams(m, start, 2, 3, max_iterations=1500, seed=1)
+
+    assert sorted(i for team in teams for i in team) == list(range(90))
+    assert all(2 <= len(team) <= 3 for team in teams)
+    assert len(teams) == len(start)
+    # Trace objectives only go up and the last one matches a full re-score
+    objectives = [obj for _, _, obj in trace]
+    assert objectives == sorted(objectives)
+    assert abs(objectives[-1] - average_team_score(m, teams)) < 1e-9
+    assert objectives[-1] > objectives[0]
+
+
+def test_swaps_fix_a_bad_pairing():
+    # Greedy pairs nobody with their mutual favourite, one swap fixes both teams
+    people = ["A", "B", "C", "D"]
+    t = {"A": {"C": 10, "B": 1}, "C": {"A": 10}, "B": {"D": 10}, "D": {"B": 10}}
+    m = CompatibilityMatrix(people, t, [], {})
+    teams, trace = improve_teams(m, [[0, 1], [2, 3]], 2, 2, max_iterations=50)
+    assert sorted(sorted(team) for team in teams) == [[0, 2], [1, 3]]
+    assert trace[-1][2] == 10
+
+
+def test_same_seed_is_reproducible():
+    args = random_cohort(60, 8, seed=11)
+    r1 = create_capstone_teams(*args, improve_iterations=500, seed=3)
+    r2 = create_capstone_teams(*args, improve_iterations=500, seed=3)
+    assert r1 == r2
+
+
+def test_time_budget_stops_the_search():
+    people, t, projects, pp = random_cohort(60, 8, seed=2)
+    m = CompatibilityMatrix(people, t, projects, pp)
+    teams, trace = improve_teams(m, greedy_teams(m), time_budget=0.05)
+    assert trace[-1][1] <= 0.5
+    assert all(2 <= len(team) <= 3 for team in teams)
+
+
+def test_single_team_is_returned_unchanged():
+    m = CompatibilityMatrix(["A", "B"], {}, [], {})
+    teams, trace = improve_teams(m, [[0, 1]], max_iterations=10)
+    assert teams == [[0, 1]]
+    assert trace == [(0, 0.0, 5.0)]
@@ -9,6 +9,7 @@ import builtins
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
 import main  # your src/main.py file
+from fake_sheets import FakeSheetsService
 
 
 def test_get_google_sheets_service_returns_none_when_no_credentials(monkeypatch):
@@ -166,3 +167,263 @@ def test_write_to_spreadsheet_handles_http_error(monkeypatch):
 
     ok = main.write_to_spreadsheet("sheet_id", "A1", [["x"]])
     assert ok is False
+
+
+def transform_reference(df):
+    # The original row-by-row transform, kept to check the bulk version against
+    people = df['Please Enter Your Name.'].tolist()
+    project_cols = [col for col in df.columns if col.startswith('Rank the projects')]
+    projects = [col.split('[')[1].rstrip(']') for col in project_cols]
+    project_prefs = {}
+    for idx, person in enumerate(people):
+        project_prefs[person] = {}
+        row = df.iloc[idx]
+        for col in project_cols:
+            if pd.notna(row[col]):
+                project_prefs[person][col.split('[')[1].rstrip(']')] = 6 - int(row[col])
+    rank_cols = [c for c in df.columns if c.startswith("Rank the people you'd like to work with")]
+    avoid_cols = [c for c in df.columns if c.startswith("Choose three people you don't want")]
+    teammate_prefs = {}
+    for idx, person in enumerate(people):
+        teammate_prefs[person] = {}
+        row = df.iloc[idx]
+        for col in rank_cols:
+            name = row[col]
+            if pd.notna(name) and name in people:
+                teammate_prefs[person][name] = max(1, 11 - int(col.split('[Person ')[1].rstrip(']').strip()))
+        for col in avoid_cols:
+            name = row[col]
+            if pd.notna(name) and name in people:
+                teammate_prefs[person][name] = 1
+    return people, teammate_prefs, projects, project_prefs
+
+
+def test_transform_matches_row_by_row_reference():
+    import random
+
+    rng = random.Random(5)
+    names = [f"Student {i}" for i in range(40)]
+    rows = []
+    # Includes a duplicated respondent, unknown names, blanks and repeated picks
+    for name in names + ["Student 3"]:
+        row = {"Please Enter Your Name.": name}
+        for p in ["Alpha", "Beta", "Gamma"]:
+            row[f"Rank the projects [{p}]"] = rng.choice(["1", "2", "3", "4", "5", None])
+        for k in range(1, 12):
+            row[f"Rank the people you'd like to work with [Person {k}]"] = rng.choice(names + ["Ghost", None, None])
+        for k in range(1, 4):
+            row[f"Choose three people you don't want [{k}]"] = rng.choice(names + [None, None, None])
+        rows.append(row)
+    df = pd.DataFrame(rows)
+
+    got = main.transform_data_for_algorithm(df)
+    expected = transform_reference(df)
+
+    assert got == expected
+    # Same insertion order as assigning one cell at a time
+    for person in expected[1]:
+        assert list(got[1][person].items()) == list(expected[1][person].items())
+        assert list(got[3][person].items()) == list(expected[3][person].items())
+
+
+def test_transform_handles_no_responses():
+    df = pd.DataFrame(columns=["Please Enter Your Name.", "Rank the projects [A]",
+                               "Rank the people you'd like to work with [Person 1]",
+                               "Choose three people you don't want [1]"])
+    assert main.transform_data_for_algorithm(df) == ([], {}, ["A"], {})
+
+
+def form_rows(n):
+    header = ["Please Enter Your Name.", "Rank the projects [A]",
+              "Rank the people you'd like to work with [Person 1]",
+              "Choose three people you don't want [1]"]
+    rows = [header]
+    for i in range(n):
+        # Everyone ranks the next person, who may only appear in a later chunk
+        row = [f"S{i}", str(1 + i % 5), f"S{(i + 1) % n}"]
+        if i % 3 == 0:
+            row.append(f"S{(i + 2) % n}")
+        rows.append(row)
+    return rows
+
+
+def test_read_spreadsheet_chunks_reads_past_row_100(monkeypatch):
+    fake = FakeSheetsService({"Form Responses 1": form_rows(250)}, row_count=1000, column_count=4)
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+
+    frames = list(main.read_spreadsheet_chunks("sheet_id", "Form Responses 1",
+                                               chunk_rows=40, ranges_per_request=3))
+
+    assert [len(f) for f in frames] == [39] + [40] * 5 + [11]
+    assert frames[-1]["Please Enter Your Name."].iloc[-1] == "S249"
+    # Every grid row is read, 25 chunks of 40 rows in requests of 3 ranges
+    batch_requests = [ranges for call, ranges in fake.calls if call == 'values.batchGet']
+    assert len(batch_requests) == 9
+    assert batch_requests[0][0] == "'Form Responses 1'!A1:D40"
+
+
+def test_read_spreadsheet_chunks_skips_blank_rows_at_a_chunk_boundary(monkeypatch):
+    rows = form_rows(100)
+    # Rows 37-45 were cleared by hand, the first chunk ends blank and responses go on after it
+    for i in range(36, 45):
+        rows[i] = []
+    fake = FakeSheetsService({"Form Responses 1": rows}, row_count=200, column_count=4)
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+
+    frames = list(main.read_spreadsheet_chunks("sheet_id", "Form Responses 1", chunk_rows=40, ranges_per_request=1))
+    names = [name for frame in frames for name in frame["Please Enter Your Name."]]
+    assert names == [row[0] for row in rows[1:] if row]
+    assert len(names) == 91 and names[-1] == "S99"
+
+
+def test_transform_chunks_matches_single_frame(monkeypatch):
+    rows = form_rows(120)
+    monkeypatch.setattr(main, "get_google_sheets_service",
+                        lambda: FakeSheetsService({"Form Responses 1": rows}, column_count=4))
+
+    chunked = main.transform_chunks(main.read_spreadsheet_chunks("sheet_id", "Form Responses 1", chunk_rows=25))
+    whole = main.transform_data_for_algorithm(pd.DataFrame(rows[1:], columns=rows[0]))
+
+    assert chunked == whole
+    assert chunked[1]["S0"] == {"S1": 10, "S2": 1}
+
+
+def test_read_spreadsheet_chunks_unknown_tab_and_empty_tab(monkeypatch):
+    import pytest
+
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: FakeSheetsService({"Other": []}))
+    with pytest.raises(ValueError):
+        list(main.read_spreadsheet_chunks("sheet_id", "Form Responses 1"))
+
+    monkeypatch.setattr(main, "get_google_sheets_service",
+                        lambda: FakeSheetsService({"Form Responses 1": []}, row_count=1000))
+    assert list(main.read_spreadsheet_chunks("sheet_id", "Form Responses 1")) == []
+    assert main.transform_chunks([]) == ([], {}, [], {})
+
+
+def test_failed_page_stops_the_run_before_anything_is_written(monkeypatch, tmp_path):
+    import pytest
+    from googleapiclient.errors import HttpError
+    from pipeline import run_pipeline
+
+    fake = FakeSheetsService({"Form Responses 1": form_rows(250)}, column_count=4)
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+
+    # Request 1 is the tab metadata, 2 the first page, 3 the second page
+    fake.fail_request(3)
+    chunks = main.read_spreadsheet_row_chunks("sheet_id", "Form Responses 1", chunk_rows=40, ranges_per_request=1)
+    assert len(next(chunks)[1]) == 39
+    with pytest.raises(HttpError):
+        next(chunks)
+
+    fake.fail_request(3)
+    state_file = tmp_path / "state.json"
+    with pytest.raises(HttpError):
+        run_pipeline(main.SheetsSource("sheet_id", "Form Responses 1", chunk_rows=40, ranges_per_request=1),
+                     main.SheetsSink("sheet_id", "Team Results!A1"), state_file=str(state_file))
+    assert "Team Results" not in fake.tabs
+    assert not state_file.exists()
+
+
+def test_column_letter():
+    assert [main._column_letter(n) for n in (1, 26, 27, 38, 702, 703)] == ["A", "Z", "AA", "AL", "ZZ", "AAA"]
+
+
+def test_read_and_write_retry_rate_limits(monkeypatch):
+    fake = FakeSheetsService({"Form Responses 1": form_rows(5)})
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+    monkeypatch.setattr("sheets_client.time.sleep", lambda seconds: None)
+
+    fake.fail_next(2, status=429)
+    assert main.read_spreadsheet_data("sheet_id", "Form Responses 1!A1:D2") == form_rows(5)[:2]
+
+    fake.fail_next(1, status=503)
+    assert main.write_to_spreadsheet("sheet_id", "Team Results!A1", [["x"]]) is True
+    assert fake.tabs["Team Results"] == [["x"]]
+
+
+def test_write_ranges_to_spreadsheet_sends_one_batch(monkeypatch):
+    fake = FakeSheetsService()
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+
+    ok = main.write_ranges_to_spreadsheet("sheet_id", {
+        "'Team Results'!A1": [["Team Members", "Project"], ["A, B", "X"]],
+        "'Summary'!B2": [[42]],
+    })
+
+    assert ok is True
+    assert [call for call, _ in fake.calls] == ["values.batchUpdate"]
+    assert fake.tabs["Summary"] == [[], ["", 42]]
+
+
+def test_sheets_sink_only_sends_changed_cells_on_a_rerun(monkeypatch, capsys):
+    fake = FakeSheetsService({"Team Results": [["old"], ["stale", "row"], ["more"]]})
+    monkeypatch.setattr(main, "get_google_sheets_service", lambda: fake)
+    sink = main.SheetsSink("sheet_id", "Team Results!A1")
+    table = [["Team Members", "Project", "Score"], ["A, B", "X", 90], ["", "Overall Score", 90]]
+
+    assert sink.write(table) is True
+    assert fake._read("Team Results") == table
+    assert "9 cells touched (8 updated, 1 cleared)" in capsys.readouterr().out
+
+    fake.calls.clear()
+    assert sink.write(table) is True
+    assert [call for call, _ in fake.calls] == ["values.get"]
+    assert "0 cells touched" in capsys.readouterr().out
+
+
+def test_incremental_transform_matches_full_transform_after_edits():
+    rows = form_rows(30)
+    header, body = rows[0], rows[1:]
+    _, entries, _, transformed = main.transform_rows_incremental(header, body, None)
+    assert transformed == 30
+    state = {'header': header, 'rows': entries}
+
+    # Two late responses, one edit, and a duplicate name among the new rows
+    edited = [list(r) for r in body]
+    edited[4] = ["S4", "5", "S9"]
+    edited += [["S30", "2", "S0"], ["S31", "1", "S30", "S4"], ["S30", "3", "S1"]]
+
+    data, _, changed_people, transformed = main.transform_rows_incremental(header, edited, state)
+
+    assert transformed == 4
+    assert changed_people == {"S4", "S30", "S31"}
+    assert data == main.transform_data_for_algorithm(pd.DataFrame(edited, columns=header))
+
+
+def test_match_incremental_keeps_untouched_teams():
+    rows = form_rows(60)
+    header, body = rows[0], rows[1:]
+    # One project that every team can take, so all teams are in the results
+    options = {'project_capacities': {'A': 100}}
+    results, _, state, stats = main.match_incremental(header, body, None, **options)
+    assert stats['warm_start'] is False
+    assert sum(len(team) for team in state['teams']) == 60
+
+    body = body + [["S60", "1", "S0"], ["S61", "1", "S60"]]
+    _, _, state2, stats2 = main.match_incremental(header, body, state, **options)
+
+    assert stats2['warm_start'] is True
+    assert stats2['rows_transformed'] == 2
+    before = {frozenset(team) for team in state['teams']}
+    after = {frozenset(team) for team in state2['teams']}
+    # Existing teams are untouched, the two newcomers form a team of their own
+    assert before <= after
+    assert after - before == {frozenset({"S60", "S61"})}
+
+
+def test_match_incremental_saves_teams_without_a_project():
+    rows = form_rows(60)
+    header, body = rows[0], rows[1:]
+    # A single project with the default capacity, only the best team gets it
+    results, _, state, _ = main.match_incremental(header, body, None)
+    assert len(results) == 1 and len(results.unassigned_teams()) > 1
+    assert sorted(name for team in state['teams'] for name in team) == sorted(row[0] for row in body)
+
+    body = [list(row) for row in body]
+    body[10][1] = "2" if body[10][1] != "2" else "3"
+    _, _, state2, stats = main.match_incremental(header, body, state)
+    assert stats['warm_start'] is True and stats['changed_people'] == 1
+    # Only the edited person's team is formed again, the teams without a project are kept
+    untouched = {frozenset(team) for team in state['teams'] if "S10" not in team}
+    assert untouched <= {frozenset(team) for team in state2['teams']}
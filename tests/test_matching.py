@@ -110,3 +110,66 @@ def test_more_teams_than_projects_truncates_output_to_projects():
     pp = {p: {} for p in people}
     res, _ = create_capstone_teams(people, t, projects, pp)
     assert len(res) == len(projects)  # zip truncation behavior is explicit
+
+
+def test_top_k_matches_stable_descending_sort():
+    import numpy as np
+    from matching_algorithm import _top_k
+
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        keys = rng.integers(2, 8, size=rng.integers(1, 30)).astype(float)
+        for k in range(0, 5):
+            expected = np.argsort(-keys, kind='stable')[:k]
+            assert _top_k(keys, k).tolist() == expected.tolist()
+
+
+def test_incremental_greedy_matches_reference_on_larger_cohort():
+    from test_compat_matrix import dict_reference, random_cohort
+
+    args = random_cohort(240, 30, seed=7)
+    assert create_capstone_teams(*args) == dict_reference(*args)
+
+
+def test_repair_teams_keeps_unchanged_teams_and_regroups_the_rest():
+    from compat_matrix import CompatibilityMatrix
+    from matching_algorithm import repair_teams
+
+    people = ["A", "B", "C", "D", "E", "F", "G"]
+    prefs = {"G": {"E": 10}, "E": {"G": 10}}
+    m = CompatibilityMatrix(people, prefs, [], {})
+    previous = [["A", "B"], ["C", "D"], ["E", "F"]]
+
+    # G is new and alone, so the kept team G fits best with (E, F) is broken up for them
+    teams = [m.names(t) for t in repair_teams(m, previous, [], 2, 3)]
+    assert teams[:2] == [["A", "B"], ["C", "D"]]
+    assert sorted(sum(teams[2:], [])) == ["E", "F", "G"]
+
+    # A changed, so only their team is re-formed
+    teams = [sorted(m.names(t)) for t in repair_teams(m, previous + [["G"]], ["A"], 2, 3)]
+    assert ["C", "D"] in teams and ["E", "F"] in teams
+    assert sorted(sum(teams, [])) == people
+
+
+def test_sparse_option_rejects_dense_only_passes():
+    import pytest
+
+    args = (["A", "B", "C", "D"], {}, ["X", "Y"], {})
+    with pytest.raises(ValueError):
+        create_capstone_teams(*args, sparse=True, exact=True)
+    with pytest.raises(ValueError):
+        create_capstone_teams(*args, sparse=True, improve_iterations=10)
+    assert create_capstone_teams(*args, sparse=True) == create_capstone_teams(*args)
+
+
+def test_repair_teams_on_sparse_matrix_matches_dense():
+    from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+    from matching_algorithm import greedy_teams, repair_teams
+    from test_compat_matrix import random_cohort
+
+    args = random_cohort(50, 4, seed=11)
+    dense = CompatibilityMatrix(*args)
+    sparse = SparseCompatibilityMatrix(*args)
+    previous = [dense.names(t) for t in greedy_teams(dense)]
+    changed = [previous[0][0], previous[5][1], previous[9][0]]
+    assert repair_teams(sparse, previous, changed) == repair_teams(dense, previous, changed)
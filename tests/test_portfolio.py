@@ -0,0 +1,52 @@
+# tests/test_portfolio.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from compat_matrix import CompatibilityMatrix
+from matching_algorithm import create_capstone_teams, greedy_teams
+from portfolio import portfolio_teams
+from test_compat_matrix import random_cohort
+
+
+def cohort_matrix(n, seed):
+    return CompatibilityMatrix(*random_cohort(n, 4, seed))
+
+
+def test_portfolio_is_never_worse_than_plain_greedy():
+    m = cohort_matrix(120, 1)
+    teams, stats = portfolio_teams(m, runs=6, workers=1, seed=3)
+
+    plain = float(np.mean(m.team_scores(greedy_teams(m))))
+    assert stats['scores'][0] == plain
+    assert max(stats['scores']) == float(np.mean(m.team_scores(teams)))
+    assert stats['scores'][stats['best_run']] >= plain
+    assert sorted(i for team in teams for i in team) == list(range(120))
+
+
+def test_result_depends_only_on_seed_not_worker_count():
+    m = cohort_matrix(90, 2)
+    serial, serial_stats = portfolio_teams(m, runs=4, workers=1, seed=9, improve_iterations=200)
+    pooled, pooled_stats = portfolio_teams(m, runs=4, workers=2, seed=9, improve_iterations=200)
+    assert serial == pooled
+    assert serial_stats['scores'] == pooled_stats['scores']
+
+
+def test_noise_changes_the_greedy_pass_reproducibly():
+    m = cohort_matrix(60, 3)
+    assert greedy_teams(m, noise=3.0, seed=1) == greedy_teams(m, noise=3.0, seed=1)
+    assert greedy_teams(m, noise=0.0, seed=1) == greedy_teams(m)
+
+
+def test_create_capstone_teams_portfolio_mode():
+    args = random_cohort(40, 14, 4)
+    r1 = create_capstone_teams(*args, portfolio_runs=3, workers=1, seed=2)
+    r2 = create_capstone_teams(*args, portfolio_runs=3, workers=1, seed=2)
+    assert r1 == r2
+    with pytest.raises(ValueError):
+        portfolio_teams(cohort_matrix(4, 0), runs=0)
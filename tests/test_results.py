@@ -0,0 +1,56 @@
+# tests/test_results.py
+import os
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from matching_algorithm import create_capstone_teams
+from results import Assignment, ResultTable, Team
+
+
+def make_table():
+    people = ["Ann", "Bo", "Cy", "Di", "Ed"]
+    return ResultTable([[0, 3, 4], [1, 2]], [1, 0], [90, 75], people, ["X", "Y"])
+
+
+def test_table_rows_unpack_like_tuples():
+    table = make_table()
+    assert len(table) == 2
+    team, project, score = table[0]
+    assert (team, project, score) == (["Ann", "Di", "Ed"], "Y", 90)
+    assert table[-1][1] == "X"
+    assert table == [(["Ann", "Di", "Ed"], "Y", 90), (["Bo", "Cy"], "X", 75)]
+    assert table.to_rows() == [(["Ann", "Di", "Ed"], "Y", 90), (["Bo", "Cy"], "X", 75)]
+    assert [t for t, _, _ in table] == [["Ann", "Di", "Ed"], ["Bo", "Cy"]]
+    assert table != [(["Ann", "Di", "Ed"], "Y", 90)]
+    with pytest.raises(IndexError):
+        table[2]
+
+
+def test_rows_keep_ids_and_use_slots():
+    row = make_table()[1]
+    assert isinstance(row, Assignment) and isinstance(row.team, Team)
+    assert row.team.ids == [1, 2] and row.project_id == 0
+    assert row.team == ["Bo", "Cy"] and len(row.team) == 2
+    for obj in (row, row.team):
+        assert not hasattr(obj, '__dict__')
+
+
+def test_table_stores_arrays_not_names():
+    table = make_table()
+    assert table.members.tolist() == [[0, 3, 4], [1, 2, -1]]
+    assert table.sizes.tolist() == [3, 2]
+    assert table.project_ids.tolist() == [1, 0]
+    assert not hasattr(table, '__dict__')
+    empty = ResultTable([], [], [], [], [])
+    assert empty == [] and len(empty) == 0
+
+
+def test_create_capstone_teams_returns_result_table():
+    results, total = create_capstone_teams(["A", "B", "C", "D"], {"A": {"B": 10}}, ["Q", "P"], {})
+    assert isinstance(results, ResultTable)
+    assert results[0].team == ["A", "B"] and results[0].project == "P"
+    assert results.people == ["A", "B", "C", "D"]
@@ -0,0 +1,48 @@
+# tests/test_run_state.py
+import os
+import sys
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from run_state import STATE_VERSION, diff_rows, load_run_state, row_hash, save_run_state
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = {'header': ["Name"], 'rows': [{'hash': row_hash(["Ann"]), 'person': "Ann"}], 'teams': [["Ann"]]}
+    save_run_state(state, path)
+    loaded = load_run_state(path)
+    assert loaded == dict(state, version=STATE_VERSION)
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_missing_corrupt_or_old_state_is_ignored(tmp_path):
+    assert load_run_state(str(tmp_path / "missing.json")) is None
+    (tmp_path / "bad.json").write_text("{not json")
+    assert load_run_state(str(tmp_path / "bad.json")) is None
+    (tmp_path / "old.json").write_text('{"version": 0}')
+    assert load_run_state(str(tmp_path / "old.json")) is None
+
+
+def test_diff_rows_finds_new_edited_and_deleted_rows():
+    header = ["Name", "Pick"]
+    old_rows = [["Ann", "Bo"], ["Bo", "Ann"], ["Cy", "Ann"], ["Di", "Cy"]]
+    state = {'header': header,
+             'rows': [{'hash': row_hash(r), 'person': r[0]} for r in old_rows]}
+    new_rows = [["Ann", "Bo"], ["Bob", "Ann"], ["Cy", "Ann"]]
+
+    cached, changed_rows, changed_people = diff_rows(header, new_rows, state)
+
+    assert sorted(cached) == [0, 2]
+    assert changed_rows == [1]
+    # The old name of the edited row and the deleted respondent
+    assert changed_people == {"Bo", "Di"}
+
+
+def test_new_header_invalidates_everything():
+    rows = [["Ann", "Bo"]]
+    state = {'header': ["Name", "Pick"], 'rows': [{'hash': row_hash(rows[0]), 'person': "Ann"}]}
+    cached, changed_rows, _ = diff_rows(["Name", "Pick", "Extra"], rows, state)
+    assert cached == {} and changed_rows == [0]
+    assert diff_rows(["Name"], rows, None) == ({}, [0], set())
@@ -0,0 +1,91 @@
+# tests/test_scoring.py
+import os
+import random
+import sys
+
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+from matching_algorithm import greedy_teams
+from scoring import ScoreCache, TeamScorer
+from test_compat_matrix import random_cohort
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ScoreCache(max_entries=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0   # "b" is now the oldest
+    cache.put("c", 3.0)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3.0
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.size, stats.max_entries) == (2, 1, 1, 2, 2)
+
+
+def test_cache_needs_room():
+    with pytest.raises(ValueError):
+        ScoreCache(max_entries=0)
+
+
+@pytest.mark.parametrize("matrix_class", [CompatibilityMatrix, SparseCompatibilityMatrix])
+def test_scores_match_the_matrix_and_repeat_from_cache(matrix_class):
+    m = matrix_class(*random_cohort(40, 6, seed=2))
+    scorer = TeamScorer(m)
+    teams = greedy_teams(m, 2, 3)
+    for team in teams:
+        assert scorer.team_score(team) == pytest.approx(m.team_score(team))
+        assert scorer.project_score(team, 1) == pytest.approx(m.project_score(team, 1))
+    misses = scorer.stats().misses
+
+    # Member order does not matter, the same teams are answered from the cache
+    for team in teams:
+        scorer.team_score(list(reversed(team)))
+        scorer.project_score(team, 1)
+    stats = scorer.stats()
+    assert stats.misses == misses
+    assert stats.hits >= 2 * len(teams)
+
+
+@pytest.mark.parametrize("matrix_class", [CompatibilityMatrix, SparseCompatibilityMatrix])
+def test_what_if_matches_rescoring_the_changed_teams(matrix_class):
+    m = matrix_class(*random_cohort(30, 4, seed=7))
+    scorer = TeamScorer(m, max_entries=8)
+    teams = greedy_teams(m, 2, 3)
+    rng = random.Random(1)
+
+    def combined(team, project):
+        return 0.7 * m.team_score(team) + 0.3 * m.project_score(team, project)
+
+    for _ in range(50):
+        s, t = rng.sample(range(len(teams)), 2)
+        a, b = rng.choice(teams[s]), rng.choice(teams[t])
+        new_s = [b if p == a else p for p in teams[s]]
+        new_t = [a if p == b else p for p in teams[t]]
+        outcome = scorer.evaluate_swap(teams[s], teams[t], a, b)
+        assert outcome.after == pytest.approx((m.team_score(new_s), m.team_score(new_t)))
+        expected = m.team_score(new_s) + m.team_score(new_t) - m.team_score(teams[s]) - m.team_score(teams[t])
+        assert outcome.delta == pytest.approx(expected)
+
+        outcome = scorer.evaluate_move(a, teams[s], teams[t], projects=(0, 2))
+        moved_s = [p for p in teams[s] if p != a]
+        moved_t = teams[t] + [a]
+        assert outcome.before == pytest.approx((combined(teams[s], 0), combined(teams[t], 2)))
+        assert outcome.after == pytest.approx((combined(moved_s, 0), combined(moved_t, 2)))
+
+    # The small cache had to evict along the way
+    assert scorer.stats().evictions > 0
+    assert scorer.stats().size == 8
+
+
+def test_what_if_checks_membership():
+    m = CompatibilityMatrix(*random_cohort(6, 2, seed=1))
+    scorer = TeamScorer(m)
+    with pytest.raises(ValueError):
+        scorer.evaluate_swap([0, 1], [2, 3], 2, 3)
+    with pytest.raises(ValueError):
+        scorer.evaluate_move(0, [0, 1], [0, 2])
@@ -0,0 +1,196 @@
+# tests/test_sheets_client.py
+import os
+import random
+import sys
+import threading
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import sheets_client
+from fake_sheets import FakeSheetsService
+from sheets_client import BatchWriter, RateLimiter, cell_diff, execute_with_retry, write_changed_cells
+
+
+class FlakyRequest:
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({'status': status}), b'')
+
+
+def test_retries_rate_limits_with_capped_jittered_backoff():
+    delays = []
+    request = FlakyRequest([http_error(429), http_error(500), ConnectionError(), http_error(503)])
+
+    result = execute_with_retry(request, base_delay=1, max_delay=4,
+                                sleep=delays.append, rng=random.Random(0))
+
+    assert result == "ok" and request.calls == 5
+    # Each wait is drawn from [0, min(max_delay, base * 2^attempt)]
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(4, 2 ** attempt)
+
+
+def test_does_not_retry_client_errors_and_gives_up_eventually():
+    request = FlakyRequest([http_error(403)])
+    with pytest.raises(HttpError):
+        execute_with_retry(request, sleep=lambda s: None)
+    assert request.calls == 1
+
+    request = FlakyRequest([http_error(429)] * 10)
+    with pytest.raises(HttpError):
+        execute_with_retry(request, max_retries=3, sleep=lambda s: None)
+    assert request.calls == 4
+
+
+def test_batch_writer_combines_updates_and_splits_large_batches(monkeypatch):
+    monkeypatch.setattr(sheets_client.time, "sleep", lambda s: None)
+    fake = FakeSheetsService()
+    fake.fail_next(1, status=429)
+
+    with BatchWriter("sheet_id", service=fake, max_ranges=2) as writer:
+        for i in range(5):
+            writer.add(f"'Out'!A{i + 1}", [[i, i * 10]])
+
+    assert writer.requests_sent == 3
+    assert [call for call, _ in fake.calls] == ["values.batchUpdate"] * 3
+    assert fake.tabs["Out"] == [[i, i * 10] for i in range(5)]
+    assert writer.pending == []
+
+
+def test_service_is_built_once_per_thread_and_not_cached_on_failure(monkeypatch, tmp_path):
+    builds = []
+    loads = []
+    sheets_client.reset_service()
+    monkeypatch.setattr(sheets_client.service_account.Credentials, "from_service_account_info",
+                        lambda info, scopes: loads.append(info) or object())
+    monkeypatch.setattr(sheets_client, "AuthorizedHttp", lambda credentials, http: http)
+    monkeypatch.setattr(sheets_client, "build", lambda *args, **kwargs: builds.append(kwargs) or object())
+
+    with pytest.raises(FileNotFoundError):
+        sheets_client.get_service(str(tmp_path / "missing.json"))
+    assert sheets_client._credentials is None
+
+    creds = tmp_path / "credentials.json"
+    creds.write_text("{}")
+    first = sheets_client.get_service(str(creds))
+    assert sheets_client.get_service(str(creds)) is first
+    assert len(builds) == 1
+
+    # Another thread gets its own client, the credentials are only loaded once
+    other = []
+    thread = threading.Thread(target=lambda: other.append(sheets_client.get_service(str(creds))))
+    thread.start()
+    thread.join()
+    assert other[0] is not first and len(loads) == 1
+
+    sheets_client.reset_service()
+    assert sheets_client.get_service(str(creds)) is not first
+    assert len(loads) == 2
+    sheets_client.reset_service()
+
+
+def test_rate_limiter_spaces_requests_after_the_burst():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(rate=2, burst=2, clock=lambda: now[0], sleep=sleep)
+    assert [limiter.acquire() for _ in range(4)] == [0.0, 0.0, 0.5, 0.5]
+    now[0] += 10
+    # Idle time refills the bucket, but never past the burst size
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_set_rate_limit_applies_to_execute_with_retry():
+    acquired = []
+    previous = sheets_client.set_rate_limit(1000)
+    try:
+        limiter = sheets_client._rate_limiter
+        limiter.acquire = lambda: acquired.append(1)
+        execute_with_retry(FlakyRequest([http_error(429)]), sleep=lambda s: None)
+        assert len(acquired) == 2
+    finally:
+        sheets_client._rate_limiter = previous
+    assert sheets_client.set_rate_limit(None) is None
+
+
+def results_table(teams):
+    rows = [["Team Members", "Project", "Score"]]
+    rows += [[members, project, score] for members, project, score in teams]
+    rows.append(["", "Overall Score", 80])
+    return rows
+
+
+TEAMS = [(f"P{3 * t}, P{3 * t + 1}, P{3 * t + 2}", f"Project {t % 4}", 70 + t % 20) for t in range(40)]
+
+
+def test_cell_diff_joins_runs_into_rectangles():
+    old = [["a", "b", "c"], ["d", "e", "f"], ["g", "h"]]
+    new = [["a", "x", "y"], ["d", "x", "y"], ["g", None, None, "z"]]
+    assert cell_diff(old, new) == [
+        (0, 1, [["x", "y"], ["x", "y"]]),
+        (2, 1, [[""]]),
+        (2, 3, [["z"]]),
+    ]
+    assert cell_diff(old, old) == []
+    assert cell_diff([["a", ""], ["b"]], [["a"], ["b", None]]) == []
+    # Stale rows and cells come back as ''
+    assert cell_diff([["a", "b"], ["c"]], [["a"]]) == [(0, 1, [[""]]), (1, 0, [[""]])]
+
+
+def test_write_changed_cells_sends_nothing_for_an_unchanged_table():
+    fake = FakeSheetsService({"Team Results": results_table(TEAMS)})
+    stats = write_changed_cells("sheet_id", "Team Results!A1", results_table(TEAMS), service=fake)
+    assert stats == (0, 0, 0, 1)
+    assert [call[0] for call in fake.calls] == ["values.get"]
+
+
+def test_write_changed_cells_rewrites_one_changed_team_only():
+    fake = FakeSheetsService({"Team Results": results_table(TEAMS)})
+    teams = list(TEAMS)
+    teams[7] = ("P21, P22, P30", "Project 0", 91)
+    stats = write_changed_cells("sheet_id", "Team Results!A1", results_table(teams), service=fake)
+
+    assert stats.cells_written == 3 and stats.cells_cleared == 0 and stats.requests == 2
+    assert fake.calls[-1] == ("values.batchUpdate", ["'Team Results'!A9:C9"])
+    assert fake.tabs["Team Results"] == results_table(teams)
+
+
+def test_write_changed_cells_clears_stale_rows_in_the_same_request():
+    fake = FakeSheetsService({"Team Results": results_table(TEAMS), "Other": [["keep"]]})
+    stats = write_changed_cells("sheet_id", "'Team Results'!A1", results_table(TEAMS[:30]), service=fake)
+
+    # The overall row moves up over team 30, the nine teams and old overall row below it are cleared
+    assert stats.cells_written == 1
+    assert stats.cells_cleared == 1 + 3 * 9 + 2
+    assert stats.requests == 2
+    assert [call[0] for call in fake.calls] == ["values.get", "values.batchUpdate"]
+    assert fake._read("Team Results") == results_table(TEAMS[:30])
+    assert fake.tabs["Other"] == [["keep"]]
+
+
+def test_write_changed_cells_from_an_anchor_into_an_empty_tab():
+    fake = FakeSheetsService({"Team Results": [["note"]]})
+    stats = write_changed_cells("sheet_id", "Team Results!B2", [["a", "b"], ["c", 1]], service=fake)
+    assert stats.cells_written == 4
+    assert fake.tabs["Team Results"] == [["note"], ["", "a", "b"], ["", "c", 1]]
+    assert write_changed_cells("sheet_id", "Team Results!B2", [["a", "b"], ["c", 1]], service=fake).ranges == 0
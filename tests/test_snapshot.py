@@ -0,0 +1,94 @@
+# tests/test_snapshot.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from benchmark import generate_form_rows
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+from form_parser import parse_rows
+from matching_algorithm import create_capstone_teams
+from portfolio import portfolio_teams
+from snapshot import ALIGNMENT, load_snapshot, replay_snapshot, save_snapshot
+
+
+def cohort(n=60, seed=3):
+    return parse_rows(*generate_form_rows(n, seed=seed))
+
+
+@pytest.mark.parametrize("matrix_class", [CompatibilityMatrix, SparseCompatibilityMatrix])
+def test_snapshot_round_trip_keeps_every_score(tmp_path, matrix_class):
+    people, teammate_prefs, projects, project_prefs = cohort()
+    matrix = matrix_class(people, teammate_prefs, projects, project_prefs)
+    path = str(tmp_path / "cohort.snap")
+    save_snapshot(path, matrix, {"term": "fall", "rows": 60})
+
+    loaded, metadata = load_snapshot(path)
+    assert type(loaded) is matrix_class
+    assert metadata["term"] == "fall" and metadata["rows"] == 60 and "created" in metadata
+    assert loaded.people == matrix.people and loaded.projects == matrix.projects
+    assert loaded.person_index == matrix.person_index
+    teams = [[0, 1, 2], [3, 4], [5, 6, 7]]
+    assert np.array_equal(loaded.team_scores(teams), matrix.team_scores(teams))
+    assert np.array_equal(loaded.team_project_scores(teams), matrix.team_project_scores(teams))
+    assert loaded.pair_scores(4, np.arange(10)).tolist() == matrix.pair_scores(4, np.arange(10)).tolist()
+
+
+def test_arrays_are_read_only_views_of_the_file(tmp_path):
+    people, teammate_prefs, projects, project_prefs = cohort(20)
+    path = str(tmp_path / "cohort.snap")
+    save_snapshot(path, CompatibilityMatrix(people, teammate_prefs, projects, project_prefs))
+
+    matrix = load_snapshot(path).matrix
+    for array in (matrix.prefs, matrix.project):
+        assert isinstance(array.base, np.memmap)
+        assert not array.flags.writeable
+        assert array.ctypes.data % ALIGNMENT == 0
+
+
+def test_replay_matches_a_run_from_the_preferences(tmp_path):
+    people, teammate_prefs, projects, project_prefs = cohort()
+    path = str(tmp_path / "cohort.snap")
+    save_snapshot(path, CompatibilityMatrix(people, teammate_prefs, projects, project_prefs))
+
+    options = {"min_size": 3, "max_size": 4, "assignment": "optimal", "improve_iterations": 50}
+    results, total = create_capstone_teams(people, teammate_prefs, projects, project_prefs, **options)
+    replayed, replayed_total = replay_snapshot(path, **options)
+    assert replayed.to_rows() == results.to_rows()
+    assert replayed_total == total
+
+
+def test_sparse_snapshot_refuses_dense_only_modes(tmp_path):
+    people, teammate_prefs, projects, project_prefs = cohort(20)
+    path = str(tmp_path / "cohort.snap")
+    save_snapshot(path, SparseCompatibilityMatrix(people, teammate_prefs, projects, project_prefs))
+    with pytest.raises(ValueError):
+        replay_snapshot(path, exact=True)
+
+
+def test_empty_cohort_and_bad_files(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    save_snapshot(path, SparseCompatibilityMatrix([], {}, [], {}))
+    matrix = load_snapshot(path).matrix
+    assert len(matrix) == 0 and matrix.nnz == 0
+
+    other = tmp_path / "other.snap"
+    other.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        load_snapshot(str(other))
+
+
+def test_portfolio_workers_map_the_snapshot(tmp_path):
+    people, teammate_prefs, projects, project_prefs = cohort(40)
+    matrix = CompatibilityMatrix(people, teammate_prefs, projects, project_prefs)
+    path = str(tmp_path / "cohort.snap")
+    save_snapshot(path, matrix)
+
+    teams, stats = portfolio_teams(load_snapshot(path).matrix, runs=3, workers=2, seed=1)
+    expected_teams, expected = portfolio_teams(matrix, runs=3, workers=1, seed=1)
+    assert teams == expected_teams
+    assert stats["scores"] == expected["scores"]
@@ -0,0 +1,86 @@
+# tests/test_sweep.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Make 'src' importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from benchmark import generate_form_rows
+from compat_matrix import CompatibilityMatrix, SparseCompatibilityMatrix
+from form_parser import parse_rows
+from matching_algorithm import create_capstone_teams
+from portfolio import greedy_runs
+from sweep import sample_weights, sweep_weights, weight_grid
+
+
+def cohort(n=45, seed=2):
+    return parse_rows(*generate_form_rows(n, seed=seed))
+
+
+def test_weight_grid_and_samples():
+    assert weight_grid([0.0, 0.3, 1.0]) == [(0.0, 1.0), (0.3, 0.7), (1.0, 0.0)]
+    assert weight_grid([1, 2], [3]) == [(1.0, 3.0), (2.0, 3.0)]
+    # (0, 0) has no 1-100 scale and is left out
+    assert weight_grid([0, 1], [0, 1]) == [(0.0, 1.0), (1.0, 0.0), (1.0, 1.0)]
+    sampled = sample_weights(5, seed=1)
+    assert sampled == sample_weights(5, seed=1)
+    assert all(0 <= w <= 1 and abs(w + p - 1) < 1e-9 for w, p in sampled)
+
+
+@pytest.mark.parametrize("assignment", ["alphabetical", "optimal"])
+def test_every_weighting_matches_a_full_run(assignment):
+    people, teammate_prefs, projects, project_prefs = cohort()
+    capacities = {p: 3 for p in projects}
+    weights = weight_grid(np.linspace(0, 1, 6))
+    table = sweep_weights(CompatibilityMatrix(people, teammate_prefs, projects, project_prefs), weights,
+                          assignment=assignment, project_capacities=capacities, workers=1)
+
+    for w, (teammate_weight, project_weight) in enumerate(weights):
+        results, total = create_capstone_teams(people, teammate_prefs, projects, project_prefs,
+                                               teammate_weight=teammate_weight, project_weight=project_weight,
+                                               assignment=assignment, project_capacities=capacities)
+        assert table.results(w, 0).to_rows() == results.to_rows()
+        assert table.overall[w, 0] == total
+    assert table.stability[0, 0] == 1.0
+
+
+def test_noisy_samples_are_the_portfolio_runs_and_parallel_is_the_same():
+    people, teammate_prefs, projects, project_prefs = cohort(60)
+    matrix = CompatibilityMatrix(people, teammate_prefs, projects, project_prefs)
+    weights = sample_weights(4, seed=3)
+    table = sweep_weights(matrix, weights, samples=3, seed=5, assignment="optimal", workers=1)
+
+    assert table.teams == [teams for teams, _ in greedy_runs(matrix, 3, workers=1, seed=5)]
+    assert table.overall.shape == (4, 3) and table.stability.shape == (4, 3)
+    assert ((table.stability >= 0) & (table.stability <= 1)).all()
+    # Other samples regroup people, so fewer of them keep the reference teammates
+    assert table.stability[:, 1:].max() < 1.0
+
+    parallel = sweep_weights(matrix, weights, samples=3, seed=5, assignment="optimal", workers=2)
+    assert parallel.to_rows() == table.to_rows()
+
+
+def test_to_rows_has_one_row_per_weighting_and_sample():
+    people, teammate_prefs, projects, project_prefs = cohort(20)
+    table = sweep_weights(SparseCompatibilityMatrix(people, teammate_prefs, projects, project_prefs),
+                          [(0.7, 0.3), (0.5, 0.5)], workers=1)
+    rows = table.to_rows()
+    assert rows[0][:5] == ["Teammate Weight", "Project Weight", "Sample", "Overall Score", "Stability"]
+    assert [row[:3] for row in rows[1:]] == [[0.7, 0.3, 0], [0.5, 0.5, 0]]
+    assert rows[1][5] == ", ".join(str(score) for score in table.team_scores[0][0])
+
+
+def test_rejects_bad_arguments():
+    people, teammate_prefs, projects, project_prefs = cohort(20)
+    sparse = SparseCompatibilityMatrix(people, teammate_prefs, projects, project_prefs)
+    with pytest.raises(ValueError):
+        sweep_weights(sparse, [(0.7, 0.3)], samples=2)
+    with pytest.raises(ValueError):
+        sweep_weights(sparse, [])
+    with pytest.raises(ValueError):
+        sweep_weights(sparse, [(0.7, 0.3)], assignment="random")
+    with pytest.raises(ValueError, match="sum to zero"):
+        sweep_weights(sparse, [(0.7, 0.3), (0.0, 0.0)])